@@ -11,6 +11,9 @@ from pathlib import Path
 from datetime import datetime
 
 from functions import sanitize_filename
+from src.blocklist_store import BlocklistStore
+from src.blocklist_rules import PREFIX
+from src.classify_rules import Classifier, SCAN_CAM_MARKERS, get_classifier
 
 
 def setup_cleaner_logger():
@@ -140,25 +143,41 @@ def path_in_base(p: str, base: str) -> bool:
         return False
 
 
-def add_to_blocklist(title: str, blocklist_path: str):
-    if not blocklist_path:
+def _add_rule(rule: str, blocklist: BlocklistStore):
+    if blocklist.path is None:
         logger.warning("Kein Blocklisten-Pfad konfiguriert – überspringe Blocklisteneintrag.")
         return
-    safe = sanitize_filename(title)
-    os.makedirs(os.path.dirname(blocklist_path), exist_ok=True)
+    if blocklist.add(rule):
+        logger.info(f"Zur Blockliste hinzugefügt: {rule}")
+    else:
+        logger.info(f"Bereits in Blockliste: {rule}")
+
+
+def add_to_blocklist(title: str, blocklist: BlocklistStore):
+    """Titel vormerken; geschrieben wird gesammelt per ``blocklist.flush()``."""
+    _add_rule(sanitize_filename(title), blocklist)
+
+
+_EPISODE_STEM_RE = re.compile(r'^(.*\sS\d+\s)E\d+', re.IGNORECASE)
+
+
+def season_block_rules(episode_stems) -> list[str]:
+    """
+    Blocklisten-Regeln für eine Staffel: ein ``prefix:<Serie> Sxx E`` statt einer Zeile
+    pro Episode (sperrt auch später erscheinende Episoden); Namen ohne Sxx/Eyy bleiben exakt.
+    """
+    rules = {}
+    for stem in episode_stems:
+        match = _EPISODE_STEM_RE.match(stem)
+        rule = f"{PREFIX}{stem[:match.end(1) + 1]}" if match else stem
+        rules[rule] = None
+    return list(rules)
+
+
+def flush_blocklist(blocklist: BlocklistStore):
+    """Vorgemerkte Einträge schreiben – vor dem Löschen, damit gelöschte Titel nicht wieder angelegt werden."""
     try:
-        existing = set()
-        if os.path.exists(blocklist_path):
-            with open(blocklist_path, 'r', encoding='utf-8') as f:
-                existing = {line.strip() for line in f if line.strip()}
-        if safe not in existing:
-            with open(blocklist_path, 'a', encoding='utf-8') as f:
-                if os.path.getsize(blocklist_path) > 0:
-                    f.write("\n")
-                f.write(safe)
-            logger.info(f"Zur Blockliste hinzugefügt: {safe}")
-        else:
-            logger.info(f"Bereits in Blockliste: {safe}")
+        blocklist.flush()
     except Exception as e:
         logger.error(f"Fehler beim Schreiben in Blockliste: {e}")
 
@@ -185,7 +204,8 @@ def dedupe_movies_series(cfg: dict):
     jf_m3u_series = cfg['jf_m3u_series']
     fs_m3u_movie = cfg['fs_m3u_movie']
     fs_m3u_series = cfg['fs_m3u_series']
-    blocklist = cfg['blocklist']
+    # Einmal laden; Einträge werden für alle Filme bzw. alle Staffeln gesammelt geschrieben
+    blocklist = BlocklistStore(cfg['blocklist'])
 
     if not (jf_m3u_movie and jf_m3u_series and fs_m3u_movie and fs_m3u_series):
         logger.warning("M3U-Pfade nicht vollständig konfiguriert – Abbruch.")
@@ -246,7 +266,8 @@ def dedupe_movies_series(cfg: dict):
             entry['regular'] = True
 
     # Duplikate bestimmen und behandeln
-    # Filme
+    # Filme: erst alle Ordnernamen vormerken, einmal schreiben, dann löschen
+    movie_targets = []
     for name, kinds in movie_by_name.items():
         if kinds['m3u'] and kinds['regular']:
             # Lösche alle passenden M3U-Filmordner im Dateisystem-Pfad und blockliste deren Ordnernamen
@@ -254,9 +275,13 @@ def dedupe_movies_series(cfg: dict):
                 target_dir = Path(fs_m3u_movie) / folder_name
                 logger.info(f"Duplikat (Film) erkannt: {name} -> lösche M3U {target_dir}")
                 add_to_blocklist(folder_name, blocklist)
-                delete_tree(target_dir)
+                movie_targets.append(target_dir)
+    flush_blocklist(blocklist)
+    for target_dir in movie_targets:
+        delete_tree(target_dir)
 
-    # Serien: nur Staffeln löschen, die doppelt sind
+    # Serien: nur Staffeln löschen, die doppelt sind (ebenfalls erst alle Regeln sammeln)
+    season_targets = []
     for (series_name, season_num), flags in series_season_map.items():
         if flags['m3u'] and flags['regular']:
             season_dir = f"Staffel {int(season_num):02d}"
@@ -270,27 +295,32 @@ def dedupe_movies_series(cfg: dict):
                 try:
                     if target_dir.exists():
                         episode_stems = [p.stem for p in target_dir.glob('*.strm')]
-                        logger.info(f"Füge {len(episode_stems)} Episoden zur Blockliste hinzu: Serie {series_folder} | {season_dir}")
-                        for ep_stem in episode_stems:
-                            add_to_blocklist(ep_stem, blocklist)
+                        rules = season_block_rules(episode_stems)
+                        logger.info(f"Sperre {len(episode_stems)} Episoden per {len(rules)} Blocklisten-Regel(n): Serie {series_folder} | {season_dir}")
+                        for rule in rules:
+                            _add_rule(rule, blocklist)
                     else:
                         logger.info(f"M3U-Staffelordner nicht vorhanden: {target_dir}")
                 except Exception as e:
                     logger.error(f"Fehler beim Erfassen der Episoden für {target_dir}: {e}")
-
-                # Staffelordner löschen; wenn Serie danach leere Ordner hat, bereinigen
-                delete_tree(target_dir)
-                series_path = Path(fs_m3u_series) / series_folder
-                try:
-                    if series_path.exists() and not any(series_path.rglob('*.strm')):
-                        # keine Episoden mehr -> leere Staffeln und Serie bereinigen
-                        for p in sorted(series_path.glob('**/*'), reverse=True):
-                            if p.is_dir() and not any(p.iterdir()):
-                                p.rmdir()
-                        if not any(series_path.iterdir()):
-                            series_path.rmdir()
-                except Exception as e:
-                    logger.error(f"Fehler beim Aufräumen nach Löschen von {target_dir}: {e}")
+                season_targets.append((series_folder, target_dir))
+
+    # Einmal schreiben, bevor gelöscht wird – gelöschte Episoden dürfen nicht wieder angelegt werden
+    flush_blocklist(blocklist)
+    for series_folder, target_dir in season_targets:
+        # Staffelordner löschen; wenn Serie danach leere Ordner hat, bereinigen
+        delete_tree(target_dir)
+        series_path = Path(fs_m3u_series) / series_folder
+        try:
+            if series_path.exists() and not any(series_path.rglob('*.strm')):
+                # keine Episoden mehr -> leere Staffeln und Serie bereinigen
+                for p in sorted(series_path.glob('**/*'), reverse=True):
+                    if p.is_dir() and not any(p.iterdir()):
+                        p.rmdir()
+                if not any(series_path.iterdir()):
+                    series_path.rmdir()
+        except Exception as e:
+            logger.error(f"Fehler beim Aufräumen nach Löschen von {target_dir}: {e}")
 
 
 def _jellyfin_get_items(jellyfin_url: str, api_key: str, include_types: str):
@@ -513,11 +543,8 @@ def cam_scan_log(cfg: dict):
     items_movies = _jellyfin_get_items(jf_url, jf_key, "Movie")
     items_series = _jellyfin_get_items(jf_url, jf_key, "Series")
 
-    def is_cam(name: str) -> bool:
-        if not name:
-            return False
-        n = name.upper()
-        return '(CAM)' in n or '[CAM]' in n or 'HDCAM' in n
+    # CAM-Regeln wie beim Aufteilen der Playlist ([CLASSIFY] cam_markers) plus die bisherigen Scan-Marker
+    is_cam = Classifier(cam_markers=(*get_classifier().cam_markers, *SCAN_CAM_MARKERS)).is_cam
 
     cam_movies = [m for m in items_movies if is_cam(m.get('Name'))]
     cam_series = [s for s in items_series if is_cam(s.get('Name'))]
@@ -4,6 +4,7 @@ import re
 from logger import logger
 from dotenv import load_dotenv
 from pathlib import Path
+from src.blocklist_store import BlocklistStore
 
 def load_config():
     dotenv_path = Path(".env")
@@ -43,20 +44,67 @@ def load_config():
     return url, path_movie, path_serien, path_m3u, blockliste_path
 
 
+_config = None
+
+
+def env_key(section: str, key: str) -> str:
+    """Name der .env-Variable für eine Einstellung aus CONFIG.ini, z. B. ``PARSER_WORKERS``."""
+    return f"{section}_{key}".upper()
+
+
+def load_option(section: str, key: str, fallback=None, cast=str):
+    """
+    Liest eine optionale Einstellung aus .env bzw. CONFIG.ini.
+
+    Fehlt der Wert (oder ist er leer bzw. ungültig), wird ``fallback`` zurückgegeben.
+
+    In .env heißt die Variable ``<ABSCHNITT>_<NAME>`` in Großbuchstaben (z. B.
+    ``PARSER_WORKERS`` für ``[PARSER] workers``), damit gleichnamige Einstellungen
+    verschiedener Abschnitte (``[PARSER] workers``, ``[CLEANUP] workers``) getrennt bleiben.
+
+    :param section: Abschnitt in CONFIG.ini (in .env Präfix der Variable).
+    :param key: Name der Einstellung.
+    :param fallback: Standardwert, falls nichts konfiguriert ist.
+    :param cast: Zieltyp (str, int, float oder bool).
+    :return: Der konfigurierte Wert oder ``fallback``.
+    """
+    global _config
+    dotenv_path = Path(".env")
+    if dotenv_path.exists():
+        load_dotenv(dotenv_path)
+        value = os.getenv(env_key(section, key))
+    else:
+        if _config is None:
+            _config = configparser.ConfigParser()
+            _config.read('CONFIG.ini')
+        value = _config.get(section, key, fallback=None)
+
+    if value is None or str(value).strip() == "":
+        return fallback
+    value = str(value).strip()
+    if cast is bool:
+        return value.lower() in ("1", "true", "yes", "ja", "on")
+    try:
+        return cast(value)
+    except ValueError:
+        logger.warning(f"Ungültiger Wert für {section}.{key}: {value!r} – nutze {fallback!r}")
+        return fallback
+
+
 def sanitize_filename(name: str) -> str:
     return re.sub(r'[<>:"/\\|?*]', '_', name)
 
-def load_blocklist(blocklist_path: str) -> set:
+def load_blocklist(blocklist_path: str) -> BlocklistStore:
     """
-    Lädt die Blocklistendatei und gibt ein Set mit den blockierten Titeln zurück.
+    Lädt die Blocklistendatei einmal in einen ``BlocklistStore``.
 
     :param blocklist_path: Der Pfad zur Blocklistendatei.
-    :return: Ein Set mit den blockierten Titeln.
+    :return: BlocklistStore mit den blockierten Titeln (``title in blocklist``); neue Titel per
+        ``add`` vormerken und mit ``flush`` gesammelt schreiben.
     """
     # Prüft, ob die Blocklistendatei existiert.
     if not os.path.exists(blocklist_path):
         logger.warning(f"Blocklistendatei nicht gefunden unter: {blocklist_path}")
-        return set()
-    # Öffnet die Blocklistendatei und liest die Zeilen in ein Set ein.
-    with open(blocklist_path, 'r', encoding='utf-8') as f:
-        return {line.strip() for line in f}
+    blocklist = BlocklistStore(blocklist_path)
+    logger.info(f"Blockliste geladen: {blocklist.describe()}")
+    return blocklist
@@ -1,10 +1,10 @@
 import logging
+import multiprocessing
 from pathlib import Path
 from datetime import datetime
 import sys
 
 log_dir = Path(__file__).parent / "logs"
-log_dir.mkdir(exist_ok=True)
 
 def cleanup_logs(max_files=10):
     logs = sorted(log_dir.glob("*_m3u_log.log"), key=lambda f: f.stat().st_mtime)
@@ -23,8 +23,10 @@ def get_log_file():
 logger = logging.getLogger("m3u_logger")
 logger.setLevel(logging.INFO)
 
-# Verhindern, dass Handler mehrfach hinzugefügt werden, falls das Modul neu geladen wird
-if not logger.handlers:
+# Verhindern, dass Handler mehrfach hinzugefügt werden, falls das Modul neu geladen wird.
+# Worker-Prozesse (Parser, per spawn neu importiert) legen keine eigene Logdatei an und räumen nicht auf.
+if not logger.handlers and multiprocessing.parent_process() is None:
+    log_dir.mkdir(exist_ok=True)
     log_file = get_log_file()
     
     # Formatter erstellen
@@ -40,4 +40,4 @@ fi
 
 # 7. Python-Skript mit venv-Python ausführen
 echo "Starte M3U-Skript ..."
-exec "$VENV_PYTHON" "$SCRIPT"
+exec "$VENV_PYTHON" "$SCRIPT" "$@"
@@ -1,60 +1,128 @@
+import argparse
 import os
 from pathlib import Path
 from src.create_m3u_with_stream import *
 from src.create_m3u_with_movies import *
 from src.save_new_stream_m3u import *
+from src.stream_shards import save_stream_shards
 from src.save_new_movies_m3u import *
 from src.save_new_series_m3u import *
 from src.download_m3u import *
+from src.parse_cache import cached_split_playlist, load_split
 from logger import logger, log_start, log_end
 from functions import *
 from src.offline_tracker import dump_offline_json
+from src.url_cache import flush_url_cache
+from src.sync_pipeline import run_concurrently
 
-def main ():
+def log_summary(movies_created, series_created, movies_deleted, series_deleted):
+    total_created = len(movies_created) + len(series_created)
+    total_deleted = len(movies_deleted) + len(series_deleted)
+    logger.info("=" * 30)
+    logger.info("Zusammenfassung Änderungen:")
+    logger.info(f"Neu: Filme {len(movies_created)}, Serien {len(series_created)} (gesamt {total_created})")
+    logger.info(f"Gelöscht: Filme {len(movies_deleted)}, Serien {len(series_deleted)} (gesamt {total_deleted})")
+
+    if movies_created:
+        logger.info("Neu (Filme): " + "; ".join(movies_created))
+    if series_created:
+        logger.info("Neu (Serien): " + "; ".join(series_created))
+    if movies_deleted:
+        logger.info("Gelöscht (Filme): " + "; ".join(movies_deleted))
+    if series_deleted:
+        logger.info("Gelöscht (Serien): " + "; ".join(series_deleted))
+
+
+def main (plan_only=False, from_cache=False):
+    """
+    :param plan_only: Nur Änderungspläne erstellen (tmp/plan_movies.json, tmp/plan_series.json);
+        Bibliotheken, Streams-m3u, Blockliste und Download-Zustand bleiben unangetastet
+    :param from_cache: Nicht herunterladen, sondern die zuletzt geparste Playlist aus dem Parse-Cache verwenden
+    """
     # Start
     log_start()
+    if plan_only:
+        logger.info("Plan-Modus: Es werden nur Änderungspläne erstellt, keine Dateien geändert.")
     # Lade Config Daten
     m3u_url, path_movie, path_serien, path_m3u, blockliste_path = load_config()
 
     # Lade die Blockliste, um Filme und Serien auszuschließen.
     blocklist = load_blocklist(blockliste_path)
 
-    # Download M3U File in /tmp von PythonPath
-    # hier immer auskommentieren, damit ich nicht beim testen x mal downloade
-    # m3u_base_filename = "tv_channels_nZtqNMXH.m3u"
-    m3u_base_filename = download_m3u(m3u_url)
+    parser_options = dict(
+        write_tmp_files=load_option('PARSER', 'write_tmp_files', False, bool),
+        workers=load_option('PARSER', 'workers', 1, int),
+        parallel_min_mb=load_option('PARSER', 'parallel_min_mb', 32, int),
+    )
+    download = None
+    split = None
+    # Unveränderte Playlist: Streams und CAM-Titel wurden beim letzten erfolgreichen Lauf schon übernommen
+    playlist_unchanged = False
+    if from_cache:
+        # Zum Testen/Debuggen: kein Download, letzte aufgeteilte Playlist aus state/parse_cache.sqlite
+        split = load_split()
+        if split is None:
+            logger.info("Kein Parse-Cache vorhanden – bitte einmal ohne --cached laufen lassen.")
+            log_end()
+            return
+        logger.info(f"Verwende Playlist aus dem Parse-Cache: {split.source_filename}")
+    else:
+        # Download M3U File in /tmp von PythonPath
+        download = download_m3u(
+            m3u_url,
+            conditional=load_option('DOWNLOAD', 'skip_unchanged', True, bool),
+            chunk_size=load_option('DOWNLOAD', 'chunk_size_kb', 1024, int) * 1024,
+            retries=load_option('DOWNLOAD', 'retries', 3, int),
+            backoff=load_option('DOWNLOAD', 'backoff_seconds', 2.0, float),
+            backoff_max=load_option('DOWNLOAD', 'backoff_max_seconds', 60.0, float),
+            timeout=load_option('DOWNLOAD', 'timeout_seconds', 30.0, float),
+        )
+        m3u_base_filename = download.filename
 
-    # Erstelle neue m3u nur mit Streams in /tmp
-    m3u_streams_filename = create_m3u_with_stream(m3u_base_filename)
+        # Playlist unverändert → kein erneutes Parsen, kein voller Abgleich. Die Einträge kommen aus dem
+        # Parse-Cache und laufen trotzdem durch die Prüf-Rotation, damit tote Links gelöscht werden
+        if not download.changed:
+            split = load_split(download.sha256)
+            if split is None and not (Path.cwd() / "tmp" / m3u_base_filename).is_file():
+                logger.info("Playlist unverändert, aber weder Parse-Cache noch Playlist vorhanden – überspringe den Sync.")
+                log_summary([], [], [], [])
+                # Neuen ETag/Last-Modified übernehmen, damit der nächste Lauf direkt 304 bekommt
+                if not plan_only:
+                    mark_download_synced(download)
+                log_end()
+                return
+            playlist_unchanged = True
+            logger.info("Playlist unverändert – überspringe Parsing, Streams und CAM; nur Prüf-Rotation und Löschungen.")
 
-    # Erstelle zwei neue m3u nur mit Filme & Serien mit (DE) in /tmp
-    m3u_movies_filename, m3u_series_filename, cam_titles = create_separate_m3u_files_movies_series(m3u_base_filename)
+        # Playlist einmal lesen: Streams-m3u in /tmp schreiben, Filme & Serien mit (DE) + CAM sammeln
+        # (gleicher Inhalt wie beim letzten Parsen → direkt aus dem Parse-Cache)
+        if split is None:
+            split = cached_split_playlist(
+                m3u_base_filename,
+                sha256=download.sha256,
+                use_cache=load_option('PARSER', 'cache', True, bool),
+                **parser_options,
+            )
+    m3u_streams_filename = split.streams_filename
+    cam_titles = split.cam_titles
 
     # CAM-Ergebnisse in Blockliste schreiben und loggen
-    if cam_titles:
+    if playlist_unchanged:
+        logger.info("CAM: Playlist unverändert – Blockliste ist bereits aktuell.")
+    elif cam_titles and plan_only:
+        logger.info(f"CAM: {len(cam_titles)} Titel gefunden – Plan-Modus, Blockliste bleibt unverändert.")
+    elif cam_titles:
         logger.info("Beginne, CAM-Titel zur Blockliste hinzuzufügen …")
-        # Stelle sicher, dass der Blocklisten-Ordner existiert
-        os.makedirs(os.path.dirname(blockliste_path), exist_ok=True)
-
-        # Lade bestehende Blockliste, um Duplikate zu vermeiden
-        existing = set()
-        if os.path.exists(blockliste_path):
-            with open(blockliste_path, 'r', encoding='utf-8') as f:
-                existing = {line.strip() for line in f if line.strip()}
-
+        # Blockliste ist bereits geladen; neue Titel werden gesammelt und einmal geschrieben
         added_count = 0
         for original_title in cam_titles:
             safe_title = sanitize_filename(original_title)
-            if safe_title not in existing:
-                with open(blockliste_path, 'a', encoding='utf-8') as f:
-                    if os.path.getsize(blockliste_path) > 0:
-                        f.write('\n')
-                    f.write(safe_title)
-                existing.add(safe_title)
+            if blocklist.add(safe_title):
                 added_count += 1
                 logger.info(f"CAM: '{original_title}' -> Blockliste als '{safe_title}' hinzugefügt")
             else:
                 logger.info(f"CAM: '{original_title}' bereits in Blockliste als '{safe_title}'")
+        blocklist.flush()
 
         if added_count == 0:
             logger.info("CAM: Nichts Neues zur Blockliste hinzugefügt.")
@@ -63,39 +131,59 @@ def main ():
     else:
         logger.info("CAM: Keine Einträge gefunden – nichts zur Blockliste hinzugefügt.")
 
+    incremental = load_option('SYNC', 'incremental', True, bool)
     # check / erstelle m3u stream file
-    save_new_stream_m3u(m3u_streams_filename, path_m3u)
-    # check / erstelle movies .strm
-    movies_created, movies_deleted = save_new_movies_m3u(m3u_movies_filename, path_movie, blocklist)
-    # check / erstelle serien .strm
-    series_created, series_deleted = save_new_series_m3u(m3u_series_filename, path_serien, blocklist)
+    if not plan_only and not playlist_unchanged:
+        # Optional zusätzlich/stattdessen eine Datei pro Gruppe (jede nur bei eigener Änderung veröffentlicht)
+        stream_output = load_option('STREAMS', 'output', 'single').lower()
+        if stream_output in ('single', 'both'):
+            save_new_stream_m3u(m3u_streams_filename, path_m3u)
+        if stream_output in ('shards', 'both'):
+            save_stream_shards(
+                m3u_streams_filename,
+                path_m3u,
+                attribute=load_option('STREAMS', 'shard_by', 'group-title'),
+                pattern=load_option('STREAMS', 'shard_pattern', ''),
+                shard_dir=load_option('STREAMS', 'shard_dir', 'iptv_gruppen'),
+            )
+    # check / erstelle movies .strm und serien .strm
+    # Parallel: Filme und Serien teilen sich die URL-Check-Kapazität, Schreiben startet mit den ersten Ergebnissen
+    sync_movies = lambda: save_new_movies_m3u(split.movies, path_movie, blocklist, incremental, plan_only)
+    sync_series = lambda: save_new_series_m3u(split.series, path_serien, blocklist, incremental, plan_only)
+    if load_option('SYNC', 'parallel', True, bool):
+        (movies_created, movies_deleted), (series_created, series_deleted) = run_concurrently(sync_movies, sync_series)
+    else:
+        movies_created, movies_deleted = sync_movies()
+        series_created, series_deleted = sync_series()
 
-    # Zusammenfassung am Ende
-    total_created = len(movies_created) + len(series_created)
-    total_deleted = len(movies_deleted) + len(series_deleted)
-    logger.info("=" * 30)
-    logger.info("Zusammenfassung Änderungen:")
-    logger.info(f"Neu: Filme {len(movies_created)}, Serien {len(series_created)} (gesamt {total_created})")
-    logger.info(f"Gelöscht: Filme {len(movies_deleted)}, Serien {len(series_deleted)} (gesamt {total_deleted})")
+    # URL-Check-Ergebnisse für den nächsten Lauf sichern
+    flush_url_cache()
 
-    if movies_created:
-        logger.info("Neu (Filme): " + "; ".join(movies_created))
-    if series_created:
-        logger.info("Neu (Serien): " + "; ".join(series_created))
-    if movies_deleted:
-        logger.info("Gelöscht (Filme): " + "; ".join(movies_deleted))
-    if series_deleted:
-        logger.info("Gelöscht (Serien): " + "; ".join(series_deleted))
+    # Zusammenfassung am Ende
+    log_summary(movies_created, series_created, movies_deleted, series_deleted)
+    if plan_only:
+        logger.info("Plan-Modus: Pläne gespeichert in tmp/plan_movies.json und tmp/plan_series.json")
+        log_end()
+        return
     # Offline-Links speichern
     try:
         offline_count = dump_offline_json(Path.cwd() / "tmp" / "offline.json")
         logger.info(f"Offline-Einträge gespeichert: {offline_count} in offline.json")
     except Exception as e:
         logger.info(f"Konnte offline.json nicht schreiben: {e}")
+    # Erst nach erfolgreichem Sync merken, damit ein abgebrochener Lauf wiederholt wird
+    if download is not None:
+        mark_download_synced(download)
     # Done
     log_end()
 
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description="M3U-Playlist in .strm-Bibliotheken abgleichen")
+    parser.add_argument("--plan-only", action="store_true",
+                        help="Nur Änderungspläne nach tmp/ schreiben, keine Dateien ändern")
+    parser.add_argument("--cached", action="store_true",
+                        help="Nicht herunterladen, letzte geparste Playlist aus dem Parse-Cache verwenden")
+    args = parser.parse_args()
+    main(plan_only=args.plan_only, from_cache=args.cached)
@@ -0,0 +1,259 @@
+import fnmatch
+import re
+from typing import Iterable, Optional
+from logger import logger
+
+"""
+Regeln der Blockliste und ihr kombinierter Matcher.
+
+Jede Zeile der Blockliste ist eine Regel:
+- ``Titel``           – exakter (bereinigter) Titel bzw. Serien-/Ordnername (wie bisher)
+- ``prefix:Text``     – Titel beginnt mit ``Text``
+- ``glob:Muster``     – Titel passt auf ein Glob-Muster (``*``, ``?``, ``[...]``)
+- ``re:Ausdruck``     – regulärer Ausdruck irgendwo im Titel
+- ``serie:Regel``     – Regel für den Seriennamen statt den Episodentitel,
+  z. B. ``serie:Tatort (DE)`` oder ``serie:glob:Tatort*`` – sperrt alle Episoden
+
+Bereinigte Titel enthalten nie ``:`` (siehe ``sanitize_filename``), ein Präfix
+wie ``re:`` kann also nicht mit einem exakten Titel verwechselt werden.
+
+Exakte Titel liegen in einem Set. Präfixe werden zu einem Zeichen-Trie und mit
+den übrigen verankerten Regeln zu einem regulären Ausdruck zusammengefasst
+(``match`` ab Position 0). Alle ``re:``-Regeln bilden einen zweiten Ausdruck
+(``search`` über die Alternative), damit der Titel nicht pro Regel erneut
+durchsucht wird. Glob-Muster
+werden über ihren festen Textteil vorausgewählt: ein Trie aller Textteile
+findet in einem Durchlauf über den Titel die wenigen Muster, die überhaupt
+passen können. So kostet ein Titel auch bei Tausenden Regeln einen Durchlauf
+statt einen Test pro Regel.
+"""
+
+PREFIX = "prefix:"
+GLOB = "glob:"
+REGEX = "re:"
+SERIES = "serie:"
+
+_GLOBAL_FLAGS_RE = re.compile(r'\(\?([aiLmsux]+)\)')
+# Rückverweise (\1, (?P=name), (?(1)…)) und benannte Gruppen hängen an der Gruppennummerierung
+# bzw. an eindeutigen Namen – im kombinierten Ausdruck würden sie umnummeriert oder kollidieren
+_GROUP_REFERENCE_RE = re.compile(r'\\[1-9]|\(\?P[<=]|\(\?\(')
+
+
+def _trie_pattern(words: Iterable[str], prefix: bool = True) -> str:
+    """
+    Wörter als Zeichen-Trie in einem regulären Ausdruck (eine Verzweigung pro Zeichen statt pro Wort).
+
+    :param prefix: True → Treffer, sobald ein Wort vollständig gelesen ist (Präfix-Regeln);
+        False → längstes passendes Wort (Literale für die Vorauswahl)
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        # Präfix: Endet hier ein Wort, ist jede Fortsetzung ein Treffer – längere Wörter sind überflüssig
+        if prefix and "" in node:
+            return ""
+        alternatives = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alternatives:
+            return ""
+        group = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        if "" in node:
+            # Wort endet hier, längere Wörter mit gleichem Anfang bleiben möglich
+            return f"(?:{group})?"
+        return group
+
+    return build(trie)
+
+
+_GLOB_WILDCARDS_RE = re.compile(r'\*|\?|\[[^\]]*\]')
+# Kürzere Literale würden in fast jedem Titel vorkommen und nichts vorfiltern
+_MIN_LITERAL = 3
+
+
+def _glob_literal(glob: str) -> str:
+    """Längster fester Textteil eines Glob-Musters (muss in jedem Treffer vorkommen)."""
+    return max(_GLOB_WILDCARDS_RE.split(glob), key=len)
+
+
+class _Compiled:
+    """Fertig übersetzte Regeln; wird als Ganzes ausgetauscht (parallel laufende Prüfungen)."""
+
+    __slots__ = ("anchored", "fallback", "searched", "isolated", "literals", "by_literal", "lengths")
+
+    def __init__(self, anchored=None, fallback=(), searched=None, isolated=(), literals=None, by_literal=None,
+                 lengths=()):
+        # match() ab Position 0: Präfix-Trie und Glob-Muster ohne Literal (bzw. einzeln als Fallback)
+        self.anchored: Optional[re.Pattern] = anchored
+        self.fallback: tuple = tuple(fallback)
+        # search(): alle kombinierbaren re:-Regeln in einem Ausdruck, übrige einzeln
+        self.searched: Optional[re.Pattern] = searched
+        self.isolated: tuple = tuple(isolated)
+        self.literals: Optional[re.Pattern] = literals
+        self.by_literal: dict[str, list[re.Pattern]] = by_literal or {}
+        self.lengths: tuple = tuple(lengths)
+
+
+class _RuleSet:
+    """
+    Exakte Werte (Set) + Präfix-, Glob- und Regex-Regeln.
+
+    - Präfixe und Glob-Muster ohne brauchbares Literal: ein kombinierter Ausdruck (``match``)
+    - Glob-Muster mit festem Textteil: ein Trie aller Textteile sucht in einem Durchlauf,
+      welche Textteile im Titel vorkommen; nur deren Muster werden danach geprüft
+    - Regex-Regeln: ein kombinierter Ausdruck (``search``); Regeln mit Rückverweisen oder
+      benannten Gruppen einzeln übersetzt
+    """
+
+    def __init__(self):
+        self.exact: set[str] = set()
+        self.prefixes: list[str] = []
+        # (Literal oder "", Ausdruck für match())
+        self.patterns: list[tuple[str, str]] = []
+        # re:-Regeln (für search(), ohne eigenes ".*?" – sonst durchsucht jede Regel den Titel erneut)
+        self.regexes: list[str] = []
+        # Regex-Regeln, die nicht kombiniert werden können (Rückverweise, benannte Gruppen)
+        self.isolated: list[str] = []
+        self._compiled = _Compiled()
+        # Neue Muster → beim nächsten Treffer-Test neu übersetzen (exakte Titel brauchen das nicht)
+        self._stale = False
+
+    def add(self, rule: str, line: str) -> None:
+        if rule.startswith(PREFIX):
+            if rule[len(PREFIX):]:
+                self.prefixes.append(rule[len(PREFIX):])
+                self._stale = True
+        elif rule.startswith(GLOB):
+            glob = rule[len(GLOB):]
+            literal = _glob_literal(glob)
+            # fnmatch.translate verankert am Ende (\Z), match() am Anfang
+            self.patterns.append((literal if len(literal) >= _MIN_LITERAL else "", fnmatch.translate(glob)))
+            self._stale = True
+        elif rule.startswith(REGEX):
+            pattern = rule[len(REGEX):]
+            # Globale Flags am Anfang (z. B. "(?i)") gelten im kombinierten Ausdruck nur für diese Regel
+            flags = _GLOBAL_FLAGS_RE.match(pattern)
+            if flags:
+                pattern = f"(?{flags.group(1)}:{pattern[flags.end():]})"
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                logger.warning(f"Blockliste: ungültiger regulärer Ausdruck ignoriert: {line!r} ({e})")
+                return
+            if _GROUP_REFERENCE_RE.search(pattern):
+                self.isolated.append(pattern)
+            else:
+                self.regexes.append(pattern)
+            self._stale = True
+        else:
+            self.exact.add(rule)
+
+    def compile(self) -> None:
+        parts = [part for literal, part in self.patterns if not literal]
+        if self.prefixes:
+            parts.insert(0, _trie_pattern(self.prefixes))
+        anchored, fallback = None, []
+        if parts:
+            try:
+                anchored = re.compile("|".join(f"(?:{part})" for part in parts))
+            except re.error as e:
+                # Sicherheitsnetz, falls sich Regeln trotz Einzelprüfung nicht kombinieren lassen
+                logger.warning(f"Blockliste: Regeln lassen sich nicht kombinieren ({e}) – prüfe einzeln")
+                fallback = [re.compile(part) for part in parts]
+
+        searched, isolated = None, [re.compile(pattern) for pattern in self.isolated]
+        if self.regexes:
+            try:
+                searched = re.compile("|".join(f"(?:{pattern})" for pattern in self.regexes))
+            except re.error as e:
+                logger.warning(f"Blockliste: Regex-Regeln lassen sich nicht kombinieren ({e}) – prüfe einzeln")
+                isolated.extend(re.compile(pattern) for pattern in self.regexes)
+
+        by_literal: dict[str, list[re.Pattern]] = {}
+        for literal, part in self.patterns:
+            if literal:
+                by_literal.setdefault(literal, []).append(re.compile(part))
+        literals = None
+        if by_literal:
+            # Lookahead: an jeder Position das längste Literal, ohne Zeichen zu verbrauchen
+            literals = re.compile(f"(?=({_trie_pattern(by_literal, prefix=False)}))")
+
+        # Erst fertig bauen, dann tauschen – parallel laufende Prüfungen sehen nie einen halben Stand
+        self._compiled = _Compiled(anchored, fallback, searched, isolated, literals, by_literal,
+                                   sorted({len(k) for k in by_literal}))
+        self._stale = False
+
+    def matches(self, value: str) -> bool:
+        if value in self.exact:
+            return True
+        if self._stale:
+            self.compile()
+        compiled = self._compiled
+        if compiled.anchored is not None:
+            if compiled.anchored.match(value) is not None:
+                return True
+        elif any(pattern.match(value) for pattern in compiled.fallback):
+            return True
+        if compiled.searched is not None and compiled.searched.search(value) is not None:
+            return True
+        if any(pattern.search(value) for pattern in compiled.isolated):
+            return True
+        if compiled.literals is None:
+            return False
+        for found in compiled.literals.finditer(value):
+            text = found.group(1)
+            # Auch kürzere Literale, die an derselben Stelle beginnen
+            for length in compiled.lengths:
+                if length > len(text):
+                    break
+                candidates = compiled.by_literal.get(text[:length])
+                if candidates and any(pattern.match(value) for pattern in candidates):
+                    return True
+        return False
+
+
+class BlocklistMatcher:
+    def __init__(self, rules: Iterable[str]):
+        """
+        :param rules: Zeilen der Blockliste (siehe Modul-Docstring)
+        """
+        self._titles = _RuleSet()
+        self._series = _RuleSet()
+        for line in rules:
+            self.add(line)
+        self.compile()
+
+    def add(self, line: str) -> None:
+        """Weitere Regel aufnehmen; Muster werden beim nächsten Test neu kombiniert."""
+        rule = line.strip()
+        if not rule:
+            return
+        if rule.startswith(SERIES):
+            self._series.add(rule[len(SERIES):], rule)
+        else:
+            self._titles.add(rule, rule)
+
+    def compile(self) -> None:
+        self._titles.compile()
+        self._series.compile()
+
+    def blocks(self, title: str) -> bool:
+        """True, wenn der (bereinigte) Titel gesperrt ist."""
+        return self._titles.matches(title)
+
+    def blocks_series(self, series_name: str) -> bool:
+        """True, wenn die ganze Serie gesperrt ist (``serie:``-Regel oder exakter Eintrag wie bisher)."""
+        return series_name in self._titles.exact or self._series.matches(series_name)
+
+    def describe(self) -> str:
+        """Kurzbeschreibung fürs Log."""
+        titles, series = self._titles, self._series
+        return (
+            f"{len(titles.exact)} Titel, {len(titles.prefixes)} Präfixe, "
+            f"{len(titles.patterns) + len(titles.regexes) + len(titles.isolated)} Muster, "
+            f"{len(series.exact) + len(series.prefixes) + len(series.patterns) + len(series.regexes) + len(series.isolated)}"
+            f" Serien-Regeln"
+        )
@@ -0,0 +1,144 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Iterator, Optional, Union
+from logger import logger
+from src.blocklist_rules import BlocklistMatcher
+from src.run_state import ensure_state_dir
+
+try:
+    import fcntl
+except ImportError:  # Windows: kein flock, Schreiben bleibt atomar über os.replace
+    fcntl = None
+
+"""
+Blockliste (eine Regel pro Zeile, siehe ``src.blocklist_rules``) für main.py und cleaner.py.
+
+Die Datei wird einmal gelesen und zu einem kombinierten Matcher übersetzt;
+``title in store`` prüft gegen alle Regeln (exakt, Präfix, Glob, Regex).
+``add`` merkt neue Titel nur vor. ``flush`` schreibt alle vorgemerkten Titel
+in einem Schritt: unter einer Dateisperre wird die Datei neu gelesen, damit
+Einträge eines parallel laufenden Tools erhalten bleiben, und dann über eine
+temporäre Datei + ``os.replace`` ersetzt. So schreibt z. B. der Cleaner alle
+doppelten Filme bzw. Staffeln eines Laufs mit einem Schreibvorgang.
+
+Die Sperrdatei liegt in state/ (``blocklist_<Name>_<Hash>.lock``, siehe
+``lock_path``) statt neben der Blockliste – der Blocklisten-Ordner (oft ein
+NAS-/Jellyfin-Ordner) bleibt frei von Hilfsdateien. Die Blockliste selbst kann
+nicht gesperrt werden, da ``os.replace`` sie durch eine neue Datei ersetzt.
+main.py und cleaner.py müssen dafür aus demselben Projektordner laufen.
+"""
+
+
+def lock_path(path: Union[Path, str]) -> Path:
+    """state/blocklist_<Dateiname>_<Hash des absoluten Pfads>.lock – eindeutig pro Blockliste."""
+    path = os.path.abspath(str(path))
+    digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:8]
+    return ensure_state_dir() / f"blocklist_{Path(path).name}_{digest}.lock"
+
+
+class BlocklistStore:
+    def __init__(self, path: Optional[Union[Path, str]]):
+        """
+        :param path: Pfad zur Blocklistendatei; leer/None → nur im Speicher (nichts wird geschrieben)
+        """
+        self.path = Path(path) if path else None
+        self._entries: set[str] = set()
+        self._pending: list[str] = []
+        self._matcher = BlocklistMatcher(())
+        self.reload()
+
+    def _read(self) -> list[str]:
+        if self.path is None or not self.path.is_file():
+            return []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+
+    def reload(self) -> None:
+        """Datei neu einlesen (vorgemerkte, noch nicht geschriebene Titel bleiben erhalten)."""
+        self._entries = set(self._read())
+        self._entries.update(self._pending)
+        self._matcher = BlocklistMatcher(self._entries)
+
+    def __contains__(self, title: str) -> bool:
+        """True, wenn der (bereinigte) Titel von einer Regel gesperrt wird."""
+        return self._matcher.blocks(title)
+
+    def blocks_series(self, series_name: str) -> bool:
+        """True, wenn die ganze Serie gesperrt ist (exakter Eintrag oder ``serie:``-Regel)."""
+        return self._matcher.blocks_series(series_name)
+
+    def describe(self) -> str:
+        return self._matcher.describe()
+
+    def __len__(self) -> int:
+        """Anzahl Regeln (Zeilen)."""
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    @property
+    def pending(self) -> int:
+        """Anzahl vorgemerkter, noch nicht geschriebener Titel."""
+        return len(self._pending)
+
+    def add(self, title: str) -> bool:
+        """
+        Titel oder Regel (z. B. ``prefix:…``) vormerken (geschrieben wird erst mit ``flush``).
+
+        :return: True, wenn neu; False, wenn die Zeile existiert oder eine Regel den Titel schon sperrt
+        """
+        title = title.strip()
+        if not title or title in self._entries or self._matcher.blocks(title):
+            return False
+        self._entries.add(title)
+        self._pending.append(title)
+        self._matcher.add(title)
+        return True
+
+    def flush(self) -> int:
+        """
+        Vorgemerkte Titel atomar an die Datei anhängen.
+
+        :return: Anzahl tatsächlich neu geschriebener Titel
+        """
+        if not self._pending or self.path is None:
+            return 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(lock_path(self.path), 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Unter der Sperre neu lesen: ein anderes Tool kann inzwischen geschrieben haben
+            current = ''
+            if self.path.is_file():
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    current = f.read()
+            known = {line.strip() for line in current.splitlines() if line.strip()}
+            new = [title for title in dict.fromkeys(self._pending) if title not in known]
+            if new:
+                content = current
+                if content and not content.endswith('\n'):
+                    content += '\n'
+                content += '\n'.join(new)
+                tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+                try:
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        f.write(content)
+                    os.replace(tmp_path, self.path)
+                except BaseException:
+                    tmp_path.unlink(missing_ok=True)
+                    raise
+            for line in known - self._entries:
+                self._entries.add(line)
+                self._matcher.add(line)
+        self._pending.clear()
+        if new:
+            logger.info(f"Blockliste: {len(new)} neue Einträge gespeichert ({self.path})")
+        return len(new)
+
+    def __enter__(self) -> "BlocklistStore":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.flush()
@@ -0,0 +1,165 @@
+import hashlib
+import re
+from typing import Iterable, Optional
+from functions import load_option
+
+"""
+Regeln zur Einordnung von Playlist-Einträgen (Abschnitt [CLASSIFY] in CONFIG.ini).
+
+- ``video_extensions``: URL-Endungen von Filmen/Serien; alles andere ist Live-TV (Stream)
+- ``language_markers``: mindestens einer muss in Titel, tvg-name oder group-title stehen
+  (``*`` → keine Sprachfilterung)
+- ``exclude_markers``: Einträge mit diesen Markern werden übersprungen
+- ``cam_markers``: Kino-Aufnahmen (CAM) – werden gesammelt und gesperrt,
+  Groß-/Kleinschreibung egal. Standard ist wie bisher nur ``(CAM)``; ``[CAM]``
+  und ``HDCAM`` müssen ausdrücklich eingetragen werden (sie sperren mehr Titel)
+- ``movie_url_patterns`` / ``series_url_patterns``: Pfadteile der URL
+
+Alle Marker werden in einen regulären Ausdruck mit benannten Gruppen übersetzt,
+der einmal pro Eintrag über Titel, tvg-name und group-title läuft – weitere
+Sprachen oder Qualitätsmarker kosten keinen zusätzlichen Durchlauf. Splitter
+(``classify_entry``) und Cleaner (``cam_scan_log``) nutzen dieselben Regeln; der
+Cleaner-Scan (nur Log) prüft zusätzlich seine bisherigen Marker
+(``SCAN_CAM_MARKERS``).
+"""
+
+STREAM = "stream"
+MOVIE = "movie"
+SERIES = "series"
+CAM = "cam"
+
+DEFAULT_VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.ts', '.mpg')
+DEFAULT_LANGUAGE_MARKERS = ('(DE)', '[DE]')
+DEFAULT_CAM_MARKERS = ('(CAM)',)
+# Bisherige Marker des Cleaner-Scans; beim Aufteilen nur, wenn in cam_markers eingetragen
+SCAN_CAM_MARKERS = ('(CAM)', '[CAM]', 'HDCAM')
+DEFAULT_MOVIE_URL_PATTERNS = ('/movie/',)
+DEFAULT_SERIES_URL_PATTERNS = ('/series/',)
+
+_LANGUAGE = "lang"
+_EXCLUDE = "exclude"
+
+
+def _alternation(values: Iterable[str]) -> str:
+    # Längere Marker zuerst, damit z. B. "HDCAM" nicht hinter einem kürzeren Treffer verschwindet
+    return "|".join(re.escape(v) for v in sorted(set(values), key=len, reverse=True))
+
+
+def _option_list(key: str, fallback: tuple) -> tuple:
+    """Kommagetrennte Liste aus [CLASSIFY]; leer → ``fallback``, ``*`` → keine Einträge."""
+    value = load_option('CLASSIFY', key, None)
+    if value is None:
+        return fallback
+    if value == '*':
+        return ()
+    return tuple(part.strip() for part in value.split(',') if part.strip())
+
+
+class Classifier:
+    def __init__(self, video_extensions: Iterable[str] = DEFAULT_VIDEO_EXTENSIONS,
+                 language_markers: Iterable[str] = DEFAULT_LANGUAGE_MARKERS,
+                 cam_markers: Iterable[str] = DEFAULT_CAM_MARKERS,
+                 exclude_markers: Iterable[str] = (),
+                 movie_url_patterns: Iterable[str] = DEFAULT_MOVIE_URL_PATTERNS,
+                 series_url_patterns: Iterable[str] = DEFAULT_SERIES_URL_PATTERNS):
+        """
+        :param video_extensions: URL-Endungen von Filmen/Serien (ohne Beachtung der Groß-/Kleinschreibung)
+        :param language_markers: Sprachmarker; leer → alle Sprachen
+        :param cam_markers: CAM-Marker (ohne Beachtung der Groß-/Kleinschreibung)
+        :param exclude_markers: Marker, die einen Eintrag ausschließen
+        :param movie_url_patterns: Pfadteile der URL für Filme
+        :param series_url_patterns: Pfadteile der URL für Serien (Filme haben Vorrang)
+        """
+        self.movie_url_patterns = tuple(movie_url_patterns)
+        self.series_url_patterns = tuple(series_url_patterns)
+        self.video_extensions = tuple(ext.lower() for ext in video_extensions)
+        self.language_markers = tuple(language_markers)
+        self.cam_markers = tuple(cam_markers)
+        self.exclude_markers = tuple(exclude_markers)
+
+        groups = []
+        if self.cam_markers:
+            groups.append(f"(?P<{CAM}>(?i:{_alternation(self.cam_markers)}))")
+        if self.exclude_markers:
+            groups.append(f"(?P<{_EXCLUDE}>{_alternation(self.exclude_markers)})")
+        if self.language_markers:
+            groups.append(f"(?P<{_LANGUAGE}>{_alternation(self.language_markers)})")
+        self._markers: Optional[re.Pattern] = re.compile("|".join(groups)) if groups else None
+
+        url_groups = []
+        if self.movie_url_patterns:
+            url_groups.append(f"(?P<{MOVIE}>{_alternation(self.movie_url_patterns)})")
+        if self.series_url_patterns:
+            url_groups.append(f"(?P<{SERIES}>{_alternation(self.series_url_patterns)})")
+        self._url_paths: Optional[re.Pattern] = re.compile("|".join(url_groups)) if url_groups else None
+
+    @classmethod
+    def from_config(cls) -> "Classifier":
+        return cls(
+            video_extensions=_option_list('video_extensions', DEFAULT_VIDEO_EXTENSIONS),
+            language_markers=_option_list('language_markers', DEFAULT_LANGUAGE_MARKERS),
+            cam_markers=_option_list('cam_markers', DEFAULT_CAM_MARKERS),
+            exclude_markers=_option_list('exclude_markers', ()),
+            movie_url_patterns=_option_list('movie_url_patterns', DEFAULT_MOVIE_URL_PATTERNS),
+            series_url_patterns=_option_list('series_url_patterns', DEFAULT_SERIES_URL_PATTERNS),
+        )
+
+    def fingerprint(self) -> str:
+        """Kurzer Hash der Regeln (z. B. damit der Parse-Cache bei geänderten Regeln verfällt)."""
+        rules = (self.video_extensions, self.language_markers, self.cam_markers, self.exclude_markers,
+                 self.movie_url_patterns, self.series_url_patterns)
+        return hashlib.sha1(repr(rules).encode("utf-8")).hexdigest()[:16]
+
+    def markers(self, *texts: str) -> set[str]:
+        """Gefundene Marker-Arten (CAM, Sprache, Ausschluss) in einem Durchlauf über alle Texte."""
+        if self._markers is None:
+            return set()
+        # Zeilenumbruch als Trenner: Marker enthalten keinen, Treffer über Textgrenzen sind ausgeschlossen
+        text = "\n".join(t for t in texts if t)
+        return {match.lastgroup for match in self._markers.finditer(text)}
+
+    def is_video_url(self, url: str) -> bool:
+        return url.lower().endswith(self.video_extensions)
+
+    def is_cam(self, name: str) -> bool:
+        """CAM-Marker im Namen (z. B. Jellyfin-Titel im Cleaner)."""
+        return bool(name) and CAM in self.markers(name)
+
+    def url_kind(self, url: str) -> Optional[str]:
+        """MOVIE oder SERIES anhand des URL-Pfads (Film hat Vorrang), sonst None."""
+        if self._url_paths is None:
+            return None
+        found = {match.lastgroup for match in self._url_paths.finditer(url)}
+        if MOVIE in found:
+            return MOVIE
+        if SERIES in found:
+            return SERIES
+        return None
+
+    def classify(self, entry) -> Optional[str]:
+        """
+        STREAM, MOVIE, SERIES, CAM oder None (überspringen) für einen Eintrag
+        mit ``url``, ``title``, ``tvg_name`` und ``group_title``.
+        """
+        if not self.is_video_url(entry.url):
+            return STREAM
+
+        found = self.markers(entry.title, entry.tvg_name, entry.group_title)
+        if self.language_markers and _LANGUAGE not in found:
+            return None
+        if _EXCLUDE in found:
+            return None
+        if CAM in found:
+            return CAM
+        return self.url_kind(entry.url)
+
+
+_classifier: Optional[Classifier] = None
+
+
+def get_classifier() -> Classifier:
+    """Regeln aus der Konfiguration, einmal pro Prozess übersetzt."""
+    global _classifier
+    if _classifier is None:
+        _classifier = Classifier.from_config()
+    return _classifier
@@ -1,76 +1,119 @@
+import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from logger import logger, log_start, log_end
-from functions import load_config
+from functions import load_config, load_option
+
+"""
+Entfernt Film-, Staffel- und Serien-Ordner ohne .strm.
+
+Jeder Ordner wird genau einmal per ``os.scandir`` gelesen: Ob ein Ordner eine
+.strm enthält, ergibt sich von unten nach oben aus seinen Einträgen (Abbruch,
+sobald eine .strm gefunden ist); Serien werden aus dem Ergebnis ihrer Staffeln
+bewertet statt erneut durchsucht. Die obersten Ordner werden parallel gelesen
+(``[CLEANUP] workers``), gelöscht werden nur die größten Teilbäume ohne .strm.
+"""
+
+
+def _scandir(path: Path) -> tuple[list[Path], bool]:
+    """(Unterordner, enthält direkt eine .strm) – Symlinks auf Ordner werden nicht verfolgt."""
+    subdirs = []
+    has_strm = False
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(Path(entry.path))
+            elif entry.name.endswith('.strm'):
+                has_strm = True
+    return subdirs, has_strm
+
+
+def contains_strm(path: Path) -> bool:
+    """True, wenn unterhalb von ``path`` (rekursiv) eine .strm liegt; jeder Ordner wird höchstens einmal gelesen."""
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        try:
+            subdirs, has_strm = _scandir(current)
+        except OSError as e:
+            # Nicht lesbar → sicherheitshalber als "enthält .strm" werten, damit nichts gelöscht wird
+            logger.info(f"Ordner nicht lesbar {current}: {e}")
+            return True
+        if has_strm:
+            return True
+        stack.extend(subdirs)
+    return False
+
 
+def _top_dirs(path: Path) -> list[Path]:
+    subdirs, _ = _scandir(path)
+    return sorted(subdirs)
 
-def dir_has_strm(p: Path) -> bool:
+
+def _series_seasons(series_dir: Path):
+    """[(Staffel-Ordner, enthält .strm)] einer Serie; None, wenn der Ordner nicht lesbar ist."""
     try:
-        next(p.rglob('*.strm'))
+        seasons = _top_dirs(series_dir)
+    except OSError as e:
+        logger.info(f"Ordner nicht lesbar {series_dir}: {e}")
+        return None
+    return [(season_dir, contains_strm(season_dir)) for season_dir in seasons]
+
+
+def _remove(path: Path, label: str) -> bool:
+    try:
+        shutil.rmtree(path)
+        logger.info(f"{label}: {path}")
         return True
-    except StopIteration:
+    except OSError as e:
+        logger.info(f"Fehler beim Löschen von {path}: {e}")
         return False
 
 
+def _workers() -> int:
+    return max(1, load_option('CLEANUP', 'workers', 8, int))
+
+
 def cleanup_movies(path_movie: Path) -> int:
     logger.info("= Filme: Prüfe Ordner auf .strm …")
-    removed = 0
     if not path_movie.exists():
         logger.info(f"Film-Pfad existiert nicht: {path_movie}")
         return 0
-    for child in sorted(path_movie.iterdir()):
-        if not child.is_dir():
-            continue
-        if not dir_has_strm(child):
-            try:
-                shutil.rmtree(child)
-                removed += 1
-                logger.info(f"Film-Ordner ohne .strm gelöscht: {child}")
-            except OSError as e:
-                logger.info(f"Fehler beim Löschen von {child}: {e}")
+
+    movie_dirs = _top_dirs(path_movie)
+    with ThreadPoolExecutor(max_workers=_workers(), thread_name_prefix="cleanup") as pool:
+        has_strm = list(pool.map(contains_strm, movie_dirs))
+        empty = [d for d, ok in zip(movie_dirs, has_strm) if not ok]
+        removed = sum(pool.map(lambda d: _remove(d, "Film-Ordner ohne .strm gelöscht"), empty))
+
     logger.info(f"= Filme: Entfernte Ordner: {removed}")
     return removed
 
 
 def cleanup_series(path_series: Path) -> tuple[int, int]:
     logger.info("= Serien: Prüfe Staffel-/Serien-Ordner auf .strm …")
-    removed_seasons = 0
-    removed_series = 0
-
     if not path_series.exists():
         logger.info(f"Serien-Pfad existiert nicht: {path_series}")
         return 0, 0
 
-    for series_dir in sorted(path_series.iterdir()):
-        if not series_dir.is_dir():
-            continue
+    series_dirs = _top_dirs(path_series)
+    with ThreadPoolExecutor(max_workers=_workers(), thread_name_prefix="cleanup") as pool:
+        scanned = list(pool.map(_series_seasons, series_dirs))
 
-        # Staffeln ohne .strm entfernen
-        for season_dir in sorted(series_dir.iterdir()):
-            if not season_dir.is_dir():
+        # Serie ohne Staffel mit .strm → ganze Serie löschen; sonst nur die leeren Staffeln
+        series_to_remove = []
+        seasons_to_remove = []
+        for series_dir, seasons in zip(series_dirs, scanned):
+            if seasons is None:
                 continue
-            if not dir_has_strm(season_dir):
-                try:
-                    shutil.rmtree(season_dir)
-                    removed_seasons += 1
-                    logger.info(f"Staffel-Ordner ohne .strm gelöscht: {season_dir}")
-                except OSError as e:
-                    logger.info(f"Fehler beim Löschen von {season_dir}: {e}")
-
-        # Serie löschen, wenn keine Staffel-Ordner mehr vorhanden ODER keine .strm mehr in der Serie
-        try:
-            season_dirs_left = [d for d in series_dir.iterdir() if d.is_dir()]
-        except FileNotFoundError:
-            # Wurde ggf. bereits entfernt, wenn parent leer war
-            continue
-
-        if not season_dirs_left or not dir_has_strm(series_dir):
-            try:
-                shutil.rmtree(series_dir)
-                removed_series += 1
-                logger.info(f"Serien-Ordner gelöscht: {series_dir}")
-            except OSError as e:
-                logger.info(f"Fehler beim Löschen von {series_dir}: {e}")
+            if not any(ok for _, ok in seasons):
+                series_to_remove.append(series_dir)
+            else:
+                seasons_to_remove.extend(season_dir for season_dir, ok in seasons if not ok)
+
+        removed_seasons = sum(pool.map(lambda d: _remove(d, "Staffel-Ordner ohne .strm gelöscht"), seasons_to_remove))
+        removed_series = sum(pool.map(lambda d: _remove(d, "Serien-Ordner gelöscht"), series_to_remove))
 
     logger.info(f"= Serien: Entfernte Staffeln: {removed_seasons}, entfernte Serien: {removed_series}")
     return removed_seasons, removed_series
@@ -91,4 +134,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
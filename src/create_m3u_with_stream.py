@@ -1,6 +1,7 @@
 import os
 from logger import logger
 from pathlib import Path
+from src.m3u_parser import iter_entries, classify_entry, STREAM
 
 def create_m3u_with_stream(filename):
     logger.info("Erstelle m3u mit NUR Streams..")
@@ -12,25 +13,13 @@ def create_m3u_with_stream(filename):
     input_file = os.path.join(tmp_dir, filename)
     output_file = os.path.join(tmp_dir, new_filename)
 
-    with open(input_file, 'r', encoding='utf-8', errors='ignore') as f:
-        lines = f.readlines()
-
-    filtered_lines = ['#EXTM3U\n']
-    i = 1  # Start nach Header
-
-    while i < len(lines) - 1:
-        line_info = lines[i].strip()
-        line_url = lines[i + 1].strip()
-
-        # Nur behalten, wenn die URL nicht auf .mp4 || .mkv || .avi || .ts || .mpg  endet
-        if not line_url.lower().endswith(('.mp4', '.mkv', '.avi', '.ts', '.mpg')):
-            filtered_lines.append(line_info + '\n')
-            filtered_lines.append(line_url + '\n')
-
-        i += 2  # zum nächsten Paar
-
+    # Einträge werden direkt beim Lesen geschrieben (kein readlines())
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.writelines(filtered_lines)
+        f.write('#EXTM3U\n')
+        for entry in iter_entries(input_file):
+            # Nur behalten, wenn die URL nicht auf eine Video-Endung endet ([CLASSIFY] video_extensions)
+            if classify_entry(entry) == STREAM:
+                f.write('\n'.join(entry.lines()) + '\n')
 
     logger.info("m3u mit nur Streams erstellt...")
-    return new_filename
\ No newline at end of file
+    return new_filename
@@ -1,12 +1,81 @@
+import hashlib
 import logging
 import os
+import re
+import time
 import requests
+from dataclasses import dataclass
 from datetime import  datetime
 from logger import logger
 from pathlib import Path
+from src.run_state import load_state, save_state, delete_state
 
-def delete_all_files_in_tmp(tmp_dir):
+# Name der State-Datei (state/download.json) mit ETag, Last-Modified und Hash
+DOWNLOAD_STATE = "download"
+# State zum angefangenen Download (für Range-Fortsetzung, auch über Läufe hinweg)
+PART_STATE = "download_part"
+# Zwischendatei während des Downloads (wird erst danach umbenannt)
+PART_FILENAME = "download.m3u.part"
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+_CONTENT_RANGE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)", re.IGNORECASE)
+
+
+class IncompleteDownloadError(requests.exceptions.RequestException):
+    """Download endete vor der erwarteten Größe (Content-Length)."""
+
+
+class StalePartError(requests.exceptions.RequestException):
+    """Die .part-Datei passt nicht mehr zur Playlist auf dem Server (416 oder zu kurzer Content-Range)."""
+
+
+@dataclass
+class DownloadResult:
+    filename: str
+    changed: bool
+    sha256: str = ""
+    etag: str = ""
+    last_modified: str = ""
+    url: str = ""
+    size: int = 0
+    line_count: int = 0
+
+
+class _DownloadProgress:
+    """Laufender SHA-256, Größe und Zeilenanzahl der bereits geschriebenen Bytes."""
+
+    def __init__(self):
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.line_count = 0
+        self.last_byte = b""
+
+    def feed(self, chunk: bytes) -> None:
+        self.digest.update(chunk)
+        self.size += len(chunk)
+        self.line_count += chunk.count(b"\n")
+        self.last_byte = chunk[-1:]
+
+    @classmethod
+    def from_file(cls, path, chunk_size):
+        """Liest eine vorhandene .part-Datei ein, um Hash/Zähler fortzusetzen."""
+        progress = cls()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                progress.feed(chunk)
+        return progress
+
+    def total_lines(self) -> int:
+        # Letzte Zeile ohne abschließendes \n mitzählen
+        if self.size and self.last_byte != b"\n":
+            return self.line_count + 1
+        return self.line_count
+
+
+def delete_all_files_in_tmp(tmp_dir, keep=()):
     for filename in os.listdir(tmp_dir):
+        if filename in keep:
+            continue
         file_path = os.path.join(tmp_dir, filename)
         try:
             if os.path.isfile(file_path):
@@ -16,26 +85,262 @@ def delete_all_files_in_tmp(tmp_dir):
             logger.info(f"Fehler beim Löschen von {file_path}: {e}")
 
 
+def mark_download_synced(result: DownloadResult) -> None:
+    """
+    Merkt sich ETag/Last-Modified/Hash des Downloads. Wird erst nach einem
+    vollständig erfolgreichen Sync aufgerufen, damit ein abgebrochener Lauf
+    beim nächsten Mal nicht fälschlich als "unverändert" gilt.
+    """
+    save_state(DOWNLOAD_STATE, {
+        "url": result.url,
+        "filename": result.filename,
+        "sha256": result.sha256,
+        "etag": result.etag,
+        "last_modified": result.last_modified,
+        "size": result.size,
+        "line_count": result.line_count,
+        "synced_at": datetime.now().isoformat(timespec="seconds"),
+    })
+
+
+def _if_range_validator(headers) -> str:
+    """
+    Validator für If-Range: starkes ETag, sonst Last-Modified. Schwache ETags (``W/``)
+    sind für If-Range nicht erlaubt; ohne Validator erkennt der Server eine geänderte
+    Playlist nicht und hängt neue Bytes an einen alten Anfang.
+    """
+    etag = headers.get("ETag", "")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified", "")
+
+
+def _load_part_meta(url, part_path, same_run=False):
+    """
+    Liefert die Metadaten eines fortsetzbaren .part-Downloads oder None.
+
+    :param same_run: True → Wiederholung im selben Lauf; sonst (neuer Lauf) nur mit If-Range-Validator
+    """
+    meta = load_state(PART_STATE)
+    if not meta or meta.get("url") != url or not meta.get("resumable"):
+        return None
+    if not same_run and not meta.get("if_range"):
+        return None
+    if not part_path.exists() or part_path.stat().st_size == 0:
+        return None
+    return meta
+
+
+def discard_part(part_path) -> None:
+    """Angefangenen Download verwerfen (.part-Datei und state/download_part.json)."""
+    Path(part_path).unlink(missing_ok=True)
+    delete_state(PART_STATE)
 
 
-def download_m3u(url):
+def _expected_total(response, offset):
+    """Erwartete Gesamtgröße aus Content-Range bzw. Content-Length (sonst None)."""
+    if response.headers.get("Content-Encoding", "identity").lower() not in ("", "identity"):
+        # Bei Kompression bezieht sich Content-Length auf die komprimierten Bytes
+        return None
+    match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+    if match and match.group(3) != "*":
+        return int(match.group(3))
+    content_length = response.headers.get("Content-Length")
+    if content_length and content_length.isdigit():
+        return offset + int(content_length)
+    return None
+
+
+def _fetch(session, url, headers, part_path, part_meta, chunk_size, timeout):
+    """
+    Ein Download-Versuch. Setzt eine vorhandene .part-Datei per Range fort.
+
+    :return: None bei 304, sonst (response, progress)
+    """
+    headers = dict(headers)
+    offset = 0
+    if part_meta:
+        offset = part_path.stat().st_size
+        headers["Range"] = f"bytes={offset}-"
+        # Range nur auf unkomprimierte Bytes sinnvoll
+        headers["Accept-Encoding"] = "identity"
+        if part_meta.get("if_range"):
+            headers["If-Range"] = part_meta["if_range"]
+        # Bei Fortsetzung keine bedingte Anfrage – es geht um die angefangene Datei
+        headers.pop("If-None-Match", None)
+        headers.pop("If-Modified-Since", None)
+
+    response = session.get(url, headers=headers, stream=True, timeout=timeout)
+
+    if response.status_code == 304:
+        response.close()
+        return None
+    if offset and response.status_code == 416:
+        # Range nicht erfüllbar: Playlist auf dem Server ist kürzer/anders als die .part-Datei
+        response.close()
+        raise StalePartError(f"Range ab Byte {offset} nicht erfüllbar (416)")
+    if response.status_code >= 500:
+        response.close()
+        raise requests.exceptions.ConnectionError(f"Serverfehler {response.status_code}")
+    response.raise_for_status()  # Prüft auf HTTP-Fehler
+
+    resumed = False
+    if offset and response.status_code == 206:
+        match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+        if not match or int(match.group(1)) != offset or (match.group(3) != "*" and int(match.group(3)) < offset):
+            # Teilantwort passt nicht zur .part-Datei – ihr Inhalt kann nicht angehängt werden
+            response.close()
+            raise StalePartError(f"Content-Range {response.headers.get('Content-Range', '')!r} passt nicht zu Byte {offset}")
+        resumed = True
+    if offset and not resumed:
+        logger.info("Server setzt den Download nicht fort – starte von vorn.")
+        offset = 0
+
+    encoding = response.headers.get("Content-Encoding", "identity").lower()
+    # Bei Fortsetzung (206) fehlen ETag/Last-Modified oft – dann den gespeicherten Validator behalten
+    if_range = _if_range_validator(response.headers) or ((part_meta or {}).get("if_range", "") if resumed else "")
+    save_state(PART_STATE, {
+        "url": url,
+        "if_range": if_range,
+        # Ohne if_range nur im selben Lauf fortsetzbar (siehe _load_part_meta)
+        "resumable": encoding in ("", "identity") and response.headers.get("Accept-Ranges", "").lower() != "none",
+    })
+
+    if resumed:
+        logger.info(f"Setze Download ab Byte {offset} fort …")
+        progress = _DownloadProgress.from_file(part_path, chunk_size)
+    else:
+        progress = _DownloadProgress()
+    expected = _expected_total(response, offset)
+
+    # Body streamen; Hash und Zeilenanzahl entstehen nebenbei.
+    # gzip/deflate wird von requests beim Iterieren bereits dekomprimiert.
+    with response, open(part_path, "ab" if resumed else "wb", buffering=chunk_size) as f:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if not chunk:
+                continue
+            f.write(chunk)
+            progress.feed(chunk)
+
+    if expected is not None and progress.size != expected:
+        raise IncompleteDownloadError(f"{progress.size} von {expected} Bytes empfangen")
+    return response, progress
+
+
+def download_m3u(url, conditional=True, chunk_size=DEFAULT_CHUNK_SIZE,
+                 retries=3, backoff=2.0, backoff_max=60.0, timeout=30.0) -> DownloadResult:
+    """
+    Lädt die Playlist gestreamt nach tmp/ (gzip/deflate wird ausgehandelt).
+
+    Mit ``conditional`` werden ETag/Last-Modified des letzten erfolgreichen Laufs
+    mitgeschickt. Antwortet der Provider mit 304 oder ist der SHA-256 des Inhalts
+    identisch zum letzten Lauf, bleibt tmp/ unangetastet und ``changed`` ist False.
+
+    Bricht die Verbindung ab, wird nach ``backoff`` Sekunden (exponentiell, max.
+    ``backoff_max``) per Range ab dem letzten geschriebenen Byte der .part-Datei
+    fortgesetzt – bis zu ``retries`` Mal. Erst wenn die Größe zu Content-Length
+    passt, wird die Datei umbenannt. Über Läufe hinweg wird nur fortgesetzt, wenn
+    der Server ein starkes ETag oder Last-Modified liefert (``If-Range``). Antwortet
+    er mit 416 oder einem unpassenden Content-Range, wird die .part-Datei verworfen
+    und von vorn geladen.
+    """
     logger.info(f"Download M3U von URL: {url}")
 
     # /tmp vorhanden?
     tmp_dir = Path.cwd() / "tmp"
     os.makedirs(tmp_dir, exist_ok=True)
 
-    # Datein inhalten? -> löschen
-    delete_all_files_in_tmp(tmp_dir)
+    previous = load_state(DOWNLOAD_STATE) if conditional else None
+    if previous and previous.get("url") != url:
+        previous = None
+
+    part_path = tmp_dir / PART_FILENAME
+    part_meta = _load_part_meta(url, part_path)
+    if part_meta:
+        logger.info(f"Angefangener Download gefunden ({part_path.stat().st_size} Bytes) – versuche Fortsetzung.")
+    elif part_path.exists():
+        # Ohne If-Range-Validator lässt sich nicht prüfen, ob die Playlist noch dieselbe ist
+        logger.info("Angefangener Download nicht fortsetzbar – starte von vorn.")
+        discard_part(part_path)
 
     # Datei Downloaden
     try:
         headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+            "Accept-Encoding": "gzip, deflate",
         }
+        if previous:
+            if previous.get("etag"):
+                headers["If-None-Match"] = previous["etag"]
+            if previous.get("last_modified"):
+                headers["If-Modified-Since"] = previous["last_modified"]
+
         session = requests.Session()
-        response = session.get(url, headers=headers)
-        response.raise_for_status()  # Prüft auf HTTP-Fehler
+        attempt = 0
+        while True:
+            try:
+                fetched = _fetch(session, url, headers, part_path, part_meta, chunk_size, timeout)
+                break
+            except StalePartError as e:
+                # Kein Versuch verbraucht: ohne .part-Datei wird sofort ohne Range neu geladen
+                logger.info(f"Angefangener Download passt nicht mehr zur Playlist ({e}) – starte von vorn.")
+                discard_part(part_path)
+                part_meta = None
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError,
+                    IncompleteDownloadError) as e:
+                attempt += 1
+                if attempt > retries:
+                    raise
+                wait = min(backoff * (2 ** (attempt - 1)), backoff_max)
+                logger.info(f"Download unterbrochen ({type(e).__name__}: {e}) – Versuch {attempt}/{retries} in {wait:.0f}s …")
+                time.sleep(wait)
+                part_meta = _load_part_meta(url, part_path, same_run=True)
+                if part_meta is None:
+                    # Komprimiert geladen → nicht fortsetzbar, neuer Versuch unkomprimiert
+                    headers["Accept-Encoding"] = "identity"
+
+        if fetched is None:
+            if previous:
+                logger.info("Provider meldet 304 Not Modified – Playlist unverändert.")
+                return DownloadResult(
+                    filename=previous.get("filename", ""),
+                    changed=False,
+                    sha256=previous.get("sha256", ""),
+                    etag=previous.get("etag", ""),
+                    last_modified=previous.get("last_modified", ""),
+                    url=url,
+                    size=previous.get("size", 0),
+                    line_count=previous.get("line_count", 0),
+                )
+            raise requests.exceptions.HTTPError("304 ohne vorherigen Download erhalten")
+
+        response, progress = fetched
+        delete_state(PART_STATE)
+        sha256 = progress.digest.hexdigest()
+        size = progress.size
+        line_count = progress.total_lines()
+        etag = response.headers.get("ETag", "")
+        last_modified = response.headers.get("Last-Modified", "")
+        logger.info(f"Download abgeschlossen: {size / (1024 * 1024):.1f} MB, {line_count} Zeilen, SHA-256 {sha256[:12]}…")
+
+        if previous and previous.get("sha256") == sha256:
+            logger.info("Playlist-Hash identisch zum letzten Lauf – Playlist unverändert.")
+            os.unlink(part_path)
+            return DownloadResult(
+                filename=previous.get("filename", ""),
+                changed=False,
+                sha256=sha256,
+                etag=etag,
+                last_modified=last_modified,
+                url=url,
+                size=size,
+                line_count=line_count,
+            )
+
+        # Geänderte Playlist → tmp/ leeren (bis auf den gerade geladenen Download)
+        delete_all_files_in_tmp(tmp_dir, keep={PART_FILENAME})
 
         # Versuche, den Filename aus den Headern zu extrahieren
         content_disposition = response.headers.get("Content-Disposition", "")
@@ -46,14 +351,20 @@ def download_m3u(url):
             filename = f"playlist_{timestamp}.m3u"
 
         save_path = os.path.join(tmp_dir, filename)
-
-        with open(save_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        os.replace(part_path, save_path)
 
         logger.info(f"Erfolgreich gespeichert unter: {save_path}")
-        return filename
+        return DownloadResult(
+            filename=filename,
+            changed=True,
+            sha256=sha256,
+            etag=etag,
+            last_modified=last_modified,
+            url=url,
+            size=size,
+            line_count=line_count,
+        )
 
     except requests.exceptions.RequestException as e:
         logger.info(f"Download fehlgeschlagen: {e}")
-        raise
\ No newline at end of file
+        raise
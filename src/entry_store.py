@@ -0,0 +1,112 @@
+import sys
+from array import array
+from typing import Iterable, Iterator, Sequence
+
+"""
+Speichersparende, spaltenweise Ablage von Playlist-Einträgen.
+
+Statt eines dicts pro Eintrag (mit eigenen Schlüsseln und Hash-Tabelle) liegt
+jede Eigenschaft in einer eigenen Spalte; ein Eintrag ist nur sein Index.
+- Textspalten (Titel, URL): eine Liste pro Spalte,
+- Pool-Spalten für stark wiederholte Werte (Serienname, Staffelordner): Werte
+  einmal im Pool, pro Eintrag nur eine 4-Byte-ID (``array('I')``),
+- Flags (z. B. "unverändert"): ein Byte pro Eintrag (``bytearray``).
+
+Der Sync arbeitet über ``EntryRow`` – eine leichte Sicht (Store + Index), die
+``row["title"]`` bzw. ``row.title`` wie bisher erlaubt und nur bei Bedarf
+entsteht.
+"""
+
+
+class EntryStore:
+    def __init__(self, columns: Sequence[str], pooled: Sequence[str] = (), flags: Sequence[str] = ()):
+        """
+        :param columns: Textspalten mit meist eindeutigen Werten
+        :param pooled: Spalten mit vielen Wiederholungen (Werte werden gepoolt)
+        :param flags: Boolesche Spalten (Standard False)
+        """
+        self._columns: dict[str, list] = {name: [] for name in columns}
+        self._pooled: dict[str, array] = {name: array('I') for name in pooled}
+        self._pools: dict[str, list[str]] = {name: [] for name in pooled}
+        self._pool_ids: dict[str, dict[str, int]] = {name: {} for name in pooled}
+        self._flags: dict[str, bytearray] = {name: bytearray() for name in flags}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, **values) -> int:
+        """Neuen Eintrag anhängen (alle Text- und Pool-Spalten angeben); liefert den Index."""
+        for name, column in self._columns.items():
+            column.append(values[name])
+        for name, ids in self._pooled.items():
+            value = values[name]
+            pool_ids = self._pool_ids[name]
+            value_id = pool_ids.get(value)
+            if value_id is None:
+                value_id = len(self._pools[name])
+                self._pools[name].append(sys.intern(value))
+                pool_ids[value] = value_id
+            ids.append(value_id)
+        for name, flags in self._flags.items():
+            flags.append(1 if values.get(name) else 0)
+        self._size += 1
+        return self._size - 1
+
+    def get(self, index: int, name: str):
+        column = self._columns.get(name)
+        if column is not None:
+            return column[index]
+        ids = self._pooled.get(name)
+        if ids is not None:
+            return self._pools[name][ids[index]]
+        flags = self._flags.get(name)
+        if flags is not None:
+            return bool(flags[index])
+        raise KeyError(name)
+
+    def set_flag(self, index: int, name: str, value: bool) -> None:
+        self._flags[name][index] = 1 if value else 0
+
+    def column(self, name: str) -> Iterator:
+        """Alle Werte einer Spalte in Einfügereihenfolge."""
+        return (self.get(i, name) for i in range(self._size))
+
+    def row(self, index: int) -> "EntryRow":
+        return EntryRow(self, index)
+
+    def rows(self, indices: Iterable[int]) -> Iterator["EntryRow"]:
+        return (EntryRow(self, i) for i in indices)
+
+    def __iter__(self) -> Iterator["EntryRow"]:
+        return self.rows(range(self._size))
+
+    def describe(self) -> str:
+        """Kurzbeschreibung fürs Log (Größe der Pools)."""
+        pools = ", ".join(f"{name} {len(pool)}" for name, pool in self._pools.items())
+        return f"{self._size} Einträge" + (f" (unterschiedliche Werte: {pools})" if pools else "")
+
+
+class EntryRow:
+    """Sicht auf einen Eintrag eines ``EntryStore``; Flags lassen sich per ``row[name] = …`` setzen."""
+
+    __slots__ = ("store", "index")
+
+    def __init__(self, store: EntryStore, index: int):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, name: str):
+        return self.store.get(self.index, name)
+
+    def __setitem__(self, name: str, value: bool) -> None:
+        self.store.set_flag(self.index, name, value)
+
+    def __getattr__(self, name: str):
+        try:
+            return self.store.get(self.index, name)
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self) -> str:
+        return f"EntryRow({self.index})"
@@ -0,0 +1,141 @@
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+from logger import logger
+
+"""
+Paralleler Dateisystem-Writer für die Bibliotheken.
+
+Auf Netzwerkspeicher (SMB/NFS) kostet jede Metadaten-Operation einen vollen
+Roundtrip. Statt alles nacheinander im Sync-Thread auszuführen:
+- begrenzter Worker-Pool (``workers``), ``submit`` blockiert bei vollem Puffer,
+- atomares Schreiben: temporäre Datei im Zielordner + ``os.replace`` statt
+  unlink + write (kein Zeitfenster ohne Datei, kein halbes .strm),
+- Cache bereits vorhandener Ordner (kein mkdir pro Datei),
+- Laufzeit pro Operationstyp (write, mkdir, unlink, rmtree) für das Log.
+"""
+
+
+class FsWriter:
+    def __init__(self, workers: int = 8, known_dirs: Iterable[Path] = (), name: str = "Dateisystem"):
+        """
+        :param workers: Gleichzeitige Dateisystem-Operationen
+        :param known_dirs: Ordner, von denen bekannt ist, dass sie existieren (z. B. aus dem Manifest)
+        :param name: Bezeichnung für das Log
+        """
+        self.name = name
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="fs")
+        # Höchstens 4 Aufträge pro Worker warten – bremst den Aufrufer (Backpressure)
+        self._slots = threading.BoundedSemaphore(max(1, workers) * 4)
+        self._lock = threading.Lock()
+        self._known_dirs = set(known_dirs)
+        self._timings: dict[str, list[float]] = {}
+        self._errors: list[str] = []
+
+    # --- Operationen (laufen im Worker) -------------------------------------
+
+    def _timed(self, op: str, func: Callable, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._timings.setdefault(op, []).append(elapsed)
+
+    def _ensure_dir(self, directory: Path) -> None:
+        with self._lock:
+            if directory in self._known_dirs:
+                return
+        self._timed("mkdir", directory.mkdir, 0o777, True, True)
+        with self._lock:
+            self._known_dirs.add(directory)
+
+    def _write(self, path: Path, content: str) -> os.stat_result:
+        self._ensure_dir(path.parent)
+        tmp_path = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+
+        def write_atomic() -> os.stat_result:
+            try:
+                try:
+                    f = open(tmp_path, "w", encoding="utf-8")
+                except FileNotFoundError:
+                    # Ordner stand im Cache, wurde aber inzwischen entfernt
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    f = open(tmp_path, "w", encoding="utf-8")
+                with f:
+                    f.write(content)
+                    f.flush()
+                    st = os.fstat(f.fileno())
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+            return st
+
+        return self._timed("write", write_atomic)
+
+    def _unlink(self, path: Path) -> None:
+        self._timed("unlink", path.unlink, True)
+
+    def _rmtree(self, directory: Path) -> None:
+        try:
+            self._timed("rmtree", shutil.rmtree, directory)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            # Unterordner bleiben ggf. im Cache; _write legt fehlende Ordner dann doch an
+            self._known_dirs.discard(directory)
+
+    # --- Öffentliche API ----------------------------------------------------
+
+    def _submit(self, label: str, func: Callable, args: tuple, on_done: Optional[Callable]) -> None:
+        self._slots.acquire()
+
+        def run():
+            try:
+                result = func(*args)
+                if on_done is not None:
+                    on_done(result)
+            except Exception as e:
+                logger.info(f"Fehler bei {label}: {e}")
+                with self._lock:
+                    self._errors.append(label)
+            finally:
+                self._slots.release()
+
+        self._pool.submit(run)
+
+    def write(self, path: Path, content: str, on_done: Optional[Callable[[os.stat_result], None]] = None) -> None:
+        """Datei atomar schreiben; ``on_done(stat)`` nach Erfolg (im Worker-Thread)."""
+        self._submit(f"Schreiben von {path}", self._write, (path, content), on_done)
+
+    def unlink(self, path: Path, on_done: Optional[Callable[[None], None]] = None) -> None:
+        self._submit(f"Löschen von {path}", self._unlink, (path,), on_done)
+
+    def rmtree(self, directory: Path, on_done: Optional[Callable[[None], None]] = None) -> None:
+        self._submit(f"Löschen des Ordners {directory}", self._rmtree, (directory,), on_done)
+
+    def close(self) -> int:
+        """Wartet auf alle Aufträge, loggt die Laufzeiten und liefert die Anzahl Fehler."""
+        self._pool.shutdown(wait=True)
+        self.report()
+        return len(self._errors)
+
+    def report(self) -> None:
+        with self._lock:
+            timings = {op: sorted(values) for op, values in self._timings.items()}
+        for op, values in sorted(timings.items()):
+            count = len(values)
+            avg = sum(values) / count * 1000
+            p95 = values[min(count - 1, int(count * 0.95))] * 1000
+            logger.info(
+                f"{self.name}: {op} {count}x – Ø {avg:.1f} ms, p95 {p95:.1f} ms, max {values[-1] * 1000:.1f} ms"
+            )
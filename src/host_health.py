@@ -0,0 +1,167 @@
+import re
+import threading
+import time
+from collections import deque
+from typing import Optional
+from logger import logger
+from functions import load_option
+from src.host_limiter import host_key
+
+"""
+Gesundheit pro Host für die URL-Checks.
+
+- Circuit Breaker: Nach ``failure_threshold`` aufeinanderfolgenden Host-Fehlern
+  (Timeouts, Verbindungsfehler, 5xx) wird der Host "geöffnet" – weitere URLs
+  schlagen sofort mit Grund ``circuit-open`` fehl, statt jeweils HEAD/Range/GET
+  bis zum Timeout zu durchlaufen. Nach ``open_seconds`` darf genau eine Prüfung
+  durch (half-open); klappt sie, ist der Host wieder frei, sonst bleibt er
+  doppelt so lange gesperrt (max. ``open_max_seconds``).
+- Adaptive Timeouts: Aus den beobachteten Antwortzeiten pro Host wird
+  p99 × ``timeout_factor`` als Timeout abgeleitet (begrenzt auf min/max).
+  Bis genügend Messwerte vorliegen, gelten die bisherigen festen Werte.
+"""
+
+DEFAULT_TIMEOUT_HEAD = 3.0
+DEFAULT_TIMEOUT_GET = 5.0
+_MIN_SAMPLES = 20
+_MAX_SAMPLES = 256
+
+_HOST_FAILURE_STATUS = re.compile(r"\bstatus 5\d\d\b")
+
+_CLOSED, _OPEN, _HALF_OPEN = "closed", "open", "half-open"
+
+
+def is_host_failure(reason: str) -> bool:
+    """True, wenn das Ergebnis auf den Host statt auf die einzelne URL zurückgeht."""
+    return reason.startswith("exception:") or bool(_HOST_FAILURE_STATUS.search(reason))
+
+
+class _HostState:
+    __slots__ = ("state", "failures", "opened_at", "open_for", "probing", "trips", "rejected", "latencies")
+
+    def __init__(self):
+        self.state = _CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_for = 0.0
+        self.probing = False
+        self.trips = 0
+        self.rejected = 0
+        self.latencies: deque = deque(maxlen=_MAX_SAMPLES)
+
+
+class HostHealth:
+    def __init__(self, failure_threshold: int = 8, open_seconds: float = 60.0, open_max_seconds: float = 600.0,
+                 timeout_factor: float = 3.0, timeout_min: float = 1.0, timeout_max: float = 10.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self.open_max_seconds = max(open_seconds, open_max_seconds)
+        self.timeout_factor = timeout_factor
+        self.timeout_min = timeout_min
+        self.timeout_max = max(timeout_min, timeout_max)
+        self._lock = threading.Lock()
+        self._hosts: dict[str, _HostState] = {}
+
+    def _host(self, host: str) -> _HostState:
+        st = self._hosts.get(host)
+        if st is None:
+            st = self._hosts[host] = _HostState()
+        return st
+
+    def deny(self, url: str) -> Optional[str]:
+        """
+        Vor einer Netzwerkprüfung aufrufen.
+
+        :return: None, wenn geprüft werden darf, sonst der Grund für den sofortigen Fehlschlag
+        """
+        host = host_key(url)
+        now = time.monotonic()
+        with self._lock:
+            st = self._host(host)
+            if st.state == _CLOSED:
+                return None
+            if st.state == _OPEN and now - st.opened_at >= st.open_for:
+                # Half-open: genau eine Probe durchlassen
+                st.state = _HALF_OPEN
+                st.probing = True
+                return None
+            st.rejected += 1
+            return f"circuit-open: {host}"
+
+    def record(self, url: str, reason: str) -> None:
+        """Ergebnis einer durchgeführten Netzwerkprüfung melden."""
+        host = host_key(url)
+        failed = is_host_failure(reason)
+        with self._lock:
+            st = self._host(host)
+            if not failed:
+                if st.state != _CLOSED:
+                    logger.info(f"Host {host}: wieder erreichbar – Circuit geschlossen")
+                st.state = _CLOSED
+                st.failures = 0
+                st.open_for = 0.0
+                st.probing = False
+                return
+            st.failures += 1
+            if st.state == _HALF_OPEN and st.probing:
+                # Probe fehlgeschlagen → länger sperren
+                self._open(host, st, min(st.open_for * 2, self.open_max_seconds))
+            elif st.state == _CLOSED and st.failures >= self.failure_threshold:
+                self._open(host, st, self.open_seconds)
+
+    def _open(self, host: str, st: _HostState, open_for: float) -> None:
+        st.state = _OPEN
+        st.opened_at = time.monotonic()
+        st.open_for = open_for
+        st.probing = False
+        st.trips += 1
+        logger.info(
+            f"Host {host}: Circuit offen nach {st.failures} Fehlern – "
+            f"weitere URLs schlagen sofort fehl, neuer Versuch in {open_for:.0f}s"
+        )
+
+    def observe(self, url: str, seconds: float) -> None:
+        """Antwortzeit (bis zu den Headern) einer erfolgreichen Verbindung merken."""
+        with self._lock:
+            self._host(host_key(url)).latencies.append(seconds)
+
+    def timeouts(self, url: str) -> tuple[float, float]:
+        """(timeout_head, timeout_get) für den Host der URL."""
+        with self._lock:
+            samples = list(self._host(host_key(url)).latencies)
+        if len(samples) < _MIN_SAMPLES:
+            return DEFAULT_TIMEOUT_HEAD, DEFAULT_TIMEOUT_GET
+        samples.sort()
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        timeout = min(self.timeout_max, max(self.timeout_min, p99 * self.timeout_factor))
+        return timeout, timeout
+
+    def log_hosts(self) -> None:
+        with self._lock:
+            hosts = {h: (st.trips, st.rejected, st.state) for h, st in self._hosts.items() if st.trips}
+            measured = [h for h, st in self._hosts.items() if len(st.latencies) >= _MIN_SAMPLES]
+        for host, (trips, rejected, state) in sorted(hosts.items()):
+            logger.info(f"Host {host}: Circuit {trips}x geöffnet, {rejected} URLs sofort abgelehnt (Status: {state})")
+        for host in sorted(measured):
+            timeout, _ = self.timeouts(f"http://{host}/")
+            logger.info(f"Host {host}: adaptiver Timeout {timeout:.1f}s")
+
+
+_health: Optional[HostHealth] = None
+_health_lock = threading.Lock()
+
+
+def get_host_health() -> HostHealth:
+    """Gemeinsamer Host-Zustand für alle Prüfläufe im Prozess (konfiguriert über [URL_CHECK])."""
+    global _health
+    with _health_lock:
+        if _health is None:
+            _health = HostHealth(
+                failure_threshold=load_option('URL_CHECK', 'breaker_failure_threshold', 8, int),
+                open_seconds=load_option('URL_CHECK', 'breaker_open_seconds', 60.0, float),
+                open_max_seconds=load_option('URL_CHECK', 'breaker_open_max_seconds', 600.0, float),
+                timeout_factor=load_option('URL_CHECK', 'timeout_factor', 3.0, float),
+                timeout_min=load_option('URL_CHECK', 'timeout_min_seconds', 1.0, float),
+                timeout_max=load_option('URL_CHECK', 'timeout_max_seconds', 10.0, float),
+            )
+        return _health
@@ -0,0 +1,214 @@
+import asyncio
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlsplit
+from logger import logger
+from functions import load_option
+
+"""
+Adaptive Parallelität pro Host für die URL-Checks.
+
+- AIMD pro Host: bei sauberen Antworten steigt das Limit langsam (+1 pro
+  "Fenster"), bei 429/503, Timeouts oder Verbindungsabbrüchen wird es halbiert.
+- Harte Obergrenze pro Provider-Account (Xtream-Provider begrenzen gleichzeitige
+  Verbindungen pro Zugang: /movie/<user>/<pass>/…, /series/<user>/<pass>/…).
+
+Der AIMDController hält den Zustand über mehrere Prüfläufe hinweg; die Gates
+(async bzw. Threads) setzen das aktuelle Limit durch. 429/503 werden nicht von
+der Transportschicht (urllib3-Retry, aiohttp-Schleife) still wiederholt, sondern
+zuerst hier gemeldet (``throttle_delay``) – erst danach, mit ``Retry-After``,
+folgt ein neuer Versuch.
+"""
+
+_XTREAM_PATH = re.compile(r"^/(?:movie|series|live)/([^/]+)/[^/]+/", re.IGNORECASE)
+_CONGESTION_STATUS = re.compile(r"\bstatus (429|503)\b")
+_CONGESTION_EXC = ("Timeout", "ConnectionError", "Disconnected", "ClientOSError", "ConnectionReset")
+
+# Drosselung durch den Provider: erst Host-Limit senken, dann ggf. nach Retry-After wiederholen
+THROTTLE_STATUS = (429, 503)
+# Verlangt der Server länger zu warten, wird nicht wiederholt (das Ergebnis zählt als fehlgeschlagen)
+RETRY_AFTER_MAX = 30.0
+
+
+def host_key(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+def account_key(url: str) -> str:
+    """Host + Xtream-Benutzername, falls erkennbar; sonst nur der Host."""
+    parts = urlsplit(url)
+    match = _XTREAM_PATH.match(parts.path)
+    if match:
+        return f"{parts.netloc.lower()}|{match.group(1)}"
+    return parts.netloc.lower()
+
+
+def is_congestion(reason: str) -> bool:
+    """True für Ergebnisse, die auf Überlast/Drosselung hindeuten (429/503, Timeout, Reset)."""
+    if _CONGESTION_STATUS.search(reason):
+        return True
+    return reason.startswith("exception:") and any(name in reason for name in _CONGESTION_EXC)
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Retry-After (Sekunden oder HTTP-Datum) in Sekunden; None, wenn nicht vorhanden oder nicht lesbar."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def throttle_delay(url: str, headers, attempt: int, backoff: float) -> Optional[float]:
+    """
+    429/503 an den AIMD-Controller melden und die Wartezeit bis zum nächsten Versuch bestimmen.
+
+    :param headers: Antwort-Header (requests oder aiohttp)
+    :param attempt: Bisherige Versuche (0 = erste Antwort)
+    :param backoff: Grundwartezeit ohne Retry-After (exponentiell)
+    :return: Sekunden bis zum nächsten Versuch oder None, wenn nicht wiederholt werden soll
+    """
+    get_controller().on_congestion(host_key(url))
+    retry_after = retry_after_seconds(headers.get("Retry-After"))
+    if retry_after is None:
+        return backoff * (2 ** attempt)
+    if retry_after > RETRY_AFTER_MAX:
+        return None
+    return retry_after
+
+
+class AIMDController:
+    def __init__(self, start: int = 8, min_limit: int = 1, max_limit: int = 64,
+                 decrease: float = 0.5, cooldown: float = 2.0):
+        self.start = max(1, start)
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._limits: dict[str, float] = {}
+        self._last_decrease: dict[str, float] = {}
+
+    def limit(self, host: str) -> int:
+        with self._lock:
+            return max(self.min_limit, int(self._limits.get(host, self.start)))
+
+    def on_success(self, host: str) -> None:
+        with self._lock:
+            current = self._limits.get(host, float(self.start))
+            # Additive increase: ca. +1 pro vollständig sauberem Fenster
+            self._limits[host] = min(float(self.max_limit), current + 1.0 / max(current, 1.0))
+
+    def on_congestion(self, host: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            # Pro Cooldown nur einmal halbieren, sonst kollabiert das Limit bei einem Burst
+            if now - self._last_decrease.get(host, 0.0) < self.cooldown:
+                return
+            current = self._limits.get(host, float(self.start))
+            new = max(float(self.min_limit), current * self.decrease)
+            self._limits[host] = new
+            self._last_decrease[host] = now
+        if int(new) < int(current):
+            logger.info(f"Host {host}: drossele URL-Checks auf {int(new)} gleichzeitig")
+
+    def report(self, url: str, reason: str) -> None:
+        host = host_key(url)
+        if is_congestion(reason):
+            self.on_congestion(host)
+        else:
+            self.on_success(host)
+
+    def log_limits(self) -> None:
+        with self._lock:
+            limits = dict(self._limits)
+        for host, value in sorted(limits.items()):
+            logger.info(f"Host {host}: Parallelität am Ende {int(value)}")
+
+
+class AsyncHostGate:
+    """asyncio-Gate: wartet, bis Host-Limit und Account-Obergrenze einen Slot freigeben."""
+
+    def __init__(self, controller: AIMDController, account_cap: int = 0):
+        self.controller = controller
+        self.account_cap = account_cap
+        self._cond = asyncio.Condition()
+        self._hosts: dict[str, int] = defaultdict(int)
+        self._accounts: dict[str, int] = defaultdict(int)
+
+    def _free(self, host: str, account: str) -> bool:
+        if self._hosts[host] >= self.controller.limit(host):
+            return False
+        return self.account_cap <= 0 or self._accounts[account] < self.account_cap
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        host, account = host_key(url), account_key(url)
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._free(host, account))
+            self._hosts[host] += 1
+            self._accounts[account] += 1
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._hosts[host] -= 1
+                self._accounts[account] -= 1
+                self._cond.notify_all()
+
+
+class ThreadHostGate:
+    """Thread-Gate mit derselben Logik wie AsyncHostGate."""
+
+    def __init__(self, controller: AIMDController, account_cap: int = 0):
+        self.controller = controller
+        self.account_cap = account_cap
+        self._cond = threading.Condition()
+        self._hosts: dict[str, int] = defaultdict(int)
+        self._accounts: dict[str, int] = defaultdict(int)
+
+    def _free(self, host: str, account: str) -> bool:
+        if self._hosts[host] >= self.controller.limit(host):
+            return False
+        return self.account_cap <= 0 or self._accounts[account] < self.account_cap
+
+    @contextmanager
+    def slot(self, url: str):
+        host, account = host_key(url), account_key(url)
+        with self._cond:
+            self._cond.wait_for(lambda: self._free(host, account))
+            self._hosts[host] += 1
+            self._accounts[account] += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._hosts[host] -= 1
+                self._accounts[account] -= 1
+                self._cond.notify_all()
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller() -> AIMDController:
+    """Gemeinsamer AIMD-Zustand für alle Prüfläufe im Prozess (konfiguriert über [URL_CHECK])."""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AIMDController(
+                start=load_option('URL_CHECK', 'host_start_concurrency', 8, int),
+                min_limit=load_option('URL_CHECK', 'host_min_concurrency', 1, int),
+                max_limit=load_option('URL_CHECK', 'host_max_concurrency', 64, int),
+            )
+        return _controller
@@ -0,0 +1,120 @@
+import io
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, Union
+from functions import sanitize_filename
+from src.classify_rules import MOVIE, SERIES, CAM, get_classifier
+from src.m3u_parser import iter_raw_entries, parse_extinf
+
+"""
+Paralleles Aufteilen großer Playlists auf mehrere Prozesse.
+
+Die Datei wird per ``mmap`` eingeblendet und an #EXTINF-Grenzen in Blöcke
+geteilt; kein Eintrag wird dabei zerschnitten. Jeder Block wird in einem
+eigenen Prozess dekodiert, klassifiziert und die Titel bereits für das
+Dateisystem bereinigt (``sanitize_filename``). Zeilen werden genau wie im
+Einzelprozess gelesen (UTF-8 mit ``errors="ignore"``, universelle
+Zeilenenden, ``iter_raw_entries``); Stream-Einträge werden nur nicht erst
+vollständig geparst. Die Ergebnisse werden in Originalreihenfolge
+zusammengeführt – die Ausgabe ist identisch mit dem Einzelprozess-Parser.
+
+Worker-Prozesse richten kein Logging ein (siehe ``logger.py``): beim Start per
+``spawn`` (Windows/macOS) werden die Module neu importiert, ohne dass jeder
+Worker eine eigene Logdatei anlegt.
+"""
+
+_EXTINF_BOUNDARY = b"\n#EXTINF"
+# Obergrenze pro Block, damit einzelne Prozesse nicht zu viel Speicher kopieren
+_MAX_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+class ChunkResult:
+    """Ergebnis eines Blocks; wird zwischen den Prozessen gepickelt."""
+
+    __slots__ = ("streams", "stream_count", "movies", "series", "cam_titles", "raw")
+
+    def __init__(self):
+        self.streams = ""
+        self.stream_count = 0
+        self.movies: list[tuple[str, str, str]] = []
+        self.series: list[tuple[str, str, str]] = []
+        self.cam_titles: list[str] = []
+        # Einträge für die optionalen movies_/series_-Debug-Dateien
+        self.raw = {MOVIE: "", SERIES: ""}
+
+
+def chunk_bounds(path: Union[Path, str], chunks: int) -> list[tuple[int, int]]:
+    """
+    Teilt die Datei in etwa ``chunks`` Byte-Bereiche (mehr, falls ein Block
+    größer als 16 MB würde), die jeweils an einer #EXTINF-Zeile beginnen.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    chunks = max(chunks, -(-size // _MAX_CHUNK_SIZE))
+    step = max(1, size // chunks)
+
+    bounds = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            pos = mm.find(_EXTINF_BOUNDARY, start + step)
+            end = size if pos == -1 else pos + 1
+            bounds.append((start, end))
+            start = end
+    return bounds
+
+
+def parse_chunk(args: tuple) -> ChunkResult:
+    """
+    Liest einen Byte-Bereich der Playlist (läuft im Worker-Prozess).
+
+    :param args: (Pfad, Start, Ende, movies_/series_-Einträge sammeln, Classifier)
+    """
+    path, start, end, keep_raw, classifier = args
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        data = mm[start:end]
+
+    # Wie open(..., encoding="utf-8", errors="ignore"): ein Block beginnt immer nach einem \n,
+    # Mehrbyte-Zeichen und \r\n werden also nie getrennt; newline=None → \r und \r\n wie \n
+    lines = io.StringIO(data.decode("utf-8", errors="ignore"), newline=None)
+    streams: list[str] = []
+    raw: dict[str, list[str]] = {MOVIE: [], SERIES: []}
+    result = ChunkResult()
+    for line_info, directives, url in iter_raw_entries(lines):
+        if not classifier.is_video_url(url):
+            # Stream: ohne Parsen der Attribute übernehmen (inkl. #EXTVLCOPT/#EXTGRP)
+            streams.append("\n".join((line_info, *directives, url)) + "\n")
+            result.stream_count += 1
+            continue
+        entry = parse_extinf(line_info, url, directives)
+        kind = classifier.classify(entry)
+        if kind == MOVIE or kind == SERIES:
+            row = (entry.title, sanitize_filename(entry.title), entry.url)
+            (result.movies if kind == MOVIE else result.series).append(row)
+            if keep_raw:
+                raw[kind].append("\n".join(entry.lines()) + "\n")
+        elif kind == CAM:
+            result.cam_titles.append(entry.title)
+    result.streams = "".join(streams)
+    result.raw = {kind: "".join(parts) for kind, parts in raw.items()}
+    return result
+
+
+def iter_chunk_results(path: Union[Path, str], workers: int, keep_raw: bool = False) -> Iterator[ChunkResult]:
+    """
+    Ergebnisse aller Blöcke in Originalreihenfolge (mehrere Blöcke pro Prozess
+    gleichen unterschiedlich teure Bereiche aus).
+
+    :param path: Playlist-Datei
+    :param workers: Anzahl Prozesse
+    :param keep_raw: Einträge für movies_/series_-Debug-Dateien mitliefern
+    """
+    bounds = chunk_bounds(path, workers * 4)
+    # Regeln einmal im Hauptprozess laden und mitgeben (übersetzte Ausdrücke lassen sich pickeln)
+    classifier = get_classifier()
+    tasks = [(str(path), start, end, keep_raw, classifier) for start, end in bounds]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(parse_chunk, tasks)
@@ -0,0 +1,300 @@
+import os
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+from logger import logger
+from functions import sanitize_filename
+from src.entry_store import EntryStore
+# Kategorien + Regelwerk ([CLASSIFY]); STREAM/MOVIE/SERIES/CAM bleiben hier importierbar
+from src.classify_rules import STREAM, MOVIE, SERIES, CAM, Classifier, get_classifier
+
+"""
+Streaming-Parser für M3U-Playlists.
+
+Die heruntergeladene Datei wird genau einmal zeilenweise gelesen. Jeder Eintrag
+(#EXTINF + URL) wird im selben Durchlauf als Stream, Film, Serie oder CAM
+einsortiert. Die Sync-Stufen bekommen die Einträge direkt übergeben; die
+Zwischendateien in tmp/ (movies_/series_) sind nur noch optional.
+"""
+
+
+class M3UEntry:
+    """
+    Ein Playlist-Eintrag, einmal aus #EXTINF + URL geparst.
+
+    ``directives`` enthält Direktiven zwischen #EXTINF und URL (z. B. #EXTGRP,
+    #EXTVLCOPT) in Originalreihenfolge, damit sie beim Schreiben erhalten bleiben.
+    """
+
+    __slots__ = ("info", "url", "duration", "tvg_id", "tvg_name", "tvg_logo", "group_title", "title", "directives")
+
+    def __init__(self, info: str, url: str, duration: float, tvg_id: str, tvg_name: str, tvg_logo: str,
+                 group_title: str, title: str, directives: tuple = ()):
+        self.info = info
+        self.url = url
+        self.duration = duration
+        self.tvg_id = tvg_id
+        self.tvg_name = tvg_name
+        self.tvg_logo = tvg_logo
+        self.group_title = group_title
+        self.title = title
+        self.directives = directives
+
+    def lines(self) -> list[str]:
+        """Zeilen des Eintrags für eine M3U-Ausgabe (#EXTINF, Direktiven, URL)."""
+        return [self.info, *self.directives, self.url]
+
+    def __repr__(self) -> str:
+        return f"M3UEntry({self.title!r}, {self.url!r})"
+
+
+_ATTRIBUTE_RE = re.compile(r'([\w-]+)="([^"]*)"')
+
+
+# Kopf (Dauer + Attribute) bis zum ersten Komma außerhalb von Anführungszeichen, danach der Titel
+_EXTINF_RE = re.compile(r'([^,"]*(?:"[^"]*"[^,"]*)*),(.*)', re.DOTALL)
+
+
+def _split_extinf(line_info: str) -> tuple[str, str]:
+    """(Kopf mit Dauer und Attributen, Titel)."""
+    match = _EXTINF_RE.match(line_info)
+    if match is None:
+        return line_info, ""
+    return match.group(1), match.group(2)
+
+
+def parse_extinf(line_info: str, url: str, directives: tuple = ()) -> M3UEntry:
+    """
+    Parst eine #EXTINF-Zeile (Dauer, tvg-id, tvg-name, tvg-logo, group-title, Titel).
+
+    Fehlt ``group-title``, wird eine #EXTGRP-Direktive als Gruppe verwendet.
+    """
+    head, title = _split_extinf(line_info)
+    head = head[len('#EXTINF:'):] if head.startswith('#EXTINF:') else head
+    duration_text = head.split(None, 1)[0] if head.strip() else ""
+    try:
+        duration = float(duration_text)
+    except ValueError:
+        duration = -1.0
+
+    attrs = dict(_ATTRIBUTE_RE.findall(head))
+    group = attrs.get("group-title", "")
+    if not group:
+        for directive in directives:
+            if directive.startswith('#EXTGRP:'):
+                group = directive[len('#EXTGRP:'):].strip()
+                break
+
+    return M3UEntry(
+        info=line_info,
+        url=url,
+        duration=duration,
+        tvg_id=attrs.get("tvg-id", ""),
+        tvg_name=attrs.get("tvg-name", ""),
+        tvg_logo=attrs.get("tvg-logo", ""),
+        group_title=group,
+        title=title.strip(),
+        directives=directives,
+    )
+
+
+def iter_raw_entries(lines: Iterable[str]) -> Iterator[tuple[str, tuple, str]]:
+    """
+    (#EXTINF-Zeile, Direktiven, URL) je Eintrag aus Textzeilen.
+
+    Gemeinsamer Kern von ``iter_entries`` und dem parallelen Parser
+    (``src.m3u_parallel``), damit beide Zeilen gleich behandeln (``str.strip``
+    entfernt auch geschützte Leerzeichen u. Ä.).
+    """
+    line_info = None
+    directives: list[str] = []
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            continue
+        if line.startswith('#EXTINF'):
+            line_info = line
+            directives = []
+        elif line.startswith('#'):
+            if line_info is not None:
+                directives.append(line)
+        elif line_info is not None:
+            yield line_info, tuple(directives), line
+            line_info = None
+            directives = []
+
+
+def iter_entries(path: Union[Path, str]) -> Iterator[M3UEntry]:
+    """
+    Liest eine M3U-Datei zeilenweise und liefert geparste Einträge.
+
+    Beliebige Direktiven (#EXTGRP, #EXTVLCOPT, …) zwischen #EXTINF und URL werden
+    dem Eintrag zugeordnet; Direktiven vor dem ersten #EXTINF (#EXTM3U) und leere
+    Zeilen werden übersprungen. Eine URL ohne vorheriges #EXTINF wird ignoriert.
+    """
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        for line_info, directives, url in iter_raw_entries(f):
+            yield parse_extinf(line_info, url, directives)
+
+
+def iter_m3u_entries(path: Union[Path, str]) -> Iterator[tuple[str, str]]:
+    """(info, url)-Paare einer M3U-Datei (siehe ``iter_entries``)."""
+    for entry in iter_entries(path):
+        yield entry.info, entry.url
+
+
+def classify_entry(entry: M3UEntry, classifier: Optional[Classifier] = None) -> str | None:
+    """
+    Ordnet einen Eintrag einer Kategorie zu (STREAM, MOVIE, SERIES, CAM) oder None.
+
+    Sprach-, Ausschluss- und CAM-Marker werden in Titel, tvg-name und group-title
+    gesucht (siehe ``src.classify_rules``).
+
+    :param classifier: Regelwerk; Standard: aus der Konfiguration ([CLASSIFY])
+    """
+    return (classifier or get_classifier()).classify(entry)
+
+
+def extinf_attribute(line_info: str, name: str) -> str:
+    """Wert eines beliebigen Attributs der EXTINF-Zeile (z. B. tvg-country); "" wenn nicht vorhanden."""
+    head, _ = _split_extinf(line_info)
+    for key, value in _ATTRIBUTE_RE.findall(head):
+        if key == name:
+            return value
+    return ""
+
+
+def resolve_entries(source: Union[str, Iterable]) -> Iterable[M3UEntry]:
+    """
+    Erlaubt den Sync-Stufen, entweder einen Dateinamen in tmp/ oder bereits
+    geparste Einträge (``EntryStore`` aus ``split_playlist``, ``M3UEntry`` oder
+    (info, url)-Paare) zu bekommen. Jeder Eintrag hat mindestens ``title`` und ``url``.
+    """
+    if isinstance(source, (str, Path)):
+        return iter_entries(Path.cwd() / "tmp" / source)
+    if isinstance(source, EntryStore):
+        return iter(source)
+    return (item if isinstance(item, M3UEntry) else parse_extinf(*item) for item in source)
+
+
+class PlaylistSplit:
+    """Ergebnis eines Parser-Durchlaufs: Einträge pro Kategorie + Streams-Datei."""
+
+    def __init__(self, streams_filename: str):
+        self.streams_filename = streams_filename
+        self.source_filename = None
+        self.movies_filename = None
+        self.series_filename = None
+        self.stream_count = 0
+        # Nur Titel (+ bereinigter Titel) + URL, spaltenweise (die rohen EXTINF-Zeilen werden nicht gehalten)
+        self.movies = EntryStore(("title", "safe_title", "url"))
+        self.series = EntryStore(("title", "safe_title", "url"))
+        self.cam_titles: list[str] = []
+
+
+def split_playlist(filename: str, write_tmp_files: bool = False, workers: int = 1,
+                   parallel_min_mb: int = 32) -> PlaylistSplit:
+    """
+    Liest die Playlist einmal und teilt sie in Streams, Filme, Serien und CAM auf.
+
+    Die Stream-Datei (streams_<filename>) wird direkt beim Lesen geschrieben, da
+    sie später als iptv.m3u veröffentlicht wird. Filme/Serien bleiben im Speicher
+    und werden nur bei ``write_tmp_files`` zusätzlich nach tmp/ geschrieben.
+    Große Dateien werden bei ``workers`` != 1 auf mehrere Prozesse verteilt
+    (siehe ``src.m3u_parallel``), das Ergebnis ist dasselbe.
+
+    :param filename: Dateiname der heruntergeladenen Playlist in tmp/
+    :param write_tmp_files: movies_/series_-Dateien zusätzlich schreiben (Debug)
+    :param workers: Anzahl Parser-Prozesse (1 = ein Prozess, 0 = alle CPU-Kerne)
+    :param parallel_min_mb: Kleinere Dateien werden immer in einem Prozess gelesen
+    :return: PlaylistSplit mit allen Einträgen
+    """
+    tmp_dir = Path.cwd() / "tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    source = tmp_dir / filename
+
+    split = PlaylistSplit(f"streams_{filename}")
+    split.source_filename = filename
+    if write_tmp_files:
+        split.movies_filename = f"movies_{filename}"
+        split.series_filename = f"series_{filename}"
+
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    if workers > 1 and os.path.getsize(source) >= parallel_min_mb * 1024 * 1024:
+        logger.info(f"Teile Playlist parallel auf ({workers} Prozesse; Streams, Filme, Serien, CAM) …")
+        _split_parallel(split, source, tmp_dir, workers)
+    else:
+        logger.info("Teile Playlist in einem Durchlauf auf (Streams, Filme, Serien, CAM) …")
+        _split_single(split, source, tmp_dir)
+
+    logger.info(
+        f"Playlist aufgeteilt: Streams {split.stream_count}, Filme {len(split.movies)}, "
+        f"Serien {len(split.series)}, CAM {len(split.cam_titles)}"
+    )
+    return split
+
+
+def _open_tmp_files(split: PlaylistSplit, tmp_dir: Path) -> dict:
+    """movies_/series_-Debug-Dateien öffnen (nur bei ``write_tmp_files``)."""
+    if split.movies_filename is None:
+        return {}
+    extra_out = {
+        MOVIE: open(tmp_dir / split.movies_filename, 'w', encoding='utf-8'),
+        SERIES: open(tmp_dir / split.series_filename, 'w', encoding='utf-8'),
+    }
+    for out in extra_out.values():
+        out.write('#EXTM3U\n')
+    return extra_out
+
+
+def _split_single(split: PlaylistSplit, source: Path, tmp_dir: Path) -> None:
+    # Debug-Dateien werden im selben Durchlauf geschrieben (mit Original-EXTINF inkl. Attributen)
+    extra_out = _open_tmp_files(split, tmp_dir)
+    try:
+        with open(tmp_dir / split.streams_filename, 'w', encoding='utf-8') as streams_out:
+            streams_out.write('#EXTM3U\n')
+            classifier = get_classifier()
+            for entry in iter_entries(source):
+                kind = classifier.classify(entry)
+                if kind == STREAM:
+                    # inkl. #EXTVLCOPT/#EXTGRP, sonst fehlen z. B. User-Agent-Vorgaben im Tuner
+                    streams_out.write('\n'.join(entry.lines()) + '\n')
+                    split.stream_count += 1
+                elif kind == MOVIE or kind == SERIES:
+                    # Nur Titel + URL behalten, nicht den ganzen Eintrag
+                    (split.movies if kind == MOVIE else split.series).append(
+                        title=entry.title, safe_title=sanitize_filename(entry.title), url=entry.url)
+                    if extra_out:
+                        extra_out[kind].write('\n'.join(entry.lines()) + '\n')
+                elif kind == CAM:
+                    # CAM sammeln (für Logging/Blockliste), aber nicht in Output übernehmen
+                    split.cam_titles.append(entry.title)
+    finally:
+        for out in extra_out.values():
+            out.close()
+
+
+def _split_parallel(split: PlaylistSplit, source: Path, tmp_dir: Path, workers: int) -> None:
+    # Später Import, da src.m3u_parallel selbst auf diesen Parser aufbaut
+    from src.m3u_parallel import iter_chunk_results
+
+    # Textmodus wie im Einzelprozess (gleiche Zeilenenden auf jeder Plattform)
+    extra_out = _open_tmp_files(split, tmp_dir)
+    try:
+        with open(tmp_dir / split.streams_filename, 'w', encoding='utf-8') as streams_out:
+            streams_out.write('#EXTM3U\n')
+            # Blöcke kommen in Dateireihenfolge zurück → gleiche Reihenfolge wie im Einzelprozess
+            for result in iter_chunk_results(source, workers, keep_raw=bool(extra_out)):
+                streams_out.write(result.streams)
+                split.stream_count += result.stream_count
+                for title, safe_title, url in result.movies:
+                    split.movies.append(title=title, safe_title=safe_title, url=url)
+                for title, safe_title, url in result.series:
+                    split.series.append(title=title, safe_title=safe_title, url=url)
+                split.cam_titles.extend(result.cam_titles)
+                for kind, out in extra_out.items():
+                    out.write(result.raw[kind])
+    finally:
+        for out in extra_out.values():
+            out.close()
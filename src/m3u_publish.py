@@ -0,0 +1,100 @@
+import hashlib
+import os
+import shutil
+from pathlib import Path
+from typing import Union
+from src.run_state import load_state, save_state
+
+"""
+Veröffentlichen von Playlists (iptv.m3u) ohne unnötige Änderungen am Ziel.
+
+Jellyfin lädt die Tuner-Playlist bei jeder mtime-Änderung komplett neu. Darum:
+- Vergleich per SHA-256 in 1-MB-Blöcken (kein Dekodieren/Aufteilen in Zeilen),
+- Hash, Größe und mtime der zuletzt veröffentlichten Datei liegen in
+  state/published.json – stimmen Größe/mtime am Ziel noch, muss das Ziel nicht
+  einmal gelesen werden,
+- Veröffentlichen über eine temporäre Datei im Zielordner + ``os.replace``,
+  die Playlist fehlt also zu keinem Zeitpunkt,
+- unveränderter Inhalt → das Ziel wird überhaupt nicht angefasst.
+"""
+
+PUBLISH_STATE = "published"
+_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: Union[Path, str]) -> str:
+    """SHA-256 einer Datei, blockweise gelesen."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Publisher:
+    def __init__(self, name: str = PUBLISH_STATE):
+        """
+        :param name: State-Datei (state/<name>.json) mit {Zielpfad: {sha256, size, mtime}}
+        """
+        self.name = name
+        self.records: dict[str, dict] = (load_state(name) or {}).get("files", {})
+
+    def _matches_record(self, target: Path, digest: str) -> bool:
+        """True, wenn das Ziel laut State genau diesen Inhalt hat und seither nicht verändert wurde."""
+        rec = self.records.get(str(target))
+        if rec is None or rec.get("sha256") != digest:
+            return False
+        try:
+            st = target.stat()
+        except OSError:
+            return False
+        return st.st_size == rec.get("size") and st.st_mtime == rec.get("mtime")
+
+    def _remember(self, target: Path, digest: str) -> None:
+        st = target.stat()
+        self.records[str(target)] = {"sha256": digest, "size": st.st_size, "mtime": st.st_mtime}
+
+    def publish(self, source: Union[Path, str], target: Union[Path, str]) -> bool:
+        """
+        Veröffentlicht ``source`` unter ``target``, falls sich der Inhalt unterscheidet.
+
+        :return: True, wenn das Ziel ersetzt wurde; False, wenn es unverändert blieb
+        """
+        source, target = Path(source), Path(target)
+        digest = file_digest(source)
+
+        if self._matches_record(target, digest):
+            return False
+        # Kein (passender) State, z. B. erster Lauf oder Datei von Hand ersetzt → Ziel einmal hashen
+        if str(target) not in self.records or self.records[str(target)].get("sha256") == digest:
+            if target.exists() and file_digest(target) == digest:
+                self._remember(target, digest)
+                return False
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f".{target.name}.tmp")
+        try:
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, target)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._remember(target, digest)
+        return True
+
+    def forget(self, target: Union[Path, str]) -> None:
+        self.records.pop(str(target), None)
+
+    def save(self) -> None:
+        save_state(self.name, {"files": self.records})
+
+
+def publish_file(source: Union[Path, str], target: Union[Path, str]) -> bool:
+    """Einzelne Datei veröffentlichen und den State direkt speichern."""
+    publisher = Publisher()
+    changed = publisher.publish(source, target)
+    publisher.save()
+    return changed
@@ -0,0 +1,198 @@
+import os
+import sqlite3
+from pathlib import Path
+from typing import Optional
+from logger import logger, log_start, log_end
+from src.classify_rules import get_classifier
+from src.m3u_parser import PlaylistSplit, split_playlist
+from src.m3u_publish import file_digest
+from src.run_state import ensure_state_dir
+
+"""
+Parse-Cache der zuletzt aufgeteilten Playlist (state/parse_cache.sqlite).
+
+Nach dem Aufteilen werden Filme, Serien, CAM-Titel und die Streams-Datei in
+einer SQLite-Datei abgelegt, zusammen mit dem SHA-256 der Playlist. Ein
+erneuter Lauf mit demselben Inhalt (z. B. nach einem Abbruch im Sync) lädt die
+Einträge direkt aus dem Cache statt neu zu parsen; ``main.py --cached`` nutzt
+ihn ganz ohne Download, zum Testen und Debuggen. Ändert sich der Hash der
+Playlist, die Klassifizierungsregeln ([CLASSIFY]) oder das Cache-Format, wird
+der Cache verworfen und neu geschrieben.
+
+Der Cache ist nur eine Abkürzung: jeder Fehler beim Laden oder Speichern
+(auch unerwartete) zählt als Cache-Fehlschlag, die Playlist wird dann normal
+geparst.
+"""
+
+CACHE_FILENAME = "parse_cache.sqlite"
+# Bei Änderungen am Tabellenaufbau erhöhen → alte Caches werden ignoriert
+CACHE_VERSION = "2"
+_BLOB_CHUNK_SIZE = 1024 * 1024
+
+_MOVIE = 0
+_SERIES = 1
+
+
+def cache_path() -> Path:
+    return ensure_state_dir() / CACHE_FILENAME
+
+
+def _meta(conn: sqlite3.Connection) -> dict[str, str]:
+    return dict(conn.execute("SELECT key, value FROM meta"))
+
+
+def _restore_streams(conn: sqlite3.Connection, target: Path, size: int) -> None:
+    """Streams-Datei aus dem Cache nach tmp/ schreiben, falls sie fehlt oder abweicht."""
+    if target.is_file() and target.stat().st_size == size:
+        return
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.tmp")
+    try:
+        with open(tmp_path, "wb") as out:
+            for (chunk,) in conn.execute("SELECT data FROM streams ORDER BY seq"):
+                out.write(chunk)
+        if tmp_path.stat().st_size != size:
+            raise ValueError(f"Streams im Cache unvollständig ({tmp_path.stat().st_size} von {size} Bytes)")
+        os.replace(tmp_path, target)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    logger.info(f"Parse-Cache: {target.name} wiederhergestellt")
+
+
+def load_split(sha256: str = "") -> Optional[PlaylistSplit]:
+    """
+    Lädt die zuletzt aufgeteilte Playlist aus dem Cache.
+
+    :param sha256: Hash der aktuellen Playlist; leer → Cache ohne Hash-Vergleich verwenden (``--cached``)
+    :return: PlaylistSplit oder None, wenn kein passender Cache existiert
+    """
+    path = cache_path()
+    if not path.is_file():
+        return None
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except Exception as e:
+        logger.info(f"Parse-Cache nicht lesbar: {e}")
+        return None
+    try:
+        meta = _meta(conn)
+        if meta.get("version") != CACHE_VERSION:
+            logger.info("Parse-Cache hat ein altes Format – wird neu erstellt.")
+            return None
+        if sha256 and meta.get("sha256") != sha256:
+            logger.info("Parse-Cache gehört zu einer anderen Playlist (Hash geändert) – wird neu erstellt.")
+            return None
+        if meta.get("rules") != get_classifier().fingerprint():
+            logger.info("Parse-Cache wurde mit anderen [CLASSIFY]-Regeln erstellt – wird neu erstellt.")
+            return None
+
+        split = PlaylistSplit(meta["streams_filename"])
+        split.source_filename = meta["source_filename"]
+        split.stream_count = int(meta["stream_count"])
+        for kind, title, safe_title, url in conn.execute(
+                "SELECT kind, title, safe_title, url FROM entries ORDER BY rowid"):
+            (split.movies if kind == _MOVIE else split.series).append(title=title, safe_title=safe_title, url=url)
+        split.cam_titles = [title for (title,) in conn.execute("SELECT title FROM cam ORDER BY rowid")]
+        _restore_streams(conn, Path.cwd() / "tmp" / split.streams_filename, int(meta["streams_size"]))
+    except Exception as e:
+        # Beschädigter oder fremder Cache → wie kein Cache, neu parsen
+        logger.info(f"Parse-Cache nicht lesbar: {type(e).__name__}: {e}")
+        return None
+    finally:
+        conn.close()
+
+    logger.info(
+        f"Parse-Cache geladen ({meta['sha256'][:12]}…): Streams {split.stream_count}, "
+        f"Filme {len(split.movies)}, Serien {len(split.series)}, CAM {len(split.cam_titles)}"
+    )
+    return split
+
+
+def save_split(split: PlaylistSplit, source_filename: str, sha256: str) -> None:
+    """Schreibt den Cache atomar neu (erst .tmp, dann umbenennen)."""
+    path = cache_path()
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    streams_file = Path.cwd() / "tmp" / split.streams_filename
+    streams_size = streams_file.stat().st_size
+
+    tmp_path.unlink(missing_ok=True)
+    conn = sqlite3.connect(str(tmp_path))
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute("CREATE TABLE entries (kind INTEGER NOT NULL, title TEXT, safe_title TEXT, url TEXT)")
+        conn.execute("CREATE TABLE cam (title TEXT)")
+        conn.execute("CREATE TABLE streams (seq INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("version", CACHE_VERSION),
+            ("sha256", sha256),
+            ("rules", get_classifier().fingerprint()),
+            ("source_filename", source_filename),
+            ("streams_filename", split.streams_filename),
+            ("stream_count", str(split.stream_count)),
+            ("streams_size", str(streams_size)),
+        ])
+        for kind, store in ((_MOVIE, split.movies), (_SERIES, split.series)):
+            conn.executemany(
+                "INSERT INTO entries VALUES (?, ?, ?, ?)",
+                zip([kind] * len(store), store.column("title"), store.column("safe_title"), store.column("url")),
+            )
+        conn.executemany("INSERT INTO cam VALUES (?)", ((title,) for title in split.cam_titles))
+        # Streams-Datei in Blöcken zu 1 MB als normale BLOBs ablegen, ohne sie ganz in den Speicher zu laden
+        with open(streams_file, "rb") as f:
+            conn.executemany(
+                "INSERT INTO streams (data) VALUES (?)",
+                ((chunk,) for chunk in iter(lambda: f.read(_BLOB_CHUNK_SIZE), b"")),
+            )
+        conn.commit()
+    except BaseException:
+        conn.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+    conn.close()
+    os.replace(tmp_path, path)
+    logger.info(f"Parse-Cache gespeichert: {path}")
+
+
+def cached_split_playlist(filename: str, sha256: str = "", use_cache: bool = True, **kwargs) -> PlaylistSplit:
+    """
+    ``split_playlist`` mit Cache: gleicher Playlist-Hash → Einträge aus dem Cache.
+
+    :param filename: Dateiname der heruntergeladenen Playlist in tmp/
+    :param sha256: Hash der Playlist (vom Download); leer → wird aus der Datei berechnet
+    :param use_cache: False → immer parsen, Cache nicht anfassen
+    :param kwargs: weitere Argumente für ``split_playlist``
+    """
+    # Debug-Dateien (movies_/series_) entstehen nur beim echten Parsen
+    if not use_cache or kwargs.get("write_tmp_files"):
+        return split_playlist(filename, **kwargs)
+
+    sha256 = sha256 or file_digest(Path.cwd() / "tmp" / filename)
+    split = load_split(sha256)
+    if split is not None:
+        return split
+
+    split = split_playlist(filename, **kwargs)
+    try:
+        save_split(split, filename, sha256)
+    except Exception as e:
+        # Ohne Cache geht es trotzdem weiter – nächster Lauf parst eben erneut
+        logger.info(f"Parse-Cache konnte nicht gespeichert werden: {type(e).__name__}: {e}")
+    return split
+
+
+def main():
+    """Inhalt des Caches anzeigen (zum Debuggen)."""
+    log_start()
+    split = load_split()
+    if split is None:
+        logger.info("Kein Parse-Cache vorhanden.")
+    else:
+        logger.info(f"Playlist: {split.source_filename}")
+        logger.info(f"Filme: {split.movies.describe()}")
+        logger.info(f"Serien: {split.series.describe()}")
+    log_end()
+
+
+if __name__ == "__main__":
+    main()
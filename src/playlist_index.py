@@ -0,0 +1,83 @@
+import os
+from pathlib import Path
+from typing import Union
+from logger import logger
+from src.run_state import load_state, save_state
+
+"""
+Inkrementeller Abgleich zwischen zwei Läufen.
+
+Pro Bibliothek (Filme/Serien) wird der Stand des letzten Laufs als Index
+gespeichert: Schlüssel (Zielpfad der .strm relativ zur Bibliothek) → [URL, ok].
+Nur neue, geänderte oder zuletzt fehlgeschlagene Einträge gehen erneut in den
+URL-Check und an das Dateisystem; unveränderte Einträge kosten nichts.
+"""
+
+
+class IndexDiff:
+    def __init__(self, added: int, changed: int, retry: int, removed: int, unchanged: int):
+        self.added = added
+        self.changed = changed
+        self.retry = retry
+        self.removed = removed
+        self.unchanged = unchanged
+
+
+class PlaylistIndex:
+    def __init__(self, kind: str, target_base_path: Union[Path, str], enabled: bool = True):
+        """
+        :param kind: "movies" oder "series" (Name der State-Datei state/index_<kind>.json)
+        :param target_base_path: Bibliothekspfad; ändert er sich, wird der Index verworfen
+        :param enabled: False → jeder Eintrag gilt als neu (voller Abgleich)
+        """
+        self.name = f"index_{kind}"
+        self.target = os.path.abspath(str(target_base_path))
+        self.enabled = enabled
+        self.previous: dict[str, list] = {}
+        self.current: dict[str, list] = {}
+        if enabled:
+            data = load_state(self.name)
+            if data and data.get("target") == self.target:
+                self.previous = data.get("entries", {})
+
+    def diff(self, current_urls: dict[str, str]) -> IndexDiff:
+        """Vergleicht {Schlüssel: URL} des aktuellen Laufs mit dem letzten Lauf."""
+        added = changed = retry = unchanged = 0
+        for key, url in current_urls.items():
+            rec = self.previous.get(key)
+            if rec is None:
+                added += 1
+            elif rec[0] != url:
+                changed += 1
+            elif not rec[1]:
+                retry += 1
+            else:
+                unchanged += 1
+        removed = sum(1 for key in self.previous if key not in current_urls)
+        return IndexDiff(added, changed, retry, removed, unchanged)
+
+    def log_diff(self, label: str, current_urls: dict[str, str]) -> IndexDiff:
+        d = self.diff(current_urls)
+        if not self.enabled:
+            logger.info(f"Diff {label}: inkrementeller Abgleich deaktiviert – voller Abgleich")
+        elif not self.previous:
+            logger.info(f"Diff {label}: kein Index vom letzten Lauf – voller Abgleich")
+        else:
+            logger.info(
+                f"Diff {label}: neu {d.added}, geändert {d.changed}, zuletzt offline {d.retry}, "
+                f"entfernt {d.removed}, unverändert {d.unchanged}"
+            )
+        return d
+
+    def is_unchanged(self, key: str, url: str) -> bool:
+        """True, wenn der Eintrag im letzten Lauf mit gleicher URL erfolgreich angelegt wurde."""
+        rec = self.previous.get(key)
+        return rec is not None and rec[0] == url and bool(rec[1])
+
+    def record(self, key: str, url: str, ok: bool) -> None:
+        self.current[key] = [url, ok]
+
+    def save(self) -> None:
+        if not self.enabled:
+            return
+        save_state(self.name, {"target": self.target, "entries": self.current}, compact=True)
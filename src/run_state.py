@@ -0,0 +1,49 @@
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+# Persistenter Zustand zwischen zwei Läufen (ETag, Hash der Playlist, …).
+# Liegt bewusst NICHT in tmp/, da tmp/ bei jedem geänderten Download geleert wird.
+STATE_DIR = Path.cwd() / "state"
+
+
+def ensure_state_dir() -> Path:
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    return STATE_DIR
+
+
+def load_state(name: str) -> Optional[dict]:
+    """Lädt state/<name>.json, falls vorhanden und lesbar (sonst None)."""
+    path = ensure_state_dir() / f"{name}.json"
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def save_state(name: str, data: dict, compact: bool = False) -> None:
+    """
+    Speichert state/<name>.json atomar (erst .tmp schreiben, dann umbenennen).
+    ``compact`` verzichtet auf Einrückung (für große Indizes).
+    """
+    path = ensure_state_dir() / f"{name}.json"
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        if compact:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        else:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def delete_state(name: str) -> None:
+    """Entfernt state/<name>.json, falls vorhanden."""
+    path = ensure_state_dir() / f"{name}.json"
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
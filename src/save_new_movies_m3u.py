@@ -1,124 +1,155 @@
 from pathlib import Path
-import shutil
-from functions import sanitize_filename
+from functions import sanitize_filename, load_option
 from logger import logger
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from src.url_check import is_url_downloadable_with_reason
+from src.verify_scheduler import verify_urls
 from src.offline_tracker import add_offline
-
-def save_new_movies_m3u(filename, path, blocklist):
+from src.m3u_parser import resolve_entries
+from src.entry_store import EntryStore
+from src.playlist_index import PlaylistIndex
+from src.sync_pipeline import Stage
+from src.strm_manifest import open_manifest
+from src.sync_plan import SyncPlan, PlanApplier, Change, emit, plan_path
+
+def save_new_movies_m3u(source, path, blocklist, incremental=True, plan_only=False):
+    """
+    :param source: Dateiname in tmp/ oder bereits geparste Einträge (``EntryStore`` aus ``split_playlist``)
+    :param path: Zielordner für die Film-.strm-Dateien
+    :param blocklist: BlocklistStore (exakte Titel und Muster, ``title in blocklist``)
+    :param incremental: Nur Einträge prüfen/schreiben, die sich seit dem letzten Lauf geändert haben
+    :param plan_only: Nur den Änderungsplan erstellen (tmp/plan_movies.json), Bibliothek nicht anfassen
+    """
     logger.info("=" * 30)
     logger.info("Check / Erstelle Filme")
     logger.info("=" * 30)
 
-    tmp_dir = Path.cwd() / "tmp"
-    input_file = tmp_dir / filename
     target_base_path = Path(path)
 
-    # 1. Erfasse alle vorhandenen .strm-Dateien
-    existing_strm_files = set(target_base_path.rglob("*.strm"))
+    # 1. Vorhandene .strm-Dateien aus dem Manifest (statt rglob über die ganze Bibliothek)
+    manifest = open_manifest(target_base_path, readonly=plan_only)
+    existing_strm_files = manifest.paths()
     processed_strm_files = set()
-    created_titles = []
+    offline_reasons = {}
     deleted_titles = []
 
-    # M3U-Datei lesen
-    lines = input_file.read_text(encoding='utf-8', errors='ignore').splitlines()
-
     # 1) Einträge parsen (Titel/URL), Blockliste sofort anwenden
-    entries = []  # {title, safe_title, url}
-    i = 1  # Start bei Zeile 1 (Zeile 0 ist #EXTM3U)
-    while i < len(lines) - 1:
-        line_info = lines[i].strip()
-        line_url = lines[i + 1].strip()
-
-        if not line_info.startswith("#EXTINF:-1,"):
-            i += 2
+    # Spaltenweise statt ein dict pro Eintrag (spart bei großen Playlists viel Speicher)
+    entries = EntryStore(("title", "safe_title", "url"), flags=("unchanged",))
+    for entry in resolve_entries(source):
+        title = entry.title
+        line_url = entry.url
+        if not title:
             continue
-
-        title = line_info.replace("#EXTINF:-1,", "").strip()
-        safe_title = sanitize_filename(title)
+        safe_title = getattr(entry, "safe_title", None) or sanitize_filename(title)
 
         if safe_title in blocklist:
             logger.info(f"Gesperrt: {title}")
-            i += 2
             continue
 
-        entries.append({"title": title, "safe_title": safe_title, "url": line_url})
-        i += 2
+        entries.append(title=title, safe_title=safe_title, url=line_url)
 
-    # 2) URL-Checks parallel (dedupliziert)
-    url_to_titles = {}
-    for e in entries:
-        url_to_titles.setdefault(e["url"], []).append(e["title"])
-    unique_urls = list(url_to_titles.keys())
-
-    def check(u: str):
-        ok, reason = is_url_downloadable_with_reason(u)
-        return u, ok, reason
-
-    results = {}
-    if unique_urls:
-        with ThreadPoolExecutor(max_workers=30) as ex:
-            future_to_url = {ex.submit(check, url): url for url in unique_urls}
-            for fut in as_completed(future_to_url):
-                url, ok, reason = fut.result()
-                results[url] = (ok, reason)
-                sample_title = url_to_titles.get(url, [url])[0]
-                if ok:
-                    logger.info(f"Geprüft: {sample_title} → OK")
-                else:
-                    logger.info(f"Geprüft: {sample_title} → FAIL ({reason})")
+    logger.info(f"Filme: {entries.describe()}")
 
-    # 3) Dateien anlegen/aktualisieren basierend auf Check-Ergebnis
+    # 1b) Diff gegen den letzten Lauf: unveränderte Einträge nicht schreiben, nur per Rotation nachprüfen
+    index = PlaylistIndex("movies", target_base_path, enabled=incremental)
+    index.log_diff("Filme", {e["safe_title"]: e["url"] for e in entries})
+    known_good = set()
     for e in entries:
+        file_path = target_base_path / e["safe_title"] / f"{e['safe_title']}.strm"
+        e["unchanged"] = index.is_unchanged(e["safe_title"], e["url"]) and file_path in existing_strm_files
+        if e["unchanged"]:
+            known_good.add(e["url"])
+
+    # 3) Änderungen planen basierend auf Check-Ergebnis (eigener Thread, startet mit dem ersten Ergebnis);
+    #    der Applier führt sie batchweise aus, sobald genug zusammengekommen sind
+    plan = SyncPlan("movies", target_base_path)
+    applier = None
+    if not plan_only:
+        applier = PlanApplier(
+            manifest,
+            workers=load_option('SYNC', 'fs_workers', 8, int),
+            batch_size=load_option('SYNC', 'apply_batch_size', 500, int),
+            known_dirs={target_base_path} | {p.parent for p in existing_strm_files},
+            name="Dateisystem Filme",
+        )
+
+    def write_entry(item):
+        e, ok, reason = item
         title = e["title"]
         safe_title = e["safe_title"]
         line_url = e["url"]
+        file_path = target_base_path / safe_title / f"{safe_title}.strm"
 
-        ok, reason = results.get(line_url, (False, "unknown"))
+        index.record(safe_title, line_url, ok)
         if not ok:
             logger.info(f"Übersprungen (nicht downloadbar): {title} ({reason})")
             add_offline(title, line_url, kind="movie", reason=reason)
-            continue
+            offline_reasons[file_path] = reason
+            return
+        processed_strm_files.add(file_path)
+        if e["unchanged"]:
+            # Datei liegt schon mit gleicher URL auf der Platte
+            return
+
+        # Vergleich gegen das Manifest – die Platte wird nur bei echten Änderungen angefasst
+        if manifest.url_matches(file_path, line_url):
+            logger.info(f"Unverändert: {file_path}")
+        elif file_path in manifest:
+            emit(plan, applier, Change("update", file_path, line_url, "Link geändert", title))
+        else:
+            emit(plan, applier, Change("create", file_path, line_url, "neu", title))
 
-        folder_path = target_base_path / safe_title
-        folder_path.mkdir(parents=True, exist_ok=True)
+    writer = Stage("Filme schreiben", write_entry, maxsize=load_option('SYNC', 'write_queue_size', 1000, int))
 
-        file_path = folder_path / f"{safe_title}.strm"
-        processed_strm_files.add(file_path)
+    # 2) URL-Checks parallel (dedupliziert, mit rotierendem Prüfbudget); Ergebnisse gehen sofort an den Writer
+    url_to_entries = {}
+    for e in entries:
+        url_to_entries.setdefault(e["url"], []).append(e.index)
+    unique_urls = list(url_to_entries.keys())
+
+    try:
+        results = {}
+        if unique_urls:
+            def on_result(url: str, ok: bool, reason: str):
+                pending = url_to_entries.pop(url, [])
+                sample_title = entries.get(pending[0], "title") if pending else url
+                if ok:
+                    logger.info(f"Geprüft: {sample_title} → OK")
+                else:
+                    logger.info(f"Geprüft: {sample_title} → FAIL ({reason})")
+                for e in entries.rows(pending):
+                    writer.put((e, ok, reason))
 
-        if not file_path.exists():
-            file_path.write_text(line_url, encoding='utf-8')
-            logger.info(f"Erstellt: {file_path}")
-            created_titles.append(title)
-        else:
-            existing_url = file_path.read_text(encoding='utf-8').strip()
-            if existing_url != line_url:
-                logger.info(f"Link geändert: {existing_url} → {line_url}")
-                file_path.unlink()
-                file_path.write_text(line_url, encoding='utf-8')
-                logger.info(f"Aktualisiert: {file_path}")
-            else:
-                logger.info(f"Unverändert: {file_path}")
-
-    # 3. Vergleiche und lösche veraltete Dateien
+            results = verify_urls(unique_urls, on_result=on_result, known_good=known_good)
+
+        # Übernommene Ergebnisse (ohne Netzwerkprüfung)
+        for url, pending in url_to_entries.items():
+            ok, reason = results.get(url, (False, "unknown"))
+            for e in entries.rows(pending):
+                writer.put((e, ok, reason))
+    finally:
+        writer.close()
+
+    # 3. Vergleiche und lösche veraltete Dateien (Film-Ordner komplett, inkl. evtl. verbleibender Dateien)
     strm_files_to_delete = existing_strm_files - processed_strm_files
-    for file_path in strm_files_to_delete:
-        try:
-            parent_dir = file_path.parent
-            # Datei löschen
-            if file_path.exists():
-                file_path.unlink()
-                logger.info(f"Gelöscht: {file_path}")
-            deleted_titles.append(file_path.stem)
-
-            # Kompletten Film-Ordner entfernen (inkl. evtl. verbleibender Dateien)
-            if parent_dir.exists():
-                shutil.rmtree(parent_dir)
-                logger.info(f"Film-Ordner gelöscht: {parent_dir}")
-
-        except OSError as e:
-            logger.error(f"Fehler beim Löschen von {file_path} oder dem Verzeichnis: {e}")
-
-    return created_titles, deleted_titles
+    dirs_to_delete = set()
+    for file_path in sorted(strm_files_to_delete):
+        deleted_titles.append(file_path.stem)
+        reason = "offline: " + offline_reasons[file_path] if file_path in offline_reasons else "nicht mehr in Playlist"
+        parent_dir = file_path.parent
+        if parent_dir == target_base_path:
+            emit(plan, applier, Change("delete", file_path, reason=reason, title=file_path.stem))
+        elif parent_dir not in dirs_to_delete:
+            dirs_to_delete.add(parent_dir)
+            emit(plan, applier, Change("rmtree", parent_dir, reason=reason, title=file_path.stem))
+
+    plan.log_summary("Filme")
+    plan.save(plan_path("movies"))
+    if plan_only:
+        manifest.close()
+        return plan.titles("create"), deleted_titles
+
+    applier.close()
+    index.save()
+    manifest.close()
+    return applier.created, deleted_titles
@@ -1,44 +1,49 @@
 import re
 from pathlib import Path
-import shutil
-from functions import sanitize_filename
+from functions import sanitize_filename, load_option
 from logger import logger
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from src.url_check import is_url_downloadable_with_reason
+from src.verify_scheduler import verify_urls
+from src.series_probe import SeasonSampler
 from src.offline_tracker import add_offline
-
-def save_new_series_m3u(filename, path, blocklist):
+from src.m3u_parser import resolve_entries
+from src.entry_store import EntryStore
+from src.playlist_index import PlaylistIndex
+from src.sync_pipeline import Stage
+from src.strm_manifest import open_manifest
+from src.sync_plan import SyncPlan, PlanApplier, Change, emit, plan_path
+
+def save_new_series_m3u(source, path, blocklist, incremental=True, plan_only=False):
+    """
+    :param source: Dateiname in tmp/ oder bereits geparste Einträge (``EntryStore`` aus ``split_playlist``)
+    :param path: Zielordner für die Serien-.strm-Dateien
+    :param blocklist: BlocklistStore (exakte Titel, Muster und serie:-Regeln)
+    :param incremental: Nur Einträge prüfen/schreiben, die sich seit dem letzten Lauf geändert haben
+    :param plan_only: Nur den Änderungsplan erstellen (tmp/plan_series.json), Bibliothek nicht anfassen
+    """
     logger.info("=" * 30)
     logger.info("Check / Erstelle Serien")
     logger.info("=" * 30)
 
-    tmp_dir = Path.cwd() / "tmp"
-    input_file = tmp_dir / filename
     target_base_path = Path(path)
 
-    # 1. Erfasse alle vorhandenen .strm-Dateien
-    existing_strm_files = set(target_base_path.rglob("*.strm"))
+    # 1. Vorhandene .strm-Dateien aus dem Manifest (statt rglob über die ganze Bibliothek)
+    manifest = open_manifest(target_base_path, readonly=plan_only)
+    existing_strm_files = manifest.paths()
     processed_strm_files = set()
-    created_titles = []
+    offline_reasons = {}
     deleted_titles = []
 
-    # M3U-Datei zeilenweise lesen
-    lines = input_file.read_text(encoding='utf-8', errors='ignore').splitlines()
-
     # 1) Einträge parsen (Serienstruktur + Blockliste anwenden)
-    entries = []  # {full_name, safe_full_name, series_name, safe_series_name, serien_ordner, staffel_ordner, url}
-    i = 1
-    while i < len(lines) - 1:
-        extinf_line = lines[i].strip()
-        url_line = lines[i+1].strip()
-
-        if not extinf_line.startswith("#EXTINF:-1,"):
-            i += 2
+    # Spaltenweise statt ein dict pro Eintrag; Serien- und Staffelnamen wiederholen sich stark und werden gepoolt
+    entries = EntryStore(("full_name", "safe_full_name", "url"),
+                         pooled=("series_name", "serien_ordner", "staffel_ordner"), flags=("unchanged",))
+    for entry in resolve_entries(source):
+        full_name = entry.title
+        url_line = entry.url
+        if not full_name:
             continue
 
-        full_name = extinf_line[len("#EXTINF:-1,"):]
-
         staffel_match = re.search(r'\sS(\d+)\sE(\d+)', full_name, re.IGNORECASE)
         if staffel_match:
             serien_name = full_name[:staffel_match.start()].strip()
@@ -47,12 +52,12 @@ def save_new_series_m3u(filename, path, blocklist):
             serien_name = full_name.strip()
             staffel_nummer = None
 
-        safe_full_name = sanitize_filename(full_name)
+        safe_full_name = getattr(entry, "safe_title", None) or sanitize_filename(full_name)
         safe_serien_name = sanitize_filename(serien_name)
 
-        if safe_full_name in blocklist or safe_serien_name in blocklist:
+        # Episodentitel gegen alle Regeln, Serienname gegen exakte Einträge und serie:-Regeln
+        if safe_full_name in blocklist or blocklist.blocks_series(safe_serien_name):
             logger.info(f"Gesperrt: {full_name}")
-            i += 2
             continue
 
         serien_ordner = safe_serien_name
@@ -61,74 +66,108 @@ def save_new_series_m3u(filename, path, blocklist):
         else:
             staffel_ordner = "Staffel Unbekannt"
 
-        entries.append({
-            "full_name": full_name,
-            "safe_full_name": safe_full_name,
-            "series_name": serien_name,
-            "safe_series_name": safe_serien_name,
-            "serien_ordner": serien_ordner,
-            "staffel_ordner": staffel_ordner,
-            "url": url_line,
-        })
-        i += 2
-
-    # 2) URL-Checks parallel (dedupliziert)
-    url_to_titles = {}
-    for e in entries:
-        url_to_titles.setdefault(e["url"], []).append(e["full_name"])
-    unique_urls = list(url_to_titles.keys())
-
-    def check(u: str):
-        ok, reason = is_url_downloadable_with_reason(u)
-        return u, ok, reason
-
-    results = {}
-    if unique_urls:
-        with ThreadPoolExecutor(max_workers=30) as ex:
-            future_to_url = {ex.submit(check, url): url for url in unique_urls}
-            for fut in as_completed(future_to_url):
-                url, ok, reason = fut.result()
-                results[url] = (ok, reason)
-                sample_title = url_to_titles.get(url, [url])[0]
-                if ok:
-                    logger.info(f"Geprüft: {sample_title} → OK")
-                else:
-                    logger.info(f"Geprüft: {sample_title} → FAIL ({reason})")
+        entries.append(
+            full_name=full_name,
+            safe_full_name=safe_full_name,
+            series_name=serien_name,
+            serien_ordner=serien_ordner,
+            staffel_ordner=staffel_ordner,
+            url=url_line,
+        )
+
+    logger.info(f"Serien: {entries.describe()}")
+
+    # 1b) Diff gegen den letzten Lauf: unveränderte Einträge nicht schreiben, nur per Rotation nachprüfen
+    def index_key(e):
+        return f"{e['serien_ordner']}/{e['staffel_ordner']}/{e['safe_full_name']}"
 
-    # 3) Dateien anlegen/aktualisieren
+    index = PlaylistIndex("series", target_base_path, enabled=incremental)
+    index.log_diff("Serien", {index_key(e): e["url"] for e in entries})
+    known_good = set()
     for e in entries:
+        strm_datei = target_base_path / e["serien_ordner"] / e["staffel_ordner"] / (e["safe_full_name"] + ".strm")
+        e["unchanged"] = index.is_unchanged(index_key(e), e["url"]) and strm_datei in existing_strm_files
+        if e["unchanged"]:
+            known_good.add(e["url"])
+
+    # 3) Änderungen planen (eigener Thread, startet mit dem ersten Ergebnis);
+    #    der Applier führt sie batchweise aus, sobald genug zusammengekommen sind
+    plan = SyncPlan("series", target_base_path)
+    applier = None
+    if not plan_only:
+        applier = PlanApplier(
+            manifest,
+            workers=load_option('SYNC', 'fs_workers', 8, int),
+            batch_size=load_option('SYNC', 'apply_batch_size', 500, int),
+            known_dirs={target_base_path} | {p.parent for p in existing_strm_files}
+                       | {p.parent.parent for p in existing_strm_files},
+            suffix="\n",
+            name="Dateisystem Serien",
+        )
+
+    def write_entry(item):
+        e, ok, reason = item
         full_name = e["full_name"]
-        safe_full_name = e["safe_full_name"]
         series_name = e["series_name"]
-        serien_ordner = e["serien_ordner"]
-        staffel_ordner = e["staffel_ordner"]
         url_line = e["url"]
+        strm_datei = target_base_path / e["serien_ordner"] / e["staffel_ordner"] / (e["safe_full_name"] + ".strm")
 
-        ok, reason = results.get(url_line, (False, "unknown"))
+        index.record(index_key(e), url_line, ok)
         if not ok:
             logger.info(f"Übersprungen (nicht downloadbar): {full_name} ({reason})")
             add_offline(series_name, url_line, kind="series", reason=reason)
-            continue
-
-        ziel_ordner = target_base_path / serien_ordner / staffel_ordner
-        ziel_ordner.mkdir(parents=True, exist_ok=True)
-
-        dateiname_strm = safe_full_name + ".strm"
-        strm_datei = ziel_ordner / dateiname_strm
+            offline_reasons[strm_datei] = reason
+            return
         processed_strm_files.add(strm_datei)
-
-        if strm_datei.exists():
-            bestehender_link = strm_datei.read_text(encoding='utf-8', errors='ignore').strip()
-            if bestehender_link == url_line:
-                logger.info(f"{strm_datei} existiert bereits mit gleichem Link.")
-            else:
-                logger.info(f"{strm_datei} existiert, Link anders – Datei wird aktualisiert.")
-                strm_datei.unlink()
-                strm_datei.write_text(url_line + "\n", encoding='utf-8')
+        if e["unchanged"]:
+            # Datei liegt schon mit gleicher URL auf der Platte
+            return
+
+        # Vergleich gegen das Manifest – die Platte wird nur bei echten Änderungen angefasst
+        if manifest.url_matches(strm_datei, url_line):
+            logger.info(f"{strm_datei} existiert bereits mit gleichem Link.")
+        elif strm_datei in manifest:
+            emit(plan, applier, Change("update", strm_datei, url_line, "Link geändert", full_name))
         else:
-            logger.info(f"➕ Erstelle neue Datei: {strm_datei}")
-            strm_datei.write_text(url_line + "\n", encoding='utf-8')
-            created_titles.append(full_name)
+            emit(plan, applier, Change("create", strm_datei, url_line, "neu", full_name))
+
+    writer = Stage("Serien schreiben", write_entry, maxsize=load_option('SYNC', 'write_queue_size', 1000, int))
+
+    # 2) URL-Checks parallel (dedupliziert, mit rotierendem Prüfbudget); Ergebnisse gehen sofort an den Writer
+    url_to_entries = {}
+    for e in entries:
+        url_to_entries.setdefault(e["url"], []).append(e.index)
+    unique_urls = list(url_to_entries.keys())
+
+    try:
+        results = {}
+        if unique_urls:
+            def on_result(url: str, ok: bool, reason: str):
+                pending = url_to_entries.pop(url, [])
+                sample_title = entries.get(pending[0], "full_name") if pending else url
+                if ok:
+                    logger.info(f"Geprüft: {sample_title} → OK")
+                else:
+                    logger.info(f"Geprüft: {sample_title} → FAIL ({reason})")
+                for e in entries.rows(pending):
+                    writer.put((e, ok, reason))
+
+            # Pro Staffel erst Stichproben, nur bei gemischtem Ergebnis alle Episoden
+            sampler = None
+            if load_option('URL_CHECK', 'series_sampling', True, bool):
+                url_to_season = {url: (entries.get(es[0], "serien_ordner"), entries.get(es[0], "staffel_ordner"))
+                                 for url, es in url_to_entries.items()}
+                sampler = SeasonSampler(url_to_season, load_option('URL_CHECK', 'series_sample_size', 2, int))
+
+            results = verify_urls(unique_urls, on_result=on_result, known_good=known_good, sampler=sampler)
+
+        # Übernommene bzw. aus Stichproben abgeleitete Ergebnisse (ohne eigene Netzwerkprüfung)
+        for url, pending in url_to_entries.items():
+            ok, reason = results.get(url, (False, "unknown"))
+            for e in entries.rows(pending):
+                writer.put((e, ok, reason))
+    finally:
+        writer.close()
 
     # 3. Vergleiche und lösche veraltete Dateien
     strm_files_to_delete = existing_strm_files - processed_strm_files
@@ -148,39 +187,52 @@ def save_new_series_m3u(filename, path, blocklist):
     for f in strm_files_to_delete:
         season_to_delete[f.parent].add(f)
 
-    # 3a) Einzelne Dateien löschen
-    for file_path in strm_files_to_delete:
-        try:
-            if file_path.exists():
-                file_path.unlink()
-                logger.info(f"Gelöscht: {file_path}")
-            deleted_titles.append(file_path.stem)
-        except OSError as e:
-            logger.info(f"Fehler beim Löschen von {file_path}: {e}")
-
-    # 3b) Ganze Staffeln löschen, wenn alle Episoden betroffen sind
-    seasons_removed = set()
-    for season_dir, del_set in season_to_delete.items():
-        all_files_in_season = season_to_files.get(season_dir, set())
-        if del_set and del_set == all_files_in_season:
-            # komplette Staffel löschen (rekursiv), inkl. NFO/JPG etc.
-            try:
-                if season_dir.exists():
-                    shutil.rmtree(season_dir)
-                    logger.info(f"Staffel-Ordner gelöscht: {season_dir}")
-                    seasons_removed.add(season_dir)
-            except OSError as e:
-                logger.info(f"Fehler beim Löschen des Staffel-Ordners {season_dir}: {e}")
-
-    # 3c) Ganze Serien löschen, wenn alle Staffeln entfernt wurden
-    for series_dir, seasons in series_to_seasons.items():
-        if seasons and seasons.issubset(seasons_removed):
-            try:
-                if series_dir.exists():
-                    shutil.rmtree(series_dir)
-                    logger.info(f"Serien-Ordner gelöscht: {series_dir}")
-            except OSError as e:
-                logger.info(f"Fehler beim Löschen des Serien-Ordners {series_dir}: {e}")
+    # Komplette Staffeln (alle Episoden betroffen) und Serien (alle Staffeln betroffen)
+    # werden rekursiv gelöscht, inkl. NFO/JPG etc.; sonst nur die einzelnen Dateien
+    # Ordner mit in diesem Lauf geschriebenen Dateien bleiben in jedem Fall erhalten
+    active_seasons = {f.parent for f in processed_strm_files}
+    active_series = {d.parent for d in active_seasons}
+    full_seasons = {season_dir for season_dir, del_set in season_to_delete.items()
+                    if del_set == season_to_files.get(season_dir, set()) and season_dir not in active_seasons}
+    full_series = {series_dir for series_dir, seasons in series_to_seasons.items()
+                   if seasons and seasons.issubset(full_seasons)
+                   and series_dir not in active_series}
+
+    def delete_reason(files):
+        for f in sorted(files):
+            if f in offline_reasons:
+                return "offline: " + offline_reasons[f]
+        return "nicht mehr in Playlist"
+
+    for file_path in sorted(strm_files_to_delete):
+        deleted_titles.append(file_path.stem)
+
+    # 3a) Ganze Serien löschen
+    for series_dir in sorted(full_series):
+        files = [f for season_dir in series_to_seasons[series_dir] for f in season_to_files[season_dir]]
+        emit(plan, applier, Change("rmtree", series_dir, reason=delete_reason(files), title=series_dir.name))
+
+    # 3b) Ganze Staffeln löschen (sofern nicht schon mit der Serie entfernt)
+    for season_dir in sorted(full_seasons):
+        if season_dir.parent in full_series:
+            continue
+        emit(plan, applier, Change("rmtree", season_dir, reason=delete_reason(season_to_files[season_dir]),
+                                   title=f"{season_dir.parent.name} {season_dir.name}"))
+
+    # 3c) Einzelne Dateien aus Staffeln, die erhalten bleiben
+    for file_path in sorted(strm_files_to_delete):
+        if file_path.parent in full_seasons:
+            continue
+        emit(plan, applier, Change("delete", file_path, reason=delete_reason([file_path]), title=file_path.stem))
+
+    plan.log_summary("Serien")
+    plan.save(plan_path("series"))
+    if plan_only:
+        manifest.close()
+        return plan.titles("create"), deleted_titles
 
+    applier.close()
+    index.save()
+    manifest.close()
     logger.info("Fertig mit Serien-Verarbeitung.")
-    return created_titles, deleted_titles
+    return applier.created, deleted_titles
@@ -1,7 +1,6 @@
-import os
-import shutil
 from pathlib import Path
 from logger import logger
+from src.m3u_publish import publish_file
 
 def save_new_stream_m3u(filename, path_m3u):
     logger.info("=" * 30)
@@ -12,27 +11,11 @@ def save_new_stream_m3u(filename, path_m3u):
     tmp_dir = Path.cwd() / "tmp"
     input_file = tmp_dir / filename
     path_m3u = Path(path_m3u)
+    target_file = path_m3u / "iptv.m3u"
 
-    # 1. Suche nach existierender Datei mit "streams_" Prefix
-    existing_file = path_m3u / "iptv.m3u"
-
-    # 2. Keine bestehende Datei gefunden → direkt speichern
-    if not existing_file.exists():
-        new_path = path_m3u / "iptv.m3u"
-        shutil.copy2(input_file, new_path)
-        logger.info(f"Neue Stream-Datei gespeichert: {new_path}")
-        return
-
-    # 3. Bestehende Datei gefunden → Zeilenweise vergleichen
-    new_lines = input_file.read_text(encoding='utf-8', errors='ignore').splitlines(keepends=True)
-    old_lines = existing_file.read_text(encoding='utf-8', errors='ignore').splitlines(keepends=True)
-
-    # 4. Unterschied festgestellt → alte Datei löschen, neue unter neuem Namen speichern
-    if new_lines != old_lines:
-        logger.info("Änderung erkannt – ersetze alte Datei.")
-        existing_file.unlink()
-        new_path = path_m3u / "iptv.m3u"
-        shutil.copy2(input_file, new_path)
-        logger.info(f"Neue Datei gespeichert: {new_path}")
+    # Vergleich per Hash (gespeicherter Hash der zuletzt veröffentlichten Datei),
+    # Ersetzen atomar über temporäre Datei + Umbenennen – unverändert → Ziel bleibt unangetastet
+    if publish_file(input_file, target_file):
+        logger.info(f"Änderung erkannt – neue Datei gespeichert: {target_file}")
     else:
-        logger.info("Keine Änderung – bestehende Datei bleibt erhalten.")
\ No newline at end of file
+        logger.info("Keine Änderung – bestehende Datei bleibt erhalten.")
@@ -0,0 +1,97 @@
+from typing import Callable
+from logger import logger
+
+"""
+Hierarchische Prüfung von Serien-Episoden.
+
+Ausfälle betreffen fast immer eine ganze Staffel oder Serie. Statt jede Episode
+einzeln zu prüfen:
+1) pro Staffel eine repräsentative Episode prüfen,
+2) Stichprobe von ``sample_size`` weiteren Episoden; Staffeln mit
+   fehlgeschlagenem Repräsentanten kommen nachrangig an die Reihe. Ist jede
+   Staffel einer Serie ausgefallen, gilt die ganze Serie als offline,
+3) nur Staffeln mit gemischtem Ergebnis werden vollständig geprüft.
+Für die übrigen Episoden einheitlicher Staffeln wird das Ergebnis abgeleitet
+(nicht im URL-Cache gespeichert – die Rotation verifiziert sie später).
+"""
+
+# Staffeln bis zu dieser Größe werden direkt komplett geprüft
+_SMALL_SEASON = 3
+
+
+class SeasonSampler:
+    def __init__(self, url_to_season: dict[str, tuple[str, str]], sample_size: int = 2):
+        """
+        :param url_to_season: {url: (serien_ordner, staffel_ordner)}
+        :param sample_size: Zusätzlich geprüfte Episoden pro Staffel
+        """
+        self.url_to_season = url_to_season
+        self.sample_size = max(1, sample_size)
+
+    def __call__(self, urls: list[str], check: Callable[[list[str]], dict]) -> dict[str, tuple[bool, str]]:
+        """Prüft ``urls`` hierarchisch über ``check(batch) -> {url: (ok, reason)}``."""
+        seasons: dict[tuple[str, str], list[str]] = {}
+        for url in urls:
+            seasons.setdefault(self.url_to_season.get(url, ("", url)), []).append(url)
+
+        results: dict[str, tuple[bool, str]] = {}
+
+        # 1) Repräsentanten (kleine Staffeln komplett)
+        first = []
+        for season_urls in seasons.values():
+            first.extend(season_urls if len(season_urls) <= _SMALL_SEASON else season_urls[:1])
+        results.update(check(first))
+
+        large = {key: season_urls for key, season_urls in seasons.items() if len(season_urls) > _SMALL_SEASON}
+        rep_ok = {key: results[season_urls[0]][0] for key, season_urls in large.items()}
+
+        # Serien mit mehreren Staffeln, bei denen jede ausgefallen ist → keine weiteren Proben
+        series_ok: dict[str, bool] = {}
+        season_count: dict[str, int] = {}
+        for (serie, _), season_urls in seasons.items():
+            season_count[serie] = season_count.get(serie, 0) + 1
+            series_ok[serie] = series_ok.get(serie, False) or any(results[u][0] for u in season_urls if u in results)
+        dead_series = {serie for serie, ok in series_ok.items() if not ok and season_count[serie] > 1}
+
+        # 2) Stichproben: OK-Staffeln zuerst, fehlgeschlagene nachrangig
+        ok_samples, fail_samples = [], []
+        for key, season_urls in large.items():
+            if rep_ok[key]:
+                ok_samples.extend(_spread(season_urls[1:], self.sample_size))
+            elif key[0] not in dead_series:
+                fail_samples.extend(_spread(season_urls[1:], self.sample_size))
+        if ok_samples or fail_samples:
+            results.update(check(ok_samples + fail_samples))
+
+        # 3) Gemischte Staffeln komplett prüfen, einheitliche ableiten
+        sweep = []
+        inferred = swept = 0
+        for key, season_urls in large.items():
+            probed = [results[u] for u in season_urls if u in results]
+            oks = {ok for ok, _ in probed}
+            if len(oks) > 1:
+                sweep.extend(u for u in season_urls if u not in results)
+                swept += 1
+                continue
+            ok, reason = probed[0]
+            label = "OK" if ok else f"FAIL, {reason}"
+            for u in season_urls:
+                if u not in results:
+                    results[u] = (ok, f"Staffel-Stichprobe ({label})")
+                    inferred += 1
+        if sweep:
+            results.update(check(sweep))
+
+        logger.info(
+            f"Serien-Stichproben: {len(seasons)} Staffeln, {len(urls) - inferred} URLs geprüft, "
+            f"{inferred} abgeleitet, {swept} Staffeln mit gemischtem Ergebnis komplett geprüft"
+        )
+        return results
+
+
+def _spread(urls: list[str], count: int) -> list[str]:
+    """``count`` möglichst gleichmäßig verteilte Elemente (letzte Episode zuerst)."""
+    if count >= len(urls):
+        return list(urls)
+    step = len(urls) / count
+    return [urls[len(urls) - 1 - int(i * step)] for i in range(count)]
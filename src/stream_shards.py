@@ -0,0 +1,96 @@
+import os
+import re
+from pathlib import Path
+from typing import Optional
+from logger import logger
+from functions import sanitize_filename
+from src.m3u_parser import M3UEntry, iter_entries, extinf_attribute
+from src.m3u_publish import Publisher
+
+"""
+Live-TV-Ausgabe aufgeteilt in mehrere M3U-Dateien (Shards).
+
+Statt einer iptv.m3u mit allen Kanälen entsteht pro ``group-title`` (oder einem
+anderen EXTINF-Attribut) eine eigene Datei im Unterordner ``shard_dir``. Mit
+``pattern`` lässt sich der Shard-Name aus dem Attribut ableiten, z. B.
+``^(\\w+)`` für "DE | Sport" → "DE". Jeder Shard wird nur veröffentlicht,
+wenn sich sein eigener Inhalt (Hash) geändert hat; Shards ohne Kanäle werden
+entfernt. So kann man in Jellyfin einzelne Tuner auf die gewünschten Gruppen
+zeigen lassen, und eine Änderung betrifft nur die betroffene Gruppe.
+"""
+
+NO_GROUP = "Ohne Gruppe"
+
+
+def shard_name(entry: M3UEntry, attribute: str, pattern: Optional[re.Pattern]) -> str:
+    """Shard eines Eintrags: Attributwert, ggf. über ``pattern`` (erste Gruppe bzw. Treffer) verkürzt."""
+    if attribute == "group-title":
+        value = entry.group_title.strip()  # inkl. #EXTGRP als Fallback
+    else:
+        value = extinf_attribute(entry.info, attribute).strip()
+    if value and pattern is not None:
+        match = pattern.search(value)
+        if match is None:
+            value = ""
+        else:
+            value = (match.group(1) if pattern.groups else match.group(0)).strip()
+    return sanitize_filename(value) or NO_GROUP
+
+
+def save_stream_shards(filename, path_m3u, attribute: str = "group-title", pattern: str = "",
+                       shard_dir: str = "iptv_gruppen") -> tuple[int, int, int]:
+    """
+    :param filename: Streams-Datei in tmp/ (aus ``split_playlist``)
+    :param path_m3u: Zielordner der Stream-Playlists
+    :param attribute: EXTINF-Attribut, nach dem aufgeteilt wird
+    :param pattern: Optionaler regulärer Ausdruck für den Shard-Namen
+    :param shard_dir: Unterordner in ``path_m3u`` für die Shards
+    :return: (veröffentlicht, unverändert, entfernt)
+    """
+    logger.info("=" * 30)
+    logger.info(f"Check / Erstelle Stream-Shards nach {attribute}")
+    logger.info("=" * 30)
+
+    tmp_dir = Path.cwd() / "tmp"
+    work_dir = tmp_dir / "stream_shards"
+    target_dir = Path(path_m3u) / shard_dir
+    compiled = re.compile(pattern) if pattern else None
+
+    shards: dict[str, list[str]] = {}
+    for entry in iter_entries(tmp_dir / filename):
+        shards.setdefault(shard_name(entry, attribute, compiled), []).append('\n'.join(entry.lines()) + '\n')
+
+    # Shards lokal schreiben, dann einzeln per Hash veröffentlichen
+    os.makedirs(work_dir, exist_ok=True)
+    publisher = Publisher()
+    published = unchanged = 0
+    targets = set()
+    for name in sorted(shards):
+        source = work_dir / f"{name}.m3u"
+        with open(source, 'w', encoding='utf-8') as f:
+            f.write('#EXTM3U\n')
+            f.writelines(shards[name])
+        target = target_dir / f"{name}.m3u"
+        targets.add(str(target))
+        if publisher.publish(source, target):
+            published += 1
+            logger.info(f"Shard veröffentlicht: {target} ({len(shards[name])} Kanäle)")
+        else:
+            unchanged += 1
+
+    # Shards, die es nicht mehr gibt (nur von uns veröffentlichte Dateien)
+    removed = 0
+    prefix = str(target_dir) + os.sep
+    for stale in [t for t in publisher.records if t.startswith(prefix) and t not in targets]:
+        try:
+            Path(stale).unlink(missing_ok=True)
+            removed += 1
+            logger.info(f"Shard entfernt: {stale}")
+        except OSError as e:
+            logger.info(f"Fehler beim Entfernen von {stale}: {e}")
+            continue
+        publisher.forget(stale)
+    publisher.save()
+
+    logger.info(f"Stream-Shards: {published} veröffentlicht, {unchanged} unverändert, {removed} entfernt")
+    return published, unchanged, removed
@@ -0,0 +1,284 @@
+import hashlib
+import math
+import os
+import random
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Union
+from logger import logger
+from functions import load_option
+from src.run_state import ensure_state_dir
+
+"""
+Manifest der .strm-Dateien einer Bibliothek (SQLite in state/manifest_<Bibliothek>_<Hash>.sqlite).
+
+Pro Datei: relativer Pfad → (Hash der URL, Größe, mtime). Der Sync vergleicht
+gegen das Manifest statt die Bibliothek per rglob zu scannen und jede Datei
+zurückzulesen – auf SMB/NAS spart das pro Lauf Minuten. Jede Schreib- und
+Löschoperation wird nach Erfolg eingetragen und gebündelt committet. Das
+Manifest liegt bewusst nicht in der Bibliothek: Jellyfin-Bibliotheken liegen
+oft auf SMB/NFS, wo SQLite kein WAL beherrscht, und die Datei wäre in der
+Medienbibliothek sichtbar.
+
+Abweichungen (Datei von Hand gelöscht/geändert, abgebrochener Lauf) werden
+beim Öffnen erkannt:
+- ``sample``: Stichprobe von Einträgen per stat() prüfen, bei Abweichung voller Abgleich.
+  Die Stichprobe wächst mit der Bibliothek (Mindestanzahl bzw. Anteil in Prozent);
+  einzelne von Hand gelöschte Dateien fallen damit nur mit entsprechender
+  Wahrscheinlichkeit pro Lauf auf – für sichere Erkennung ``full``
+- ``full``: immer voller Abgleich (scandir + stat, Inhalt nur bei Abweichung lesen)
+- ``off``: keine Prüfung
+Wurde der letzte Lauf nicht sauber beendet, wird immer voll abgeglichen.
+"""
+
+# Frühere Ablage im Bibliotheksordner (wird beim Öffnen entfernt)
+LEGACY_MANIFEST_FILENAME = ".strm_manifest.sqlite"
+_COMMIT_EVERY = 200
+
+
+def url_hash(url: str) -> str:
+    return hashlib.sha1(url.strip().encode("utf-8")).hexdigest()[:16]
+
+
+def manifest_path(base_path: Union[Path, str]) -> Path:
+    """state/manifest_<Ordnername>_<Hash des absoluten Pfads>.sqlite – eindeutig pro Bibliothek."""
+    base = os.path.abspath(str(base_path))
+    name = Path(base).name or "root"
+    digest = hashlib.sha1(base.encode("utf-8")).hexdigest()[:8]
+    return ensure_state_dir() / f"manifest_{name}_{digest}.sqlite"
+
+
+def sample_count(total: int, sample_size: int, sample_percent: float) -> int:
+    """Größe der Stichprobe: mindestens ``sample_size``, bei großen Bibliotheken ``sample_percent`` %."""
+    return min(total, max(sample_size, math.ceil(total * sample_percent / 100)))
+
+
+class StrmManifest:
+    def __init__(self, base_path: Union[Path, str], verify: str = "sample", sample_size: int = 200,
+                 readonly: bool = False, sample_percent: float = 1.0):
+        """
+        :param base_path: Bibliotheksordner (Filme oder Serien)
+        :param verify: "sample", "full" oder "off" (siehe Modul-Docstring)
+        :param sample_size: Mindestanzahl Einträge für die Stichprobe
+        :param readonly: Manifest nur lesen (``--plan-only``): Abgleich und Änderungen
+            bleiben im Speicher, es wird nichts geschrieben
+        :param sample_percent: Anteil der Einträge (in %) für die Stichprobe, falls größer als ``sample_size``
+        """
+        self.base = Path(base_path)
+        self.path = manifest_path(self.base)
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        self._pending = 0
+        if readonly:
+            self._conn = self._open_copy()
+        else:
+            self.base.mkdir(parents=True, exist_ok=True)
+            self._remove_legacy()
+            # Lokaler state/-Ordner → WAL ist sicher (anders als auf SMB/NFS)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, url_hash TEXT NOT NULL, size INTEGER NOT NULL, mtime REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._files: dict[str, tuple[str, int, float]] = {
+            path: (h, size, mtime) for path, h, size, mtime in self._conn.execute("SELECT * FROM files")
+        }
+        state = self._meta("state")
+
+        if state is None:
+            logger.info(f"Manifest: neu – erfasse vorhandene .strm-Dateien in {self.base} (einmalig)")
+            self.verify_full()
+        elif state == "open":
+            logger.info("Manifest: letzter Lauf nicht sauber beendet – voller Abgleich")
+            self.verify_full()
+        elif verify == "full":
+            self.verify_full()
+        elif verify == "sample" and not self.verify_sample(sample_count(len(self._files), sample_size, sample_percent)):
+            logger.info("Manifest: Stichprobe weicht ab – voller Abgleich")
+            self.verify_full()
+
+        self._set_meta("state", "open")
+        self._conn.commit()
+
+    def _open_copy(self) -> sqlite3.Connection:
+        """In-Memory-Kopie des Manifests (leer, falls keins vorhanden oder nicht lesbar)."""
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        path = self.path
+        if path.exists():
+            try:
+                # immutable: kein -wal/-shm anlegen, der Plan-Modus verändert nichts
+                source = sqlite3.connect(f"file:{path.as_posix()}?mode=ro&immutable=1", uri=True)
+                try:
+                    source.backup(conn)
+                finally:
+                    source.close()
+            except sqlite3.Error as e:
+                logger.info(f"Manifest nicht lesbar ({e}) – Abgleich nur im Speicher")
+        return conn
+
+    def _remove_legacy(self) -> None:
+        """Manifest aus früheren Versionen (im Bibliotheksordner) entfernen – es wird in state/ neu aufgebaut."""
+        for suffix in ("", "-wal", "-shm"):
+            legacy = self.base / f"{LEGACY_MANIFEST_FILENAME}{suffix}"
+            try:
+                legacy.unlink()
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logger.info(f"Manifest: altes {legacy.name} konnte nicht entfernt werden: {e}")
+                continue
+            logger.info(f"Manifest: altes {legacy.name} aus der Bibliothek entfernt (liegt jetzt in state/)")
+
+    # --- Meta ---------------------------------------------------------------
+
+    def _meta(self, key: str):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # --- Abfragen -----------------------------------------------------------
+
+    def _rel(self, path: Path) -> str:
+        return path.relative_to(self.base).as_posix()
+
+    def paths(self) -> set[Path]:
+        """Alle bekannten .strm-Dateien als absolute Pfade (Ersatz für rglob)."""
+        with self._lock:
+            return {self.base / rel for rel in self._files}
+
+    def __contains__(self, path: Path) -> bool:
+        return self._rel(path) in self._files
+
+    def url_matches(self, path: Path, url: str) -> bool:
+        """True, wenn die Datei laut Manifest bereits genau diese URL enthält."""
+        rec = self._files.get(self._rel(path))
+        return rec is not None and rec[0] == url_hash(url)
+
+    # --- Änderungen ---------------------------------------------------------
+
+    def record(self, path: Path, url: str, size: int, mtime: float) -> None:
+        """Nach erfolgreichem Schreiben aufrufen."""
+        rel = self._rel(path)
+        h = url_hash(url)
+        with self._lock:
+            self._files[rel] = (h, size, mtime)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, url_hash, size, mtime) VALUES (?, ?, ?, ?)",
+                (rel, h, size, mtime),
+            )
+            self._bump()
+
+    def forget(self, path: Path) -> None:
+        """Nach erfolgreichem Löschen einer Datei aufrufen."""
+        rel = self._rel(path)
+        with self._lock:
+            if self._files.pop(rel, None) is not None:
+                self._conn.execute("DELETE FROM files WHERE path = ?", (rel,))
+                self._bump()
+
+    def forget_tree(self, directory: Path) -> None:
+        """Nach rmtree eines Ordners: alle Einträge darunter entfernen."""
+        prefix = self._rel(directory) + "/"
+        with self._lock:
+            gone = [rel for rel in self._files if rel.startswith(prefix)]
+            for rel in gone:
+                del self._files[rel]
+            self._conn.executemany("DELETE FROM files WHERE path = ?", [(rel,) for rel in gone])
+            self._bump(len(gone))
+
+    def _bump(self, count: int = 1) -> None:
+        self._pending += count
+        if self._pending >= _COMMIT_EVERY:
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self) -> None:
+        """Offene Änderungen committen und den Lauf als sauber beendet markieren."""
+        with self._lock:
+            self._set_meta("state", "clean")
+            self._conn.commit()
+            self._conn.close()
+
+    # --- Abgleich mit der Platte -------------------------------------------
+
+    def verify_sample(self, sample_size: int) -> bool:
+        """stat() für eine Stichprobe; False bei fehlender oder veränderter Datei."""
+        if not self._files:
+            return True
+        for rel in random.sample(list(self._files), min(sample_size, len(self._files))):
+            _, size, mtime = self._files[rel]
+            try:
+                st = os.stat(self.base / rel)
+            except OSError:
+                return False
+            if st.st_size != size or st.st_mtime != mtime:
+                return False
+        return True
+
+    def verify_full(self) -> None:
+        """Ganze Bibliothek per scandir abgleichen; Inhalte nur bei abweichender Größe/mtime lesen."""
+        seen = set()
+        added = changed = 0
+        for rel, size, mtime in self._scan():
+            seen.add(rel)
+            rec = self._files.get(rel)
+            if rec is not None and rec[1] == size and rec[2] == mtime:
+                continue
+            try:
+                content = (self.base / rel).read_text(encoding="utf-8", errors="ignore")
+            except OSError:
+                continue
+            self._files[rel] = (url_hash(content), size, mtime)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, url_hash, size, mtime) VALUES (?, ?, ?, ?)",
+                (rel, url_hash(content), size, mtime),
+            )
+            if rec is None:
+                added += 1
+            else:
+                changed += 1
+        missing = [rel for rel in self._files if rel not in seen]
+        for rel in missing:
+            del self._files[rel]
+        self._conn.executemany("DELETE FROM files WHERE path = ?", [(rel,) for rel in missing])
+        self._conn.commit()
+        logger.info(
+            f"Manifest abgeglichen: {len(self._files)} Dateien "
+            f"({added} neu erfasst, {changed} geändert, {len(missing)} fehlten)"
+        )
+
+    def _scan(self):
+        """(relativer Pfad, Größe, mtime) aller .strm-Dateien unterhalb der Bibliothek."""
+        if not self.base.is_dir():
+            return
+        stack = [self.base]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(Path(entry.path))
+                        elif entry.name.endswith(".strm"):
+                            st = entry.stat()
+                            rel = Path(entry.path).relative_to(self.base).as_posix()
+                            yield rel, st.st_size, st.st_mtime
+            except OSError as e:
+                logger.info(f"Manifest: Ordner nicht lesbar {current}: {e}")
+
+
+def open_manifest(base_path: Union[Path, str], readonly: bool = False) -> StrmManifest:
+    """Manifest einer Bibliothek mit Prüfmodus aus [SYNC] öffnen."""
+    return StrmManifest(
+        base_path,
+        verify=load_option('SYNC', 'manifest_verify', 'sample').lower(),
+        sample_size=load_option('SYNC', 'manifest_verify_sample', 200, int),
+        readonly=readonly,
+        sample_percent=load_option('SYNC', 'manifest_verify_sample_percent', 1.0, float),
+    )
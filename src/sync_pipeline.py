@@ -0,0 +1,60 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+from logger import logger
+
+"""
+Bausteine für den überlappenden Sync (Prüfen → Schreiben → Löschen).
+
+Eine ``Stage`` arbeitet Aufträge in einem eigenen Thread aus einer begrenzten
+Queue ab. Ist die Queue voll, blockiert ``put`` – der vorgelagerte Schritt
+(z. B. die Ergebnisse der URL-Checks) wird dadurch automatisch gebremst.
+"""
+
+_STOP = object()
+
+
+class Stage:
+    def __init__(self, name: str, handler: Callable[[Any], None], maxsize: int = 1000):
+        """
+        :param name: Name für Thread und Log
+        :param handler: Wird pro Auftrag im Stage-Thread aufgerufen
+        :param maxsize: Max. wartende Aufträge (Backpressure)
+        """
+        self.name = name
+        self.handler = handler
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if self._error is not None:
+                continue  # nach einem Fehler nur noch leeren, damit put() nicht hängen bleibt
+            try:
+                self.handler(item)
+            except BaseException as e:
+                self._error = e
+                logger.error(f"{self.name}: Fehler – {e}")
+
+    def put(self, item: Any) -> None:
+        self._queue.put(item)
+
+    def close(self) -> None:
+        """Wartet, bis alle Aufträge erledigt sind; ein Fehler im Handler wird hier ausgelöst."""
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+def run_concurrently(*jobs: Callable[[], Any]) -> list:
+    """Führt die Jobs parallel in Threads aus und liefert ihre Ergebnisse in gleicher Reihenfolge."""
+    with ThreadPoolExecutor(max_workers=max(1, len(jobs)), thread_name_prefix="sync") as pool:
+        futures = [pool.submit(job) for job in jobs]
+        return [f.result() for f in futures]
@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+from logger import logger
+from src.fs_writer import FsWriter
+
+"""
+Änderungsplan für den Sync einer Bibliothek (Plan → Anwenden).
+
+Die Sync-Funktionen entscheiden nur noch, WAS zu tun ist, und tragen jede
+Änderung als ``Change`` in einen ``SyncPlan`` ein:
+- ``create``/``update``: .strm mit URL schreiben,
+- ``delete``: einzelne .strm löschen,
+- ``rmtree``: kompletten Ordner löschen (Film, Staffel, Serie),
+jeweils mit Grund. Der Plan ist kompakt als JSON speicherbar (``--plan-only``
+schreibt ihn nach tmp/, ohne die Bibliothek anzufassen).
+
+``PlanApplier`` führt die Änderungen aus: gesammelt in Batches, innerhalb eines
+Batches nach Ordner sortiert (Lokalität auf NAS/SMB), parallel über ``FsWriter``.
+Erfolgreiche Operationen werden ins Manifest eingetragen.
+"""
+
+# Reihenfolge innerhalb eines Ordners: erst schreiben, dann löschen
+_OP_ORDER = {"create": 0, "update": 1, "delete": 2, "rmtree": 3}
+
+_LABELS = {
+    "create": "Erstellt",
+    "update": "Aktualisiert",
+    "delete": "Gelöscht",
+    "rmtree": "Ordner gelöscht",
+}
+
+
+class Change:
+    __slots__ = ("op", "path", "url", "reason", "title")
+
+    def __init__(self, op: str, path: Path, url: str = "", reason: str = "", title: str = ""):
+        """
+        :param op: "create", "update", "delete" oder "rmtree"
+        :param path: Ziel (.strm-Datei bzw. Ordner bei rmtree)
+        :param url: Inhalt der .strm (nur create/update)
+        :param reason: Warum die Änderung nötig ist (fürs Log und die Analyse)
+        :param title: Anzeigename (Zusammenfassung am Ende)
+        """
+        self.op = op
+        self.path = path
+        self.url = url
+        self.reason = reason
+        self.title = title
+
+
+class SyncPlan:
+    def __init__(self, library: str, base_path: Union[Path, str]):
+        """
+        :param library: "movies" oder "series"
+        :param base_path: Bibliotheksordner; Pfade werden relativ dazu gespeichert
+        """
+        self.library = library
+        self.base = Path(base_path)
+        self.changes: list[Change] = []
+        self._lock = threading.Lock()
+
+    def add(self, change: Change) -> None:
+        with self._lock:
+            self.changes.append(change)
+
+    def counts(self) -> dict[str, int]:
+        counts = {op: 0 for op in _OP_ORDER}
+        for change in self.changes:
+            counts[change.op] += 1
+        return counts
+
+    def titles(self, *ops: str) -> list[str]:
+        return [c.title for c in self.changes if c.op in ops]
+
+    def log_summary(self, label: str) -> None:
+        c = self.counts()
+        logger.info(
+            f"Plan {label}: {c['create']} neu, {c['update']} aktualisieren, "
+            f"{c['delete']} Dateien löschen, {c['rmtree']} Ordner löschen"
+        )
+
+    # --- Serialisierung -----------------------------------------------------
+
+    def to_dict(self) -> dict:
+        """Kompakt: pro Änderung [op, relativer Pfad, url, grund, titel]."""
+        return {
+            "library": self.library,
+            "base": str(self.base),
+            "created_at": int(time.time()),
+            "counts": self.counts(),
+            "changes": [
+                [c.op, c.path.relative_to(self.base).as_posix(), c.url, c.reason, c.title]
+                for c in self.changes
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SyncPlan":
+        plan = cls(data["library"], data["base"])
+        for op, rel, url, reason, title in data.get("changes", []):
+            plan.changes.append(Change(op, plan.base / rel, url, reason, title))
+        return plan
+
+    def save(self, path: Union[Path, str]) -> None:
+        """Atomar als JSON speichern (erst .tmp, dann umbenennen)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Union[Path, str]) -> "SyncPlan":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+class PlanApplier:
+    def __init__(self, manifest, workers: int = 8, batch_size: int = 500, known_dirs=(),
+                 suffix: str = "", name: str = "Dateisystem"):
+        """
+        :param manifest: ``StrmManifest`` der Bibliothek (wird nach Erfolg aktualisiert)
+        :param workers: Gleichzeitige Dateisystem-Operationen
+        :param batch_size: Änderungen pro Batch (werden vor dem Ausführen nach Ordner sortiert)
+        :param known_dirs: Bereits vorhandene Ordner (kein mkdir nötig)
+        :param suffix: Wird an die URL angehängt (z. B. Zeilenumbruch bei Serien)
+        :param name: Bezeichnung für das Log
+        """
+        self.manifest = manifest
+        self.batch_size = max(1, batch_size)
+        self.suffix = suffix
+        self.created: list[str] = []
+        self._pending: list[Change] = []
+        self._fs = FsWriter(workers=workers, known_dirs=known_dirs, name=name)
+
+    def submit(self, change: Change) -> None:
+        """Änderung vormerken; ein voller Batch wird sofort ausgeführt."""
+        self._pending.append(change)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def apply(self, plan: SyncPlan) -> None:
+        for change in plan.changes:
+            self.submit(change)
+
+    def flush(self) -> None:
+        batch, self._pending = self._pending, []
+        batch.sort(key=_locality_key)
+        for change in batch:
+            self._dispatch(change)
+
+    def close(self) -> int:
+        """Rest ausführen, auf alle Operationen warten; liefert die Anzahl Fehler."""
+        self.flush()
+        return self._fs.close()
+
+    def _dispatch(self, change: Change) -> None:
+        manifest = self.manifest
+        label = f"{_LABELS[change.op]}: {change.path}"
+        if change.reason:
+            label += f" ({change.reason})"
+
+        if change.op in ("create", "update"):
+            def written(st):
+                manifest.record(change.path, change.url, st.st_size, st.st_mtime)
+                if change.op == "create":
+                    self.created.append(change.title)
+                logger.info(label)
+            self._fs.write(change.path, change.url + self.suffix, on_done=written)
+        elif change.op == "delete":
+            def unlinked(_):
+                manifest.forget(change.path)
+                logger.info(label)
+            self._fs.unlink(change.path, on_done=unlinked)
+        else:
+            def removed(_):
+                manifest.forget_tree(change.path)
+                logger.info(label)
+            self._fs.rmtree(change.path, on_done=removed)
+
+
+def _locality_key(change: Change):
+    directory = change.path if change.op == "rmtree" else change.path.parent
+    return directory.as_posix(), _OP_ORDER[change.op], change.path.name
+
+
+def plan_path(library: str) -> Path:
+    """Ablageort eines gespeicherten Plans (tmp/plan_<library>.json)."""
+    return Path.cwd() / "tmp" / f"plan_{library}.json"
+
+
+def emit(plan: SyncPlan, applier: Optional[PlanApplier], change: Change) -> None:
+    """Änderung in den Plan eintragen und – falls angewendet wird – an den Applier geben."""
+    plan.add(change)
+    if applier is not None:
+        applier.submit(change)
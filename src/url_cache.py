@@ -0,0 +1,158 @@
+import atexit
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional, Union
+from logger import logger
+from functions import load_option
+from src.run_state import ensure_state_dir
+
+"""
+Persistenter URL-Check-Cache über Läufe hinweg (SQLite in state/url_cache.sqlite).
+
+- Positive Ergebnisse gelten ``ttl_ok_hours`` lang.
+- Negative Ergebnisse werden mit wachsendem Intervall erneut geprüft
+  (``negative_recheck_minutes`` · 2^(Fehlversuche-1), max. ``negative_recheck_max_hours``).
+- Schreibzugriffe werden gepuffert und gebündelt committet.
+"""
+
+_PRUNE_AFTER_DAYS = 30
+_FLUSH_EVERY = 500
+# SQLite erlaubt nur begrenzt viele Parameter pro Abfrage
+_LOOKUP_CHUNK = 500
+
+
+class UrlCheckCache:
+    def __init__(self, path: Union[Path, str], ttl_ok_hours: float = 24.0,
+                 negative_recheck_minutes: float = 60.0, negative_recheck_max_hours: float = 48.0):
+        self.ttl_ok = ttl_ok_hours * 3600
+        self.neg_base = negative_recheck_minutes * 60
+        self.neg_max = negative_recheck_max_hours * 3600
+        self._lock = threading.Lock()
+        self._pending: dict[str, tuple] = {}
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS url_checks ("
+            " url TEXT PRIMARY KEY,"
+            " ok INTEGER NOT NULL,"
+            " reason TEXT NOT NULL,"
+            " checked_at REAL NOT NULL,"
+            " fail_count INTEGER NOT NULL DEFAULT 0,"
+            " next_check REAL NOT NULL)"
+        )
+        # Alte Einträge (URL seit Wochen nicht mehr gesehen) aufräumen
+        self._conn.execute(
+            "DELETE FROM url_checks WHERE checked_at < ?",
+            (time.time() - _PRUNE_AFTER_DAYS * 86400,),
+        )
+        self._conn.commit()
+
+    def _row(self, url: str) -> Optional[tuple]:
+        """(ok, reason, checked_at, fail_count, next_check) oder None. Erwartet gehaltenen Lock."""
+        row = self._pending.get(url)
+        if row is not None:
+            return row
+        cur = self._conn.execute(
+            "SELECT ok, reason, checked_at, fail_count, next_check FROM url_checks WHERE url = ?",
+            (url,),
+        )
+        return cur.fetchone()
+
+    def get(self, url: str) -> Optional[tuple[bool, str]]:
+        """Liefert (ok, reason), solange das Ergebnis noch gültig ist, sonst None."""
+        with self._lock:
+            row = self._row(url)
+        if row is None or row[4] <= time.time():
+            return None
+        return bool(row[0]), row[1]
+
+    def records(self, urls: Iterable[str]) -> dict[str, tuple[bool, str, float]]:
+        """Letzter bekannter Stand {url: (ok, reason, checked_at)} – unabhängig von TTL/Backoff."""
+        found: dict[str, tuple[bool, str, float]] = {}
+        urls = list(urls)
+        with self._lock:
+            for i in range(0, len(urls), _LOOKUP_CHUNK):
+                chunk = urls[i:i + _LOOKUP_CHUNK]
+                cur = self._conn.execute(
+                    "SELECT url, ok, reason, checked_at FROM url_checks"
+                    f" WHERE url IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for url, ok, reason, checked_at in cur:
+                    found[url] = (bool(ok), reason, checked_at)
+            for url in urls:
+                row = self._pending.get(url)
+                if row is not None:
+                    found[url] = (bool(row[0]), row[1], row[2])
+        return found
+
+    def put(self, url: str, ok: bool, reason: str) -> None:
+        now = time.time()
+        with self._lock:
+            row = self._row(url)
+            if ok:
+                fail_count = 0
+                next_check = now + self.ttl_ok
+            else:
+                fail_count = (row[3] if row is not None and not row[0] else 0) + 1
+                next_check = now + min(self.neg_base * (2 ** (fail_count - 1)), self.neg_max)
+            self._pending[url] = (int(ok), reason, now, fail_count, next_check)
+            if len(self._pending) >= _FLUSH_EVERY:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO url_checks (url, ok, reason, checked_at, fail_count, next_check)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [(url, *row) for url, row in self._pending.items()],
+        )
+        self._conn.commit()
+        self._pending.clear()
+
+    def flush(self) -> None:
+        with self._lock:
+            try:
+                self._flush_locked()
+            except sqlite3.Error as e:
+                logger.info(f"URL-Cache konnte nicht gespeichert werden: {e}")
+
+
+_cache: Optional[UrlCheckCache] = None
+_cache_init_lock = threading.Lock()
+_cache_disabled = False
+
+
+def get_url_cache() -> Optional[UrlCheckCache]:
+    """Gemeinsame Cache-Instanz (lazy, konfiguriert über [URL_CHECK]); None wenn deaktiviert."""
+    global _cache, _cache_disabled
+    if _cache is not None or _cache_disabled:
+        return _cache
+    with _cache_init_lock:
+        if _cache is not None or _cache_disabled:
+            return _cache
+        if not load_option('URL_CHECK', 'cache_enabled', True, bool):
+            _cache_disabled = True
+            return None
+        try:
+            _cache = UrlCheckCache(
+                ensure_state_dir() / "url_cache.sqlite",
+                ttl_ok_hours=load_option('URL_CHECK', 'cache_ttl_hours', 24.0, float),
+                negative_recheck_minutes=load_option('URL_CHECK', 'negative_recheck_minutes', 60.0, float),
+                negative_recheck_max_hours=load_option('URL_CHECK', 'negative_recheck_max_hours', 48.0, float),
+            )
+            atexit.register(_cache.flush)
+        except sqlite3.Error as e:
+            logger.info(f"URL-Cache nicht verfügbar, prüfe ohne Cache: {e}")
+            _cache_disabled = True
+        return _cache
+
+
+def flush_url_cache() -> None:
+    """Gepufferte Ergebnisse sofort in die SQLite-Datei schreiben."""
+    if _cache is not None:
+        _cache.flush()
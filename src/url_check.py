@@ -1,8 +1,15 @@
 import re
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Collection, Iterable, Optional
 import requests
 from requests.adapters import HTTPAdapter, Retry
 from logger import logger
+from functions import load_option
+from src.url_cache import get_url_cache
+from src.host_limiter import get_controller, ThreadHostGate, THROTTLE_STATUS, throttle_delay
+from src.host_health import get_host_health
 
 
 """
@@ -13,6 +20,12 @@ Optimierungen:
 - Globaler Requests-Session-Pool (Connection-Reuse, höherer pool_maxsize)
 - Leicht reduzierte Timeouts für flottere Fehlpfade
 - Thread-sicheres In-Memory-Caching über Aufrufe hinweg
+- Persistenter Cache über Läufe hinweg (src/url_cache.py, TTL + Backoff für Fehler)
+- Massenprüfung über check_urls(): asyncio/aiohttp-Engine (src/url_check_async.py)
+  mit begrenztem Sendefenster, Fallback auf Threads
+- Adaptive Parallelität pro Host (AIMD) und Obergrenze pro Provider-Account
+  (src/host_limiter.py)
+- Circuit Breaker pro Host und Timeouts aus der gemessenen Latenz (src/host_health.py)
 Wichtig: Keine vorschnellen True-Ergebnisse nur anhand von Dateiendungen; es wird
 mindestens ein minimaler Netzwerkabruf validiert, um inaktive Links zu erkennen.
 """
@@ -26,10 +39,15 @@ _download_check_cache: dict[str, bool] = {}
 _download_check_cache_reason: dict[str, tuple[bool, str]] = {}
 
 # Geteilte Session mit größerem Connection-Pool
+# 429/503 nicht hier wiederholen: sie gehen zuerst an den AIMD-Controller (siehe _request)
+_THROTTLE_RETRIES = 2
+_THROTTLE_BACKOFF = 0.3
 _retries = Retry(
     total=2,
     backoff_factor=0.3,
-    status_forcelist=[429, 500, 502, 503, 504],
+    status_forcelist=[500, 502, 504],
+    # Sonst wiederholt urllib3 429/503 mit Retry-After trotzdem selbst
+    respect_retry_after_header=False,
     allowed_methods=["HEAD", "GET", "OPTIONS"],
     raise_on_status=False,
 )
@@ -39,6 +57,82 @@ _sess.mount("http://", _http_adapter)
 _sess.mount("https://", _http_adapter)
 
 
+def _observe_latency(r, *args, **kwargs):
+    # Zeit bis zu den Antwort-Headern; Grundlage für die adaptiven Timeouts
+    get_host_health().observe(r.url, r.elapsed.total_seconds())
+
+
+_sess.hooks["response"].append(_observe_latency)
+
+
+def _request(method: str, url: str, timeout: float, headers=None, stream: bool = False) -> requests.Response:
+    """Request über die geteilte Session; bei 429/503 erst Host-Limit senken, dann nach Retry-After wiederholen."""
+    for attempt in range(_THROTTLE_RETRIES + 1):
+        r = _sess.request(method, url, headers=headers or _BASE_HEADERS, allow_redirects=True,
+                          timeout=timeout, stream=stream)
+        if r.status_code not in THROTTLE_STATUS:
+            return r
+        # Jede Drosselung melden, auch die letzte
+        delay = throttle_delay(url, r.headers, attempt, _THROTTLE_BACKOFF)
+        if delay is None or attempt == _THROTTLE_RETRIES:
+            return r
+        r.close()
+        time.sleep(delay)
+    return r
+
+
+_BASE_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/124.0 Safari/537.36"
+    ),
+    "Accept": "*/*",
+    "Accept-Encoding": "identity",
+}
+
+
+def _remember(url: str, ok: bool, reason: str, persist: bool = True) -> tuple[bool, str]:
+    """Ergebnis im Prozess-Cache und (optional) im persistenten Cache ablegen."""
+    with _cache_lock:
+        _download_check_cache[url] = ok
+        _download_check_cache_reason[url] = (ok, reason)
+    if persist:
+        cache = get_url_cache()
+        if cache is not None:
+            cache.put(url, ok, reason)
+    return ok, reason
+
+
+def _lookup_cached(url: str, persistent: bool = True) -> Optional[tuple[bool, str]]:
+    """
+    Ergebnis ohne Netzwerk: Prozess-Cache, persistenter Cache, Streaming-Heuristik.
+
+    :param persistent: False → persistenten Cache überspringen (erzwungene Nachprüfung)
+    """
+    # 0) Cache-Hit?
+    with _cache_lock:
+        cached_r = _download_check_cache_reason.get(url)
+    if cached_r is not None:
+        return cached_r
+
+    # 0.1) Persistenter Cache vom letzten Lauf (noch gültig?)
+    cache = get_url_cache() if persistent else None
+    if cache is not None:
+        cached_r = cache.get(url)
+        if cached_r is not None:
+            with _cache_lock:
+                _download_check_cache[url] = cached_r[0]
+                _download_check_cache_reason[url] = cached_r
+            return cached_r
+
+    # 0.5) Sofortige Heuristiken ohne Netzwerk
+    #    a) Offensichtliche Streaming-Links schnell ausschließen
+    if _STREAMING_HINT.search(url):
+        return _remember(url, False, "streaming-manifest", persist=False)
+    return None
+
+
 def _chunk_seems_html(first_bytes: bytes) -> bool:
     if not first_bytes:
         return False
@@ -46,7 +140,25 @@ def _chunk_seems_html(first_bytes: bytes) -> bool:
     return b"<html" in sample or sample.strip().startswith(b"<!doctype")
 
 
-def is_url_downloadable_with_reason(url: str, timeout_head: float = 3.0, timeout_get: float = 5.0) -> tuple[bool, str]:
+def looks_like_file(headers) -> bool:
+    """
+    Header-Heuristik (requests- und aiohttp-Header, beide case-insensitiv).
+    """
+    ct = (headers.get("Content-Type") or "").lower()
+    cd = (headers.get("Content-Disposition") or "").lower()
+    cl = headers.get("Content-Length")
+
+    if "attachment" in cd:
+        return True
+    if ct.startswith("video/") or "application" in ct or "octet-stream" in ct:
+        return True
+    if cl and cl.isdigit() and int(cl) > 0:
+        return True
+    return False
+
+
+def is_url_downloadable_with_reason(url: str, timeout_head: Optional[float] = None,
+                                    timeout_get: Optional[float] = None) -> tuple[bool, str]:
     """
     Prüft, ob hinter der URL ein "downloadbarer" Inhalt steckt.
 
@@ -60,64 +172,53 @@ def is_url_downloadable_with_reason(url: str, timeout_head: float = 3.0, timeout
     2) Fallback GET mit Range 0-0; 200/206 + Heuristik => True
     3) Minimal-GET; ok + Heuristik => True
 
+    Ist der Circuit des Hosts offen, schlägt die Prüfung sofort mit
+    ``circuit-open: <host>`` fehl.
+
     :param url: Zu prüfende URL
-    :param timeout_head: Timeout für HEAD
-    :param timeout_get: Timeout für GET
+    :param timeout_head: Timeout für HEAD (None = aus der Host-Latenz abgeleitet)
+    :param timeout_get: Timeout für GET (None = aus der Host-Latenz abgeleitet)
     :return: True, wenn es nach herunterladbarer Datei aussieht, sonst False
     """
-    # 0) Cache-Hit?
-    with _cache_lock:
-        cached_r = _download_check_cache_reason.get(url)
+    # 0) Cache / Heuristik ohne Netzwerk
+    cached_r = _lookup_cached(url)
     if cached_r is not None:
         return cached_r
+    return _probe_guarded(url, timeout_head, timeout_get)
 
-    # 0.5) Sofortige Heuristiken ohne Netzwerk
-    #    a) Offensichtliche Streaming-Links schnell ausschließen
-    if _STREAMING_HINT.search(url):
-        with _cache_lock:
-            _download_check_cache[url] = False
-            _download_check_cache_reason[url] = (False, "streaming-manifest")
-        return False, "streaming-manifest"
-
-    base_headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/124.0 Safari/537.36"
-        ),
-        "Accept": "*/*",
-        "Accept-Encoding": "identity",
-    }
-
-    def looks_like_file(resp: requests.Response) -> bool:
-        ct = (resp.headers.get("Content-Type") or "").lower()
-        cd = (resp.headers.get("Content-Disposition") or "").lower()
-        cl = resp.headers.get("Content-Length")
-
-        if "attachment" in cd:
-            return True
-        if ct.startswith("video/") or "application" in ct or "octet-stream" in ct:
-            return True
-        if cl and cl.isdigit() and int(cl) > 0:
-            return True
-        return False
+
+def _probe_guarded(url: str, timeout_head: Optional[float] = None,
+                   timeout_get: Optional[float] = None) -> tuple[bool, str]:
+    """Netzwerkprüfung hinter dem Circuit Breaker des Hosts."""
+    health = get_host_health()
+    denied = health.deny(url)
+    if denied is not None:
+        # Nicht persistieren: beim nächsten Lauf wird die URL normal geprüft
+        return _remember(url, False, denied, persist=False)
+    adaptive_head, adaptive_get = health.timeouts(url)
+    ok, reason = _probe_url(url, timeout_head or adaptive_head, timeout_get or adaptive_get)
+    health.record(url, reason)
+    return ok, reason
+
+
+def _probe_url(url: str, timeout_head: float, timeout_get: float) -> tuple[bool, str]:
+    """Netzwerkprüfung ohne Cache-Lookup (Ergebnis wird trotzdem gemerkt)."""
+    base_headers = _BASE_HEADERS
 
     # 1) Versuch: HEAD
     try:
-        r = _sess.head(url, headers=base_headers, allow_redirects=True, timeout=timeout_head)
-        if r.ok and looks_like_file(r):
+        r = _request("HEAD", url, timeout_head, headers=base_headers)
+        if r.ok and looks_like_file(r.headers):
             # Bestätige noch mit minimalem GET, um inaktive Ziele auszuschließen
             try:
-                g = _sess.get(url, headers=base_headers, allow_redirects=True, timeout=timeout_get, stream=True)
+                g = _request("GET", url, timeout_get, headers=base_headers, stream=True)
                 if g.status_code in (200, 206):
                     try:
                         chunk = next(g.iter_content(chunk_size=2048))
                     except StopIteration:
                         chunk = b""
                     if chunk and not _chunk_seems_html(chunk):
-                        with _cache_lock:
-                            _download_check_cache[url] = True
-                            _download_check_cache_reason[url] = (True, "HEAD+GET bytes")
+                        _remember(url, True, "HEAD+GET bytes")
                         return True, "HEAD+GET bytes"
             except requests.RequestException:
                 pass
@@ -128,61 +229,139 @@ def is_url_downloadable_with_reason(url: str, timeout_head: float = 3.0, timeout
     try:
         headers = dict(base_headers)
         headers["Range"] = "bytes=0-0"
-        r = _sess.get(url, headers=headers, allow_redirects=True, timeout=timeout_get, stream=True)
-        if r.status_code in (200, 206) and looks_like_file(r):
+        r = _request("GET", url, timeout_get, headers=headers, stream=True)
+        if r.status_code in (200, 206) and looks_like_file(r.headers):
             # minimal konsumieren, dann abbrechen
             try:
                 chunk = next(r.iter_content(chunk_size=2048))
             except Exception:
                 chunk = b""
             if chunk and not _chunk_seems_html(chunk):
-                with _cache_lock:
-                    _download_check_cache[url] = True
-                    _download_check_cache_reason[url] = (True, "RANGE bytes")
+                _remember(url, True, "RANGE bytes")
                 return True, "RANGE bytes"
     except requests.RequestException:
         pass
 
     # 3) Minimal-GET
     try:
-        r = _sess.get(url, headers=base_headers, allow_redirects=True, timeout=timeout_get, stream=True)
+        r = _request("GET", url, timeout_get, headers=base_headers, stream=True)
         if r.ok:
             try:
                 chunk = next(r.iter_content(chunk_size=4096))
             except Exception:
                 chunk = b""
             if chunk and not _chunk_seems_html(chunk):
-                with _cache_lock:
-                    _download_check_cache[url] = True
-                    _download_check_cache_reason[url] = (True, "GET bytes")
+                _remember(url, True, "GET bytes")
                 return True, "GET bytes"
             else:
-                with _cache_lock:
-                    _download_check_cache[url] = False
-                    _download_check_cache_reason[url] = (False, "GET html-or-empty")
+                _remember(url, False, "GET html-or-empty")
                 logger.info(f"Download-Check FAIL (GET html/empty): {url}")
                 return False, "GET html-or-empty"
         else:
-            with _cache_lock:
-                _download_check_cache[url] = False
-                _download_check_cache_reason[url] = (False, f"GET status {r.status_code}")
+            _remember(url, False, f"GET status {r.status_code}")
             logger.info(f"Download-Check FAIL (status {r.status_code}): {url}")
             return False, f"GET status {r.status_code}"
     except requests.RequestException as e:
-        with _cache_lock:
-            _download_check_cache[url] = False
-            _download_check_cache_reason[url] = (False, f"exception: {type(e).__name__}")
+        _remember(url, False, f"exception: {type(e).__name__}")
         logger.info(f"Download-Check FAIL (exception {type(e).__name__}): {url}")
         return False, f"exception: {type(e).__name__}"
 
-    with _cache_lock:
-        _download_check_cache[url] = False
-        _download_check_cache_reason[url] = (False, "no-indicator")
+    _remember(url, False, "no-indicator")
     # Kurzer Hinweis im Log, um inaktive Links besser nachzuvollziehen
     logger.info(f"Download-Check FAIL: {url}")
     return False, "no-indicator"
 
 
-def is_url_downloadable(url: str, timeout_head: float = 3.0, timeout_get: float = 5.0) -> bool:
+def is_url_downloadable(url: str, timeout_head: Optional[float] = None, timeout_get: Optional[float] = None) -> bool:
     ok, _ = is_url_downloadable_with_reason(url, timeout_head=timeout_head, timeout_get=timeout_get)
     return ok
+
+
+def check_urls(urls: Iterable[str], on_result: Optional[Callable[[str, bool, str], None]] = None,
+               engine: Optional[str] = None, max_in_flight: Optional[int] = None,
+               refresh: Collection[str] = ()) -> dict[str, tuple[bool, str]]:
+    """
+    Prüft viele URLs und liefert {url: (ok, reason)}.
+
+    ``on_result(url, ok, reason)`` wird pro URL aufgerufen, sobald das Ergebnis
+    vorliegt (immer im aufrufenden Thread). Standard-Engine ist asyncio/aiohttp
+    mit ``max_in_flight`` gleichzeitigen Prüfungen; ohne aiohttp oder mit
+    ``engine = threads`` wird ein Thread-Pool mit begrenztem Fenster genutzt.
+    Innerhalb dieses Fensters begrenzt ein AIMD-Limit pro Host die Netzwerkprüfungen.
+    URLs in ``refresh`` werden ohne Rücksicht auf den persistenten Cache neu geprüft.
+    """
+    if engine is None:
+        engine = load_option('URL_CHECK', 'engine', 'async')
+    if max_in_flight is None:
+        max_in_flight = load_option('URL_CHECK', 'max_in_flight', 200, int)
+
+    results: dict[str, tuple[bool, str]] = {}
+
+    def deliver(url: str, ok: bool, reason: str) -> None:
+        results[url] = (ok, reason)
+        if on_result is not None:
+            on_result(url, ok, reason)
+
+    if engine == 'async':
+        try:
+            from src.url_check_async import run_checks
+        except ImportError:
+            logger.info("aiohttp nicht installiert – URL-Checks laufen über Threads.")
+        else:
+            run_checks(urls, deliver, max_in_flight=max_in_flight, refresh=refresh)
+            get_controller().log_limits()
+            get_host_health().log_hosts()
+            return results
+
+    workers = load_option('URL_CHECK', 'thread_workers', 30, int)
+    _check_urls_threaded(urls, deliver, workers, refresh)
+    get_controller().log_limits()
+    get_host_health().log_hosts()
+    return results
+
+
+_thread_gate: Optional[ThreadHostGate] = None
+
+
+def _get_thread_gate() -> ThreadHostGate:
+    """Ein Gate für alle Thread-Prüfungen im Prozess (parallele Aufrufer teilen sich die Host-Limits)."""
+    global _thread_gate
+    with _cache_lock:
+        if _thread_gate is None:
+            _thread_gate = ThreadHostGate(
+                get_controller(), load_option('URL_CHECK', 'max_connections_per_account', 0, int))
+        return _thread_gate
+
+
+def _check_urls_threaded(urls: Iterable[str], deliver: Callable[[str, bool, str], None], workers: int,
+                         refresh: Collection[str] = ()) -> None:
+    """Thread-Fallback: höchstens 2×workers Futures gleichzeitig statt aller auf einmal."""
+    controller = get_controller()
+    gate = _get_thread_gate()
+
+    def check(url: str) -> tuple[bool, str]:
+        cached_r = _lookup_cached(url, persistent=url not in refresh)
+        if cached_r is not None:
+            return cached_r
+        with gate.slot(url):
+            ok, reason = _probe_guarded(url)
+        if not reason.startswith("circuit-open"):
+            controller.report(url, reason)
+        return ok, reason
+
+    window = max(1, workers * 2)
+    pending = {}
+    url_iter = iter(urls)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        while True:
+            for url in url_iter:
+                pending[ex.submit(check, url)] = url
+                if len(pending) >= window:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                url = pending.pop(fut)
+                ok, reason = fut.result()
+                deliver(url, ok, reason)
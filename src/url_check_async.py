@@ -0,0 +1,270 @@
+import asyncio
+import atexit
+import queue
+import threading
+import time
+from typing import Callable, Collection, Iterable
+import aiohttp
+from logger import logger
+from functions import load_option
+from src.host_limiter import get_controller, AsyncHostGate, THROTTLE_STATUS, throttle_delay
+from src.host_health import get_host_health, DEFAULT_TIMEOUT_HEAD, DEFAULT_TIMEOUT_GET
+from src.url_check import (
+    _BASE_HEADERS,
+    _chunk_seems_html,
+    _lookup_cached,
+    _remember,
+    looks_like_file,
+)
+
+"""
+asyncio/aiohttp-Engine für die Massenprüfung von URLs.
+
+Gleiche Heuristiken und gleicher Ablauf wie is_url_downloadable_with_reason
+(HEAD+GET → Range-GET → Minimal-GET), aber mit mehreren hundert gleichzeitigen
+Prüfungen. URLs werden über ein begrenztes Fenster nachgeschoben, statt für
+jede URL vorab einen Task anzulegen. Alle Aufrufer im Prozess teilen sich einen
+Event-Loop (Hintergrund-Thread) und damit die Netzwerkkapazität.
+"""
+
+# Wie urllib3-Retry im Sync-Pfad: 5xx bis zu 2x mit kurzem Backoff wiederholen.
+# 429/503 (Drosselung) gehen zuerst an den AIMD-Controller und warten Retry-After ab.
+_RETRY_STATUS = (500, 502, 504)
+_RETRIES = 2
+_BACKOFF = 0.3
+
+
+async def _request(session: aiohttp.ClientSession, method: str, url: str, timeout: float, headers=None):
+    """Request mit Retries für 5xx und 429/503 (siehe ``throttle_delay``); liefert eine offene Response (Aufrufer schließt)."""
+    for attempt in range(_RETRIES + 1):
+        started = time.monotonic()
+        resp = await session.request(
+            method, url,
+            headers=headers or _BASE_HEADERS,
+            allow_redirects=True,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        )
+        get_host_health().observe(url, time.monotonic() - started)
+        if resp.status in THROTTLE_STATUS:
+            # Jede Drosselung melden, auch die letzte
+            delay = throttle_delay(url, resp.headers, attempt, _BACKOFF)
+            if delay is None or attempt == _RETRIES:
+                return resp
+        elif resp.status in _RETRY_STATUS and attempt < _RETRIES:
+            delay = _BACKOFF * (2 ** attempt)
+        else:
+            return resp
+        resp.release()
+        await asyncio.sleep(delay)
+    return resp
+
+
+async def _first_bytes(resp: aiohttp.ClientResponse, size: int) -> bytes:
+    try:
+        return await resp.content.read(size)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return b""
+
+
+async def check_url(session: aiohttp.ClientSession, url: str,
+                    timeout_head: float = DEFAULT_TIMEOUT_HEAD, timeout_get: float = DEFAULT_TIMEOUT_GET) -> tuple[bool, str]:
+    """Async-Gegenstück zu is_url_downloadable_with_reason (inkl. Caches)."""
+    cached_r = _lookup_cached(url)
+    if cached_r is not None:
+        return cached_r
+    return await _probe(session, url, timeout_head, timeout_get)
+
+
+async def _probe(session: aiohttp.ClientSession, url: str,
+                 timeout_head: float = DEFAULT_TIMEOUT_HEAD, timeout_get: float = DEFAULT_TIMEOUT_GET) -> tuple[bool, str]:
+    """Netzwerkprüfung ohne Cache-Lookup (Ergebnis wird trotzdem gemerkt)."""
+    # 1) Versuch: HEAD
+    try:
+        r = await _request(session, "HEAD", url, timeout_head)
+        r.release()
+        if r.ok and looks_like_file(r.headers):
+            # Bestätige noch mit minimalem GET, um inaktive Ziele auszuschließen
+            try:
+                g = await _request(session, "GET", url, timeout_get)
+                try:
+                    if g.status in (200, 206):
+                        chunk = await _first_bytes(g, 2048)
+                        if chunk and not _chunk_seems_html(chunk):
+                            return _remember(url, True, "HEAD+GET bytes")
+                finally:
+                    g.close()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        pass
+
+    # 2) Fallback: GET mit Range 0-0
+    try:
+        headers = dict(_BASE_HEADERS)
+        headers["Range"] = "bytes=0-0"
+        r = await _request(session, "GET", url, timeout_get, headers=headers)
+        try:
+            if r.status in (200, 206) and looks_like_file(r.headers):
+                # minimal konsumieren, dann abbrechen
+                chunk = await _first_bytes(r, 2048)
+                if chunk and not _chunk_seems_html(chunk):
+                    return _remember(url, True, "RANGE bytes")
+        finally:
+            r.close()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        pass
+
+    # 3) Minimal-GET
+    try:
+        r = await _request(session, "GET", url, timeout_get)
+        try:
+            if r.ok:
+                chunk = await _first_bytes(r, 4096)
+                if chunk and not _chunk_seems_html(chunk):
+                    return _remember(url, True, "GET bytes")
+                logger.info(f"Download-Check FAIL (GET html/empty): {url}")
+                return _remember(url, False, "GET html-or-empty")
+            logger.info(f"Download-Check FAIL (status {r.status}): {url}")
+            return _remember(url, False, f"GET status {r.status}")
+        finally:
+            r.close()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        name = "Timeout" if isinstance(e, asyncio.TimeoutError) else type(e).__name__
+        logger.info(f"Download-Check FAIL (exception {name}): {url}")
+        return _remember(url, False, f"exception: {name}")
+
+
+class _Job:
+    """Ein Aufruf von run_checks: Ergebnisse gehen über eine Queue an den aufrufenden Thread."""
+
+    def __init__(self, urls: Iterable[str], refresh: Collection[str], window: int):
+        self.urls = urls
+        self.refresh = refresh
+        self.window_size = window
+        self.window = None  # asyncio.Semaphore, wird im Event-Loop angelegt
+        self.results: queue.Queue = queue.Queue()
+
+
+class _SharedChecker:
+    """
+    Ein Event-Loop in einem Hintergrund-Thread für alle Prüfungen im Prozess.
+
+    Gleichzeitige Aufrufer (z. B. Filme und Serien parallel) teilen sich
+    Session, Host-Gate und das globale Limit ``max_in_flight``. Pro Aufrufer
+    sind höchstens 2×max_in_flight Ergebnisse unterwegs bzw. noch nicht
+    abgeholt – verarbeitet der Aufrufer langsamer, werden keine neuen URLs
+    mehr gestartet (Backpressure).
+    """
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="url-check-loop", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def _run(self, ready: threading.Event) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._setup())
+        ready.set()
+        self.loop.run_forever()
+
+    async def _setup(self) -> None:
+        self.controller = get_controller()
+        self.health = get_host_health()
+        self.gate = AsyncHostGate(self.controller, load_option('URL_CHECK', 'max_connections_per_account', 0, int))
+        self.slots = asyncio.Semaphore(self.max_in_flight)
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector, auto_decompress=False)
+
+    async def _one(self, u: str, refresh: Collection[str]) -> tuple[str, bool, str]:
+        cached_r = _lookup_cached(u, persistent=u not in refresh)
+        if cached_r is not None:
+            return u, cached_r[0], cached_r[1]
+        # Slot erst nach dem Cache-Lookup belegen: Cache-Treffer kosten kein Host-Limit
+        async with self.gate.slot(u):
+            # Breaker erst im Slot fragen: wartende URLs sehen einen inzwischen offenen Circuit
+            denied = self.health.deny(u)
+            if denied is not None:
+                ok, reason = _remember(u, False, denied, persist=False)
+                return u, ok, reason
+            try:
+                ok, reason = await _probe(self.session, u, *self.health.timeouts(u))
+            except Exception as e:  # Einzelne URL darf den Lauf nicht abbrechen
+                ok, reason = _remember(u, False, f"exception: {type(e).__name__}")
+        self.health.record(u, reason)
+        self.controller.report(u, reason)
+        return u, ok, reason
+
+    async def _run_job(self, job: _Job) -> None:
+        job.window = asyncio.Semaphore(job.window_size)
+        tasks = set()
+
+        def done(task: asyncio.Task) -> None:
+            self.slots.release()
+            tasks.discard(task)
+            if not task.cancelled():
+                job.results.put(task.result())
+
+        try:
+            for u in job.urls:
+                await job.window.acquire()
+                await self.slots.acquire()
+                task = asyncio.create_task(self._one(u, job.refresh))
+                tasks.add(task)
+                task.add_done_callback(done)
+            if tasks:
+                await asyncio.wait(set(tasks))
+        finally:
+            for task in tasks:
+                task.cancel()
+            job.results.put(_DONE)
+
+    def run(self, urls: Iterable[str], deliver: Callable[[str, bool, str], None], refresh: Collection[str]) -> None:
+        job = _Job(urls, refresh, self.max_in_flight * 2)
+        future = asyncio.run_coroutine_threadsafe(self._run_job(job), self.loop)
+        try:
+            while True:
+                item = job.results.get()
+                if item is _DONE:
+                    break
+                try:
+                    deliver(*item)
+                finally:
+                    self.loop.call_soon_threadsafe(job.window.release)
+        except BaseException:
+            future.cancel()
+            raise
+        future.result()
+
+    def close(self) -> None:
+        try:
+            asyncio.run_coroutine_threadsafe(self.session.close(), self.loop).result(timeout=5)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_DONE = object()
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def _get_shared(max_in_flight: int) -> _SharedChecker:
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = _SharedChecker(max(1, max_in_flight))
+            atexit.register(_shared.close)
+        return _shared
+
+
+def run_checks(urls: Iterable[str], deliver: Callable[[str, bool, str], None], max_in_flight: int = 200,
+               refresh: Collection[str] = ()) -> None:
+    """
+    Synchroner Einstieg: prüft alle URLs und ruft ``deliver(url, ok, reason)`` je Ergebnis
+    (im aufrufenden Thread, sobald es vorliegt). Darf aus mehreren Threads gleichzeitig
+    aufgerufen werden; ``max_in_flight`` gilt dann gemeinsam (Wert des ersten Aufrufs).
+    """
+    _get_shared(max_in_flight).run(urls, deliver, refresh)
@@ -0,0 +1,152 @@
+import math
+import time
+from typing import Callable, Collection, Iterable, Optional
+from logger import logger
+from functions import load_option
+from src.url_cache import get_url_cache, UrlCheckCache
+from src.url_check import check_urls
+
+"""
+Rotierendes Prüfbudget vor den URL-Checks.
+
+Nicht jeder Lauf muss alle VOD-Links erneut verifizieren:
+- Neue URLs (kein Eintrag im URL-Cache) und zuletzt fehlgeschlagene werden
+  immer geprüft (für Fehlschläge gilt weiter das Backoff des Caches).
+- Bekannt gute URLs werden höchstens alle ``interval_days`` Tage neu geprüft.
+  Von den fälligen wird pro Lauf nur ein Ausschnitt (Budget) geprüft – die am
+  längsten nicht verifizierten zuerst.
+- Alle übrigen übernehmen ihr letztes gutes Ergebnis ohne Netzwerk.
+
+So verteilt sich die Prüflast gleichmäßig über die Läufe, und jeder Cronlauf
+hat eine planbare Dauer. Die Rotation läuft auch bei unveränderter Playlist
+(``main.py`` lädt die Einträge dann aus dem Parse-Cache), sonst blieben tote
+Links bei einer stabilen Playlist für immer in der Bibliothek.
+"""
+
+Sampler = Callable[[list, Callable[[list], dict]], dict]
+
+
+class VerifyPlan:
+    def __init__(self, probe: list, refresh: list, carry: dict, due: int, budget: int):
+        """
+        :param probe: Neue bzw. zuletzt fehlgeschlagene URLs (normale Prüfung)
+        :param refresh: Fällige, bekannt gute URLs aus der Rotation (Prüfung am Cache vorbei)
+        :param carry: {url: (True, reason)} – letztes gutes Ergebnis wird übernommen
+        :param due: Anzahl fälliger URLs insgesamt (inkl. der nicht ins Budget passenden)
+        :param budget: Verwendetes Budget für die Rotation
+        """
+        self.probe = probe
+        self.refresh = refresh
+        self.carry = carry
+        self.due = due
+        self.budget = budget
+
+
+def plan_verification(urls: Iterable[str], cache: UrlCheckCache, interval_days: float, budget: int,
+                      known_good: Collection[str] = (), runs_per_day: float = 12.0) -> VerifyPlan:
+    """
+    Teilt URLs in "prüfen", "Rotation" und "übernehmen" auf.
+
+    :param interval_days: Bekannt gute URLs frühestens nach so vielen Tagen erneut prüfen
+    :param budget: Max. Anzahl fälliger, bekannt guter URLs, die in diesem Lauf geprüft werden
+        (0 = automatisch, siehe ``auto_budget``)
+    :param known_good: URLs, die laut Index im letzten Lauf OK waren; fehlt für sie ein
+        Cache-Eintrag, gelten sie als "nie verifiziert" und kommen zuerst in die Rotation
+    :param runs_per_day: Erwartete Läufe pro Tag (nur für das automatische Budget)
+    """
+    urls = list(urls)
+    records = cache.records(urls)
+    interval = interval_days * 86400
+    now = time.time()
+
+    probe, carry = [], {}
+    due = []  # (checked_at, url)
+    for url in urls:
+        rec = records.get(url)
+        if rec is None:
+            if url in known_good:
+                due.append((0.0, url))
+                carry[url] = (True, "index (ungeprüft)")
+            else:
+                probe.append(url)
+        elif not rec[0]:
+            probe.append(url)
+        else:
+            carry[url] = (True, rec[1])
+            if now - rec[2] >= interval:
+                due.append((rec[2], url))
+
+    if budget <= 0:
+        budget = auto_budget(len(carry), interval_days, runs_per_day)
+    due.sort()
+    refresh = [url for _, url in due[:budget]]
+    for url in refresh:
+        del carry[url]
+    return VerifyPlan(probe, refresh, carry, len(due), budget)
+
+
+def auto_budget(known_count: int, interval_days: float, runs_per_day: float) -> int:
+    """Budget, mit dem alle bekannten URLs einmal pro Intervall an die Reihe kommen."""
+    runs = max(1.0, interval_days * runs_per_day)
+    return math.ceil(known_count / runs)
+
+
+def verify_urls(urls: Iterable[str], on_result: Optional[Callable[[str, bool, str], None]] = None,
+                known_good: Collection[str] = (), sampler: Optional[Sampler] = None) -> dict[str, tuple[bool, str]]:
+    """
+    Wie ``check_urls``, aber mit rotierendem Prüfbudget (Konfiguration in [URL_CHECK]).
+
+    ``on_result`` wird nur für tatsächlich geprüfte URLs aufgerufen. Ohne URL-Cache
+    oder mit ``verify_interval_days = 0`` werden URLs aus ``known_good`` ungeprüft
+    übernommen und alle übrigen normal geprüft.
+
+    :param sampler: Optional ``sampler(urls, check) -> results`` für neue/offene URLs,
+        z. B. ``SeasonSampler`` (prüft nur Stichproben und leitet den Rest ab).
+        Rotations-URLs werden immer direkt geprüft.
+    """
+    urls = list(dict.fromkeys(urls))
+    known_good = set(known_good)
+    interval_days = load_option('URL_CHECK', 'verify_interval_days', 7.0, float)
+    cache = get_url_cache()
+
+    if cache is None or interval_days <= 0:
+        results = {url: (True, "index") for url in urls if url in known_good}
+        to_check = [url for url in urls if url not in known_good]
+        if to_check:
+            results.update(_run_checks(to_check, [], on_result, sampler))
+        return results
+
+    plan = plan_verification(
+        urls, cache, interval_days,
+        budget=load_option('URL_CHECK', 'verify_budget', 0, int),
+        known_good=known_good,
+        runs_per_day=load_option('URL_CHECK', 'verify_runs_per_day', 12.0, float),
+    )
+    logger.info(
+        f"Prüfplan: {len(plan.probe)} neu/zuletzt offline, Rotation {len(plan.refresh)} "
+        f"von {plan.due} fälligen (Budget {plan.budget}), {len(plan.carry)} übernommen"
+    )
+
+    results = dict(plan.carry)
+    if plan.probe or plan.refresh:
+        results.update(_run_checks(plan.probe, plan.refresh, on_result, sampler))
+    return results
+
+
+def _run_checks(probe: list, refresh: list, on_result, sampler: Optional[Sampler]) -> dict[str, tuple[bool, str]]:
+    refresh_set = set(refresh)
+    if sampler is None or not probe:
+        return check_urls(probe + refresh, on_result=on_result, refresh=refresh_set)
+
+    pending_refresh = list(refresh)
+
+    def check(batch: list) -> dict[str, tuple[bool, str]]:
+        # Rotations-URLs laufen im ersten Block mit, damit sie die Netzwerkkapazität teilen
+        nonlocal pending_refresh
+        batch, pending_refresh = batch + pending_refresh, []
+        return check_urls(batch, on_result=on_result, refresh=refresh_set)
+
+    results = sampler(probe, check)
+    if pending_refresh:
+        results.update(check([]))
+    return results
@@ -0,0 +1,28 @@
+import os
+import sys
+from pathlib import Path
+import pytest
+
+# Module liegen im Projektordner (main.py, functions.py, src/) – wie beim Start per python main.py
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src import classify_rules, run_state
+from src.classify_rules import Classifier
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Leeres Arbeitsverzeichnis mit eigenem state/ (tmp/ und state/ liegen relativ zum Arbeitsverzeichnis)."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(run_state, "STATE_DIR", tmp_path / "state")
+    (tmp_path / "tmp").mkdir()
+    return tmp_path
+
+
+@pytest.fixture
+def classifier(monkeypatch):
+    """Standardregeln ([CLASSIFY]-Defaults), unabhängig von der lokalen CONFIG.ini."""
+    rules = Classifier()
+    monkeypatch.setattr(classify_rules, "_classifier", rules)
+    return rules
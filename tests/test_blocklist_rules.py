@@ -0,0 +1,138 @@
+import fnmatch
+import random
+import re
+import pytest
+from src.blocklist_rules import BlocklistMatcher
+
+
+@pytest.mark.parametrize("rule, title, expected", [
+    ("Film (2020) (DE)", "Film (2020) (DE)", True),
+    ("Film (2020) (DE)", "Film (2020) (DE) Extended", False),
+    ("prefix:Tatort S01 E", "Tatort S01 E05", True),
+    ("prefix:Tatort S01 E", "Tatort S02 E05", False),
+    ("glob:*Dokumentation*", "Eine Dokumentation (DE)", True),
+    ("glob:*Dokumentation*", "Dokument", False),
+    ("glob:?? Film", "AB Film", True),
+    ("glob:?? Film", "ABC Film", False),
+    ("re:\\bKIDS\\b", "Serie KIDS (DE)", True),
+    ("re:\\bKIDS\\b", "KIDSMAN", False),
+    ("re:(?i)\\bkids\\b", "Serie KIDS (DE)", True),
+])
+def test_single_rule(rule, title, expected):
+    assert BlocklistMatcher([rule]).blocks(title) is expected
+
+
+def test_backreference_survives_combining():
+    rule = r"re:(\w)\1x"
+    assert BlocklistMatcher([rule]).blocks("aax")
+    assert BlocklistMatcher(["re:foo(bar)", rule]).blocks("aax")
+    assert not BlocklistMatcher(["re:foo(bar)", rule]).blocks("abx")
+
+
+def test_named_groups_in_several_rules():
+    matcher = BlocklistMatcher([r"re:(?P<x>A)(?P=x)", r"re:(?P<x>B)\d", "re:(C)"])
+    assert matcher.blocks("xxAA")
+    assert matcher.blocks("B1")
+    assert matcher.blocks("C")
+    assert not matcher.blocks("AB")
+
+
+def test_global_flag_only_applies_to_its_rule():
+    matcher = BlocklistMatcher(["re:(?i)kids", "re:CAM"])
+    assert matcher.blocks("KIDS")
+    assert matcher.blocks("xCAMx")
+    assert not matcher.blocks("cam")
+
+
+def test_invalid_regex_is_ignored():
+    matcher = BlocklistMatcher(["re:(unclosed", "prefix:Abc"])
+    assert matcher.blocks("Abcdef")
+    assert not matcher.blocks("(unclosed")
+
+
+def test_series_rules():
+    matcher = BlocklistMatcher(["serie:glob:Tatort*", "serie:Lindenstraße (DE)", "Exakt (DE)"])
+    assert matcher.blocks_series("Tatort (DE)")
+    assert matcher.blocks_series("Lindenstraße (DE)")
+    assert matcher.blocks_series("Exakt (DE)")
+    assert not matcher.blocks_series("Polizeiruf (DE)")
+    # serie:-Regeln sperren keine Episodentitel direkt
+    assert not matcher.blocks("Tatort (DE) S01 E01")
+
+
+def test_rules_added_after_compile():
+    matcher = BlocklistMatcher(["prefix:Alt"])
+    assert not matcher.blocks("Neu S01 E01")
+    matcher.add("prefix:Neu S01 E")
+    matcher.add("glob:*Zusatz*")
+    assert matcher.blocks("Neu S01 E01")
+    assert matcher.blocks("Ein Zusatz")
+    assert matcher.blocks("Alter Film")
+
+
+def test_matches_rule_by_rule_check():
+    rng = random.Random(7)
+    words = ["Tatort", "Film", "Serie", "Doku", "Krimi", "(DE)", "S01", "E02", "2020", "Extra"]
+
+    def title():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(1, 5)))
+
+    rules = []
+    for _ in range(300):
+        kind = rng.randrange(4)
+        if kind == 0:
+            rules.append(title())
+        elif kind == 1:
+            rules.append("prefix:" + title()[:rng.randint(1, 12)])
+        elif kind == 2:
+            rules.append("glob:*" + rng.choice(words) + "*" + rng.choice(["", "?", rng.choice(words)]))
+        else:
+            rules.append("re:" + rng.choice([r"\b", ""]) + re.escape(rng.choice(words)) + rng.choice(["$", r"\s\d", ""]))
+
+    def brute_force(value):
+        for rule in rules:
+            if rule.startswith("prefix:") and value.startswith(rule[7:]):
+                return True
+            if rule.startswith("glob:") and fnmatch.fnmatchcase(value, rule[5:]):
+                return True
+            if rule.startswith("re:") and re.search(rule[3:], value):
+                return True
+            if value == rule:
+                return True
+        return False
+
+    matcher = BlocklistMatcher(rules)
+    for value in (title() for _ in range(2000)):
+        assert matcher.blocks(value) == brute_force(value), value
+
+
+def test_many_regex_rules_match_rule_by_rule_check():
+    # Alle re:-Regeln laufen über einen gemeinsamen Ausdruck (search) statt einzeln
+    rng = random.Random(11)
+    words = ["Tatort", "Film", "Serie", "Doku", "Krimi", "(DE)", "S01", "E02", "2020", "Extra", "HD", "Cut"]
+    patterns = []
+    for _ in range(1000):
+        word = re.escape(rng.choice(words))
+        patterns.append(rng.choice([
+            word,
+            rf"\b{word}$",
+            rf"^{word}\s",
+            rf"{word}\s\d{{{rng.randint(1, 4)}}}",
+            rf"(?i){word.lower()}\s+{re.escape(rng.choice(words))}",
+            rf"{word}(?!\s\()",
+        ]))
+    # Kein Muster darf trivial jeden Titel sperren
+    patterns = [p for p in patterns if not re.search(p, "")]
+
+    def title():
+        return " ".join(rng.choice(words + ["x", "y", "Zusatz"]) for _ in range(rng.randint(1, 8)))
+
+    matcher = BlocklistMatcher(f"re:{p}" for p in patterns)
+    assert matcher._titles._compiled.searched is not None and not matcher._titles._compiled.isolated
+    compiled = [re.compile(p) for p in patterns]
+    hits = 0
+    for value in (title() for _ in range(1000)):
+        expected = any(p.search(value) for p in compiled)
+        hits += expected
+        assert matcher.blocks(value) == expected, value
+    assert 0 < hits < 1000
@@ -0,0 +1,24 @@
+import pytest
+from src.classify_rules import CAM, MOVIE, SCAN_CAM_MARKERS, Classifier
+from src.m3u_parser import parse_extinf
+
+
+def _classify(rules: Classifier, title: str) -> str:
+    return rules.classify(parse_extinf(f"#EXTINF:-1,{title}", "http://example.com/movie/u/p/1.mp4"))
+
+
+@pytest.mark.parametrize("title, expected", [
+    ("Film (DE) (CAM)", CAM),
+    ("Film (DE) (cam)", CAM),
+    # Standard wie vor dem Regelwerk: nur (CAM) sperrt beim Aufteilen
+    ("Film (DE) [CAM]", MOVIE),
+    ("Film HDCAM (DE)", MOVIE),
+])
+def test_default_cam_markers(title, expected):
+    assert _classify(Classifier(), title) == expected
+
+
+def test_broader_cam_markers_are_opt_in():
+    rules = Classifier(cam_markers=SCAN_CAM_MARKERS)
+    assert _classify(rules, "Film (DE) [CAM]") == CAM
+    assert _classify(rules, "Film HDCAM (DE)") == CAM
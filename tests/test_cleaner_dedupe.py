@@ -0,0 +1,59 @@
+import cleaner
+from src.blocklist_store import BlocklistStore, lock_path
+
+
+def _library(workdir):
+    fs_movie, fs_series = workdir / "fs" / "movies", workdir / "fs" / "series"
+    for title in ("Film A", "Film B", "Film C"):
+        (fs_movie / title).mkdir(parents=True)
+        (fs_movie / title / f"{title}.strm").write_text("http://example.com/movie/1.mp4")
+    for season in (1, 2):
+        season_dir = fs_series / "Serie X" / f"Staffel {season:02d}"
+        season_dir.mkdir(parents=True)
+        for episode in range(1, 4):
+            (season_dir / f"Serie X S{season:02d} E{episode:02d}.strm").write_text("http://example.com/series/1.mkv")
+    return fs_movie, fs_series
+
+
+def _jellyfin(movies, episodes):
+    def get_media(url, key, item_type, fields):
+        return {"Movie": movies, "Series": [], "Episode": episodes}[item_type]
+    return get_media
+
+
+def test_dedupe_flushes_once_per_batch(workdir, monkeypatch):
+    fs_movie, fs_series = _library(workdir)
+    blocklist_path = workdir / "lists" / "blockliste.txt"
+    movies = [{"Name": t, "Path": f"/jf/m3u/movies/{t}/{t}.strm"} for t in ("Film A", "Film B", "Film C")]
+    movies += [{"Name": t, "Path": f"/jf/movies/{t}.mkv"} for t in ("Film A", "Film B")]
+    episodes = [{"SeriesName": "Serie X", "ParentIndexNumber": s, "Path": f"/jf/m3u/series/Serie X/Staffel {s:02d}/e.strm"}
+                for s in (1, 2)]
+    episodes += [{"SeriesName": "Serie X", "ParentIndexNumber": s, "Path": f"/jf/series/Serie X/S{s}E1.mkv"} for s in (1, 2)]
+    monkeypatch.setattr(cleaner, "get_jellyfin_media", _jellyfin(movies, episodes))
+
+    flushes = []
+    original_flush = BlocklistStore.flush
+
+    def counting_flush(self):
+        # Beim Schreiben müssen die Ordner noch existieren (erst sperren, dann löschen)
+        flushes.append(sorted(p.name for p in fs_movie.iterdir()))
+        return original_flush(self)
+
+    monkeypatch.setattr(BlocklistStore, "flush", counting_flush)
+    cleaner.dedupe_movies_series({
+        "jellyfin_url": "", "jellyfin_api_key": "", "blocklist": str(blocklist_path),
+        "jf_m3u_movie": "/jf/m3u/movies", "jf_m3u_series": "/jf/m3u/series",
+        "fs_m3u_movie": str(fs_movie), "fs_m3u_series": str(fs_series),
+    })
+
+    # Ein Schreibvorgang für alle Filme, einer für alle Staffeln
+    assert flushes == [["Film A", "Film B", "Film C"], ["Film C"]]
+    assert sorted(p.name for p in fs_movie.iterdir()) == ["Film C"]
+    assert not (fs_series / "Serie X").exists()
+    assert blocklist_path.read_text(encoding="utf-8").splitlines() == [
+        "Film A", "Film B", "prefix:Serie X S01 E", "prefix:Serie X S02 E",
+    ]
+    # Sperrdatei liegt in state/, nicht neben der Blockliste
+    assert sorted(p.name for p in blocklist_path.parent.iterdir()) == ["blockliste.txt"]
+    assert lock_path(blocklist_path).parent == workdir / "state"
+    assert lock_path(blocklist_path).is_file()
@@ -0,0 +1,164 @@
+import io
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+from src import download_m3u
+from src.download_m3u import PART_FILENAME, PART_STATE, download_m3u as download
+from src.run_state import load_state, save_state
+
+URL = "http://provider/get.php"
+OLD = b"#EXTM3U\n#EXTINF:-1,OLD\nhttp://a/old.ts\n"
+NEW = b"#EXTM3U\n#EXTINF:-1,NEW\nhttp://a/new.ts\n"
+
+
+def _response(status, body=b"", headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers or {})
+    response.raw = io.BytesIO(body)
+    response.url = URL
+    response.reason = "Test"
+    return response
+
+
+class FakeServer:
+    """Liefert ``body`` inkl. Range/If-Range wie ein Provider und merkt sich die Anfragen."""
+
+    def __init__(self, body, etag="", last_modified="", fail_after=None):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        # Erste Antwort nach X Bytes abbrechen (Content-Length bleibt vollständig)
+        self.fail_after = fail_after
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        headers = dict(headers or {})
+        self.requests.append(headers)
+        base = {"Accept-Ranges": "bytes"}
+        if self.etag:
+            base["ETag"] = self.etag
+        if self.last_modified:
+            base["Last-Modified"] = self.last_modified
+
+        range_header = headers.get("Range")
+        if_range = headers.get("If-Range")
+        validators = (self.etag, self.last_modified)
+        if range_header and (not if_range or if_range in validators):
+            start = int(range_header[len("bytes="):-1])
+            if start >= len(self.body):
+                return _response(416, headers={"Content-Range": f"bytes */{len(self.body)}"})
+            part = self.body[start:]
+            return _response(206, part, {**base, "Content-Length": str(len(part)),
+                                         "Content-Range": f"bytes {start}-{len(self.body) - 1}/{len(self.body)}"})
+
+        body = self.body
+        if self.fail_after is not None:
+            body, self.fail_after = body[:self.fail_after], None
+        return _response(200, body, {**base, "Content-Length": str(len(self.body))})
+
+
+@pytest.fixture
+def server(monkeypatch):
+    servers = []
+
+    def install(*args, **kwargs):
+        fake = FakeServer(*args, **kwargs)
+        servers.append(fake)
+        monkeypatch.setattr(download_m3u.requests, "Session", lambda: fake)
+        return fake
+
+    monkeypatch.setattr(download_m3u.time, "sleep", lambda _: None)
+    return install
+
+
+def _leftover_part(workdir, content, if_range=""):
+    (workdir / "tmp" / PART_FILENAME).write_bytes(content)
+    save_state(PART_STATE, {"url": URL, "if_range": if_range, "resumable": True})
+
+
+def _downloaded(workdir, result):
+    return (workdir / "tmp" / result.filename).read_bytes()
+
+
+def test_resume_across_runs_with_validator(workdir, server):
+    fake = server(NEW, etag='"v1"')
+    _leftover_part(workdir, NEW[:10], if_range='"v1"')
+
+    result = download(URL, conditional=False)
+
+    assert fake.requests[0]["Range"] == "bytes=10-"
+    assert fake.requests[0]["If-Range"] == '"v1"'
+    assert _downloaded(workdir, result) == NEW
+    assert load_state(PART_STATE) is None
+
+
+def test_changed_playlist_with_validator_restarts(workdir, server):
+    # If-Range passt nicht mehr → Server liefert 200 mit der ganzen neuen Playlist
+    fake = server(NEW, etag='"v2"')
+    _leftover_part(workdir, OLD[:20], if_range='"v1"')
+
+    result = download(URL, conditional=False)
+
+    assert len(fake.requests) == 1
+    assert _downloaded(workdir, result) == NEW
+
+
+def test_part_without_validator_is_not_resumed_across_runs(workdir, server):
+    fake = server(NEW)
+    _leftover_part(workdir, OLD[:20])
+
+    result = download(URL, conditional=False)
+
+    assert "Range" not in fake.requests[0]
+    assert _downloaded(workdir, result) == NEW
+
+
+def test_416_discards_part_and_restarts(workdir, server):
+    fake = server(NEW[:12], etag='"v1"')
+    _leftover_part(workdir, OLD, if_range='"v1"')
+
+    result = download(URL, conditional=False)
+
+    assert "Range" in fake.requests[0]
+    assert "Range" not in fake.requests[1]
+    assert _downloaded(workdir, result) == NEW[:12]
+    assert not (workdir / "tmp" / PART_FILENAME).exists()
+    assert load_state(PART_STATE) is None
+
+
+def test_416_on_every_run_does_not_stick(workdir, server):
+    # Früher blieb die .part-Datei liegen und jeder Lauf endete mit HTTPError 416
+    for _ in range(2):
+        server(NEW[:12], etag='"v1"')
+        _leftover_part(workdir, OLD, if_range='"v1"')
+        assert _downloaded(workdir, download(URL, conditional=False)) == NEW[:12]
+
+
+def test_206_with_total_below_offset_restarts(workdir, server, monkeypatch):
+    fake = server(NEW, etag='"v1"')
+    original_get = fake.get
+
+    def short_range(url, headers=None, **kwargs):
+        if headers and "Range" in headers:
+            fake.requests.append(dict(headers))
+            return _response(206, b"x", {"Content-Range": "bytes 40-40/5", "Content-Length": "1"})
+        return original_get(url, headers=headers, **kwargs)
+
+    monkeypatch.setattr(fake, "get", short_range)
+    _leftover_part(workdir, OLD, if_range='"v1"')
+
+    result = download(URL, conditional=False)
+
+    assert _downloaded(workdir, result) == NEW
+    assert "Range" not in fake.requests[-1]
+
+
+def test_interrupted_download_resumes_in_same_run_without_validator(workdir, server):
+    fake = server(NEW, fail_after=15)
+
+    result = download(URL, conditional=False, backoff=0)
+
+    assert fake.requests[1]["Range"] == "bytes=15-"
+    assert "If-Range" not in fake.requests[1]
+    assert _downloaded(workdir, result) == NEW
@@ -0,0 +1,25 @@
+import functions
+from functions import load_option
+
+
+def test_env_options_are_qualified_by_section(workdir, monkeypatch):
+    (workdir / ".env").write_text("PARSER_WORKERS=4\nCLEANUP_WORKERS=12\nworkers=99\n", encoding="utf-8")
+    # load_dotenv setzt os.environ; setenv + delenv sorgt dafür, dass die Variablen danach wieder verschwinden
+    for name in ("PARSER_WORKERS", "CLEANUP_WORKERS", "workers"):
+        monkeypatch.setenv(name, "")
+        monkeypatch.delenv(name)
+    monkeypatch.setattr(functions, "_config", None)
+
+    assert load_option('PARSER', 'workers', 1, int) == 4
+    assert load_option('CLEANUP', 'workers', 8, int) == 12
+    assert load_option('SYNC', 'workers', 2, int) == 2
+
+
+def test_ini_options(workdir, monkeypatch):
+    (workdir / "CONFIG.ini").write_text("[PARSER]\nworkers = 3\ncache = nein\n\n[CLEANUP]\nworkers =\n", encoding="utf-8")
+    monkeypatch.setattr(functions, "_config", None)
+
+    assert load_option('PARSER', 'workers', 1, int) == 3
+    assert load_option('PARSER', 'cache', True, bool) is False
+    assert load_option('CLEANUP', 'workers', 8, int) == 8
+    assert load_option('MISSING', 'workers', 5, int) == 5
@@ -0,0 +1,64 @@
+from src.m3u_parallel import chunk_bounds
+from src.m3u_parser import split_playlist
+
+# Randfälle, bei denen sich Bytes- und Textverarbeitung unterscheiden würden:
+# geschütztes Leerzeichen (NBSP), einzelnes \r als Zeilenende, \r\n, ungültiges UTF-8
+PLAYLIST = (
+    b'#EXTM3U\n'
+    b'#EXTINF:-1 tvg-name="Das Erste" group-title="DE",Das Erste HD (DE)\n'
+    b'#EXTVLCOPT:http-user-agent=Test\n'
+    b'http://example.com/live/user/pass/1.m3u8\n'
+    b'#EXTINF:-1,Film Eins (DE)\xc2\xa0\r\n'
+    b'http://example.com/movie/user/pass/10.mp4\xc2\xa0\r\n'
+    b'#EXTINF:-1,Film Zwei (DE)\rhttp://example.com/movie/user/pass/11.mkv\r'
+    b'#EXTINF:-1,Kaputt \xff\xfe Film (DE)\n'
+    b'#EXTGRP:Filme\n'
+    b'http://example.com/movie/user/pass/12.mp4\n'
+    b'#EXTINF:-1,Neu im Kino (DE) (CAM)\n'
+    b'http://example.com/movie/user/pass/13.mp4\n'
+    b'#EXTINF:-1,Serie S01 E01 (DE)\n'
+    b'\n'
+    b'http://example.com/series/user/pass/20.mkv\n'
+    b'#EXTINF:-1,Film (EN)\n'
+    b'http://example.com/movie/user/pass/14.mp4\n'
+    b'#EXTINF:-1 group-title="Radio",Radio \xc2\xa0Eins\n'
+    b'http://example.com/live/user/pass/2.ts?x=1\n'
+)
+
+
+def _split(workdir, name: str, workers: int):
+    (workdir / "tmp" / name).write_bytes(PLAYLIST * 50)
+    split = split_playlist(name, write_tmp_files=True, workers=workers, parallel_min_mb=0)
+    tmp = workdir / "tmp"
+    files = {prefix: (tmp / f"{prefix}_{name}").read_bytes() for prefix in ("streams", "movies", "series")}
+    stores = {kind: [tuple(row) for row in zip(store.column("title"), store.column("safe_title"), store.column("url"))]
+              for kind, store in (("movies", split.movies), ("series", split.series))}
+    return split, files, stores
+
+
+def test_parallel_split_matches_single_process(workdir, classifier):
+    single, single_files, single_stores = _split(workdir, "single.m3u", workers=1)
+    parallel, parallel_files, parallel_stores = _split(workdir, "parallel.m3u", workers=3)
+
+    assert parallel.stream_count == single.stream_count == 100
+    assert parallel.cam_titles == single.cam_titles
+    assert parallel_stores == single_stores
+    assert parallel_files == single_files
+
+    # Zeilenenden und NBSP werden wie beim Lesen im Textmodus behandelt
+    titles = [title for title, _, _ in single_stores["movies"][:3]]
+    assert titles == ["Film Eins (DE)", "Film Zwei (DE)", "Kaputt  Film (DE)"]
+    assert single_stores["movies"][0][2] == "http://example.com/movie/user/pass/10.mp4"
+    assert b"#EXTVLCOPT:http-user-agent=Test\n" in single_files["streams"]
+
+
+def test_chunk_bounds_start_at_extinf(workdir):
+    path = workdir / "tmp" / "playlist.m3u"
+    path.write_bytes(PLAYLIST * 20)
+    bounds = chunk_bounds(path, 7)
+    data = path.read_bytes()
+
+    assert bounds[0][0] == 0 and bounds[-1][1] == len(data)
+    for (_, end), (start, _) in zip(bounds, bounds[1:]):
+        assert end == start
+        assert data[start:].startswith(b"#EXTINF")
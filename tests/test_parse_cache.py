@@ -0,0 +1,69 @@
+import sqlite3
+from src import parse_cache
+from src.parse_cache import cache_path, cached_split_playlist, load_split
+
+PLAYLIST = (
+    '#EXTM3U\n'
+    '#EXTINF:-1,Das Erste HD (DE)\n'
+    'http://example.com/live/user/pass/1.m3u8\n'
+    '#EXTINF:-1,Film Eins (DE)\n'
+    'http://example.com/movie/user/pass/10.mp4\n'
+    '#EXTINF:-1,Neu im Kino (DE) (CAM)\n'
+    'http://example.com/movie/user/pass/13.mp4\n'
+    '#EXTINF:-1,Serie S01 E01 (DE)\n'
+    'http://example.com/series/user/pass/20.mkv\n'
+)
+
+
+def _playlist(workdir, name="playlist.m3u"):
+    (workdir / "tmp" / name).write_text(PLAYLIST, encoding="utf-8")
+    return name
+
+
+def test_roundtrip_restores_entries_and_streams(workdir, classifier, monkeypatch):
+    # Mehrere Blöcke, damit die Streams-Datei über mehrere Zeilen verteilt wird
+    monkeypatch.setattr(parse_cache, "_BLOB_CHUNK_SIZE", 16)
+    name = _playlist(workdir)
+    split = cached_split_playlist(name, sha256="abc")
+    streams = workdir / "tmp" / split.streams_filename
+    expected = streams.read_bytes()
+    streams.unlink()
+
+    cached = load_split("abc")
+    assert cached is not None
+    assert list(cached.movies.column("title")) == ["Film Eins (DE)"]
+    assert list(cached.series.column("url")) == ["http://example.com/series/user/pass/20.mkv"]
+    assert cached.cam_titles == ["Neu im Kino (DE) (CAM)"]
+    assert cached.stream_count == 1
+    assert streams.read_bytes() == expected
+    assert load_split("other") is None
+
+
+def test_corrupt_cache_counts_as_miss(workdir, classifier):
+    name = _playlist(workdir)
+    cache_path().write_bytes(b"kein SQLite")
+    assert load_split("abc") is None
+
+    split = cached_split_playlist(name, sha256="abc")
+    assert list(split.movies.column("title")) == ["Film Eins (DE)"]
+    # Der kaputte Cache wurde ersetzt
+    assert load_split("abc") is not None
+
+
+def test_incomplete_streams_count_as_miss(workdir, classifier):
+    name = _playlist(workdir)
+    split = cached_split_playlist(name, sha256="abc")
+    (workdir / "tmp" / split.streams_filename).unlink()
+    with sqlite3.connect(cache_path()) as conn:
+        conn.execute("DELETE FROM streams")
+    assert load_split("abc") is None
+
+
+def test_save_failure_still_returns_split(workdir, classifier, monkeypatch):
+    def broken_save(*args):
+        raise RuntimeError("kaputt")
+
+    monkeypatch.setattr(parse_cache, "save_split", broken_save)
+    split = cached_split_playlist(_playlist(workdir), sha256="abc")
+    assert split.stream_count == 1
+    assert not cache_path().exists()
@@ -0,0 +1,121 @@
+import json
+import pytest
+from src import save_new_movies_m3u as movies_module
+from src.blocklist_store import BlocklistStore
+from src.m3u_parser import parse_extinf
+from src.save_new_movies_m3u import save_new_movies_m3u
+from src.strm_manifest import StrmManifest, manifest_path
+from src.sync_plan import Change, PlanApplier, SyncPlan, plan_path
+
+
+@pytest.fixture
+def library(workdir):
+    return workdir / "lib" / "Filme"
+
+
+@pytest.fixture
+def checks(monkeypatch):
+    """URL-Checks ohne Netzwerk: {url: (ok, grund)}; nicht eingetragene URLs sind OK."""
+    results = {}
+
+    def fake_verify(urls, on_result=None, known_good=(), sampler=None):
+        out = {}
+        for url in urls:
+            out[url] = results.get(url, (True, "test"))
+            if on_result is not None:
+                on_result(url, *out[url])
+        return out
+
+    monkeypatch.setattr(movies_module, "verify_urls", fake_verify)
+    return results
+
+
+def _entries(**urls):
+    return [parse_extinf(f"#EXTINF:-1,{title} (DE)", url) for title, url in urls.items()]
+
+
+def _sync(library, plan_only=False, **urls):
+    return save_new_movies_m3u(_entries(**urls), library, BlocklistStore(None), plan_only=plan_only)
+
+
+def _tree(library):
+    return {p.relative_to(library).as_posix(): p.read_text(encoding="utf-8")
+            for p in sorted(library.rglob("*.strm"))}
+
+
+def test_plan_roundtrip(tmp_path):
+    base = tmp_path / "lib"
+    plan = SyncPlan("movies", base)
+    plan.add(Change("create", base / "A" / "A.strm", "http://a", "neu", "A"))
+    plan.add(Change("rmtree", base / "B", reason="nicht mehr in Playlist", title="B"))
+    plan.save(tmp_path / "plan.json")
+
+    data = json.loads((tmp_path / "plan.json").read_text(encoding="utf-8"))
+    assert data["counts"] == {"create": 1, "update": 0, "delete": 0, "rmtree": 1}
+    assert data["changes"][0] == ["create", "A/A.strm", "http://a", "neu", "A"]
+
+    loaded = SyncPlan.load(tmp_path / "plan.json")
+    assert [(c.op, c.path, c.url, c.reason, c.title) for c in loaded.changes] == \
+        [(c.op, c.path, c.url, c.reason, c.title) for c in plan.changes]
+
+
+def test_applier_orders_batch_by_folder_and_updates_manifest(workdir, library):
+    (library / "B").mkdir(parents=True)
+    (library / "B" / "B.strm").write_text("http://b", encoding="utf-8")
+    manifest = StrmManifest(library)
+    assert manifest.paths() == {library / "B" / "B.strm"}
+
+    plan = SyncPlan("movies", library)
+    plan.add(Change("rmtree", library / "B", reason="offline", title="B"))
+    plan.add(Change("create", library / "C" / "C.strm", "http://c", "neu", "C"))
+    plan.add(Change("create", library / "A" / "A.strm", "http://a", "neu", "A"))
+    applier = PlanApplier(manifest, workers=1, batch_size=10)
+    applier.apply(plan)
+    assert applier.close() == 0
+
+    assert _tree(library) == {"A/A.strm": "http://a", "C/C.strm": "http://c"}
+    # Ein Worker → Reihenfolge der Ausführung = Reihenfolge nach Ordner
+    assert applier.created == ["A", "C"]
+    assert manifest.paths() == {library / "A" / "A.strm", library / "C" / "C.strm"}
+    assert manifest.url_matches(library / "A" / "A.strm", "http://a")
+    manifest.close()
+
+
+def test_plan_only_leaves_library_and_state_untouched(workdir, library, checks):
+    checks["http://example.com/movie/3.mp4"] = (False, "GET status 404")
+    created, _ = _sync(library,
+                       Eins="http://example.com/movie/1.mp4",
+                       Zwei="http://example.com/movie/2.mp4",
+                       Drei="http://example.com/movie/3.mp4")
+    assert sorted(created) == ["Eins (DE)", "Zwei (DE)"]
+    before = _tree(library)
+    state_before = {p.name: p.read_bytes() for p in (workdir / "state").iterdir()}
+
+    # Eins: neuer Link, Zwei: nicht mehr in der Playlist, Vier: neu
+    created, deleted = _sync(library, plan_only=True,
+                             Eins="http://example.com/movie/1b.mp4",
+                             Vier="http://example.com/movie/4.mp4")
+
+    assert created == ["Vier (DE)"]
+    assert deleted == ["Zwei (DE)"]
+    assert _tree(library) == before
+    assert {p.name: p.read_bytes() for p in (workdir / "state").iterdir()} == state_before
+
+    plan = SyncPlan.load(plan_path("movies"))
+    assert sorted((c.op, c.path.relative_to(library).as_posix(), c.reason) for c in plan.changes) == [
+        ("create", "Vier (DE)/Vier (DE).strm", "neu"),
+        ("rmtree", "Zwei (DE)", "nicht mehr in Playlist"),
+        ("update", "Eins (DE)/Eins (DE).strm", "Link geändert"),
+    ]
+
+    # Der gespeicherte Plan lässt sich später unverändert anwenden
+    manifest = StrmManifest(library)
+    applier = PlanApplier(manifest, workers=2)
+    applier.apply(plan)
+    assert applier.close() == 0
+    manifest.close()
+    assert _tree(library) == {
+        "Eins (DE)/Eins (DE).strm": "http://example.com/movie/1b.mp4",
+        "Vier (DE)/Vier (DE).strm": "http://example.com/movie/4.mp4",
+    }
+    assert manifest_path(library).is_file()
@@ -0,0 +1,113 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src import host_limiter, url_check
+from src.host_limiter import AIMDController, retry_after_seconds, throttle_delay
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Antworten pro Pfad: Liste von (Status, Header); letzte wird wiederholt
+    script: dict = {}
+    hits: dict = {}
+
+    def _reply(self, body=True):
+        answers = self.script[self.path]
+        count = self.hits.get(self.path, 0)
+        self.hits[self.path] = count + 1
+        status, headers = answers[min(count, len(answers) - 1)]
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", "4")
+        self.end_headers()
+        if body:
+            self.wfile.write(b"\x00\x01\x02\x03")
+
+    def do_GET(self):
+        self._reply()
+
+    def do_HEAD(self):
+        self._reply(body=False)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.script, _Handler.hits = {}, {}
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    fresh = AIMDController(start=8, cooldown=0.0)
+    monkeypatch.setattr(host_limiter, "_controller", fresh)
+    return fresh
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(None) is None
+    assert retry_after_seconds("7") == 7.0
+    assert retry_after_seconds("Thu, 01 Jan 1970 00:00:00 GMT") == 0.0
+    assert retry_after_seconds("irgendwas") is None
+
+
+def test_throttle_delay_reports_and_honours_retry_after(controller):
+    url = "http://provider/movie/u/p/1.mp4"
+    assert throttle_delay(url, {"Retry-After": "2"}, 0, 0.3) == 2.0
+    assert controller.limit("provider") == 4
+    assert throttle_delay(url, {}, 1, 0.3) == pytest.approx(0.6)
+    assert controller.limit("provider") == 2
+    # Längeres Retry-After → nicht wiederholen
+    assert throttle_delay(url, {"Retry-After": "3600"}, 0, 0.3) is None
+
+
+def test_sync_request_reports_429_before_retry(server, controller, monkeypatch):
+    httpd, base = server
+    _Handler.script["/a.mp4"] = [(429, {"Retry-After": "0"}), (200, {})]
+    monkeypatch.setattr(url_check.time, "sleep", lambda _: None)
+
+    r = url_check._request("GET", base + "/a.mp4", 5)
+
+    assert r.status_code == 200
+    # Genau ein Wiederholungsversuch durch _request, keiner durch urllib3
+    assert _Handler.hits["/a.mp4"] == 2
+    assert controller.limit(f"127.0.0.1:{httpd.server_address[1]}") == 4
+
+
+def test_sync_request_reports_every_throttle(server, controller, monkeypatch):
+    httpd, base = server
+    _Handler.script["/b.mp4"] = [(503, {})]
+    monkeypatch.setattr(url_check.time, "sleep", lambda _: None)
+
+    r = url_check._request("GET", base + "/b.mp4", 5)
+
+    assert r.status_code == 503
+    assert _Handler.hits["/b.mp4"] == url_check._THROTTLE_RETRIES + 1
+    # 8 → 4 → 2 → 1: jede 503 hat das Limit gesenkt
+    assert controller.limit(f"127.0.0.1:{httpd.server_address[1]}") == 1
+
+
+def test_async_request_reports_429_before_retry(server, controller, monkeypatch):
+    aiohttp = pytest.importorskip("aiohttp")
+    import asyncio
+    from src import url_check_async
+
+    httpd, base = server
+    _Handler.script["/c.mp4"] = [(429, {"Retry-After": "0"}), (200, {})]
+
+    async def run():
+        async with aiohttp.ClientSession() as session:
+            resp = await url_check_async._request(session, "GET", base + "/c.mp4", 5)
+            resp.release()
+            return resp.status
+
+    assert asyncio.run(run()) == 200
+    assert _Handler.hits["/c.mp4"] == 2
+    assert controller.limit(f"127.0.0.1:{httpd.server_address[1]}") == 4